@@ -25,6 +25,7 @@ CREATE TABLE knowledge (
     metadata JSONB DEFAULT '{}',
     parent_id UUID,
     enabled BOOLEAN DEFAULT TRUE,
+    retrieval_count INTEGER DEFAULT 0,
     created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
     tenant_id UUID REFERENCES tenant(tenant_id)
@@ -53,7 +54,10 @@ CREATE TABLE task (
     user_id VARCHAR(255),
     tenant_id UUID REFERENCES tenant(tenant_id),
     created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+    updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+    -- 本地任务引擎的租约: 持有者进程定期续约, 过期后其他进程才能接管该任务
+    lease_owner VARCHAR(255),
+    lease_expires_at TIMESTAMPTZ
 );
 
 
@@ -62,5 +66,41 @@ CREATE INDEX idx_chunk_space_id ON chunk(space_id);
 CREATE INDEX idx_knowledge_space_id ON knowledge(space_id);
 CREATE INDEX idx_task_space_id ON task(space_id);
 
--- 为 vector 列创建索引以支持向量检索
-CREATE INDEX idx_chunk_embedding ON chunk USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
\ No newline at end of file
+-- embedding 列不定长, 无法直接建向量索引; 服务端 VectorIndexManager 会为每个
+-- embedding_model_name 按维度创建部分 HNSW 索引 (idx_chunk_hnsw_*), 并随数据量重建
+CREATE INDEX idx_chunk_tenant_model ON chunk(tenant_id, embedding_model_name);
+
+-- 为 context 列创建全文索引以支持混合检索, 配置需与查询中的 'simple' 一致
+CREATE INDEX idx_chunk_context_fts ON chunk USING GIN (to_tsvector('simple', context));
+
+-- 检索分析: 每分钟每个 chunk 的命中数, 按天分区, 分区由服务端按需创建并按保留天数删除
+CREATE TABLE retrieval_stats (
+    bucket TIMESTAMPTZ NOT NULL,
+    tenant_id UUID NOT NULL,
+    space_id VARCHAR(255) NOT NULL,
+    knowledge_id UUID NOT NULL,
+    chunk_id UUID NOT NULL,
+    hits INTEGER NOT NULL,
+    PRIMARY KEY (bucket, tenant_id, space_id, knowledge_id, chunk_id)
+) PARTITION BY RANGE (bucket);
+
+-- 按天汇总, 与 retrieval_stats 在同一事务中增量更新
+CREATE TABLE retrieval_stats_daily (
+    day DATE NOT NULL,
+    tenant_id UUID NOT NULL,
+    space_id VARCHAR(255) NOT NULL,
+    knowledge_id UUID NOT NULL,
+    hits BIGINT NOT NULL,
+    PRIMARY KEY (day, tenant_id, space_id, knowledge_id)
+);
+
+CREATE TABLE retrieval_stats_total (
+    tenant_id UUID PRIMARY KEY,
+    hits BIGINT NOT NULL
+);
+
+-- 已导入的 spool 分段, 保证每个分段只导入一次
+CREATE TABLE retrieval_stats_segment (
+    segment_id VARCHAR(64) PRIMARY KEY,
+    loaded_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
@@ -13,7 +13,12 @@ from whiskerrag_types.model import (
     Tenant,
 )
 
-from core.auth import Action, Resource, get_tenant_with_permissions
+from core.auth import (
+    Action,
+    Resource,
+    get_tenant_with_permissions,
+    invalidate_auth_cache,
+)
 from core.log import logger
 from core.plugin_manager import PluginManager
 from core.response import ResponseModel
@@ -105,6 +110,7 @@ async def update_api_key(
     update_data.update(body.model_dump(exclude_unset=True, exclude_none=True))
     update_data["tenant_id"] = tenant.tenant_id
     updated_api_key = await db_engine.update_api_key(APIKey(**update_data))
+    invalidate_auth_cache(existing_key.key_value)
     return ResponseModel(data=updated_api_key, success=True)
 
 
@@ -135,6 +141,7 @@ async def delete_api_key(
         success = await db_engine.delete_api_key(key_id)
         if not success:
             raise HTTPException(status_code=500, detail="Failed to delete API key")
+        invalidate_auth_cache(existing_key.key_value)
 
         return ResponseModel(success=True, message="API key deleted successfully")
     except HTTPException as e:
@@ -159,6 +166,7 @@ async def change_api_key_status(
         raise HTTPException(status_code=404, detail="API Key not found")
     existing_key.is_active = body.status
     await db_engine.update_api_key(existing_key)
+    invalidate_auth_cache(existing_key.key_value)
     return ResponseModel(success=True, message="API key deactivated successfully")
 
 
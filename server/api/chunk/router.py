@@ -1,15 +1,31 @@
 import uuid
 from datetime import datetime, timezone
-from http.client import HTTPException
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from whiskerrag_types.model import Chunk, PageQueryParams, PageResponse, Tenant
 from whiskerrag_utils import RegisterTypeEnum, get_register
 
 from core.auth import Action, Resource, get_tenant_with_permissions
+from core.chunk_import import (
+    DEFAULT_IMPORT_BATCH_SIZE,
+    ChunkImporter,
+    ChunkImportError,
+    ImportSummary,
+    iter_arrow_records,
+    iter_ndjson_records,
+)
+from core.export import (
+    EXPORT_MEDIA_TYPES,
+    ExportFormat,
+    is_format_available,
+    iter_arrow,
+    iter_ndjson,
+)
 from core.log import logger
+from core.pagination import CursorPageQueryParams, CursorPageResponse
 from core.plugin_manager import PluginManager
 from core.response import ResponseModel
 
@@ -46,6 +62,29 @@ async def get_chunk_list(
     return ResponseModel(data=chunks, success=True)
 
 
+@router.post(
+    "/list/cursor",
+    operation_id="get_chunk_list_by_cursor",
+    response_model_by_alias=False,
+)
+async def get_chunk_list_by_cursor(
+    params: CursorPageQueryParams[Chunk],
+    tenant: Tenant = get_tenant_with_permissions(Resource.CHUNK, [Action.READ]),
+) -> ResponseModel[CursorPageResponse[Chunk]]:
+    """
+    Keyset paginated chunk list, pass next_cursor back as cursor to get the next page
+    """
+    db_engine = PluginManager().dbPlugin
+    if not hasattr(db_engine, "get_chunk_list_by_cursor"):
+        raise HTTPException(
+            status_code=501, detail="cursor pagination is not supported"
+        )
+    params.eq_conditions = params.eq_conditions or {}
+    params.eq_conditions["tenant_id"] = tenant.tenant_id
+    chunks = await db_engine.get_chunk_list_by_cursor(tenant.tenant_id, params)
+    return ResponseModel(data=chunks, success=True)
+
+
 @router.delete(
     "/id/{id}/model_name/{model_name}",
     operation_id="delete_chunk_by_id",
@@ -129,3 +168,66 @@ async def update_chunk(
     saved_chunks: List[Chunk] = await db_engine.update_chunk_list([exist_chunk])
     logger.info("[chunk][update][end]")
     return ResponseModel(data=saved_chunks[0], success=True)
+
+
+@router.get("/export", operation_id="export_chunk_list")
+async def export_chunk_list(
+    space_id: str,
+    knowledge_id: Optional[str] = None,
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    tenant: Tenant = get_tenant_with_permissions(Resource.CHUNK, [Action.READ]),
+) -> StreamingResponse:
+    """
+    Stream every chunk of a space (optionally of one knowledge) as NDJSON or an
+    Arrow IPC stream. Embeddings are little-endian float32, base64 encoded in NDJSON.
+    """
+    db_engine = PluginManager().dbPlugin
+    if not hasattr(db_engine, "stream_chunk_list"):
+        raise HTTPException(status_code=501, detail="chunk export is not supported")
+    if not is_format_available(export_format):
+        raise HTTPException(
+            status_code=400, detail=f"{export_format.value} export is unavailable"
+        )
+    batches = db_engine.stream_chunk_list(tenant.tenant_id, space_id, knowledge_id)
+    if export_format == ExportFormat.ARROW:
+        body = iter_arrow(batches)
+    else:
+        body = iter_ndjson(batches)
+    filename = f"chunk-{space_id}.{export_format.value}"
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/import", operation_id="import_chunk_list")
+async def import_chunk_list(
+    request: Request,
+    space_id: Optional[str] = None,
+    import_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    batch_size: int = Query(DEFAULT_IMPORT_BATCH_SIZE, ge=1, le=10000),
+    tenant: Tenant = get_tenant_with_permissions(Resource.CHUNK, [Action.CREATE]),
+) -> ResponseModel[ImportSummary]:
+    """
+    Import pre-embedded chunks from the request body, in the format produced by
+    /api/chunk/export. The body is consumed as it is written to the database.
+    """
+    db_engine = PluginManager().dbPlugin
+    if not is_format_available(import_format):
+        raise HTTPException(
+            status_code=400, detail=f"{import_format.value} import is unavailable"
+        )
+    if import_format == ExportFormat.ARROW:
+        records = iter_arrow_records(request.stream())
+    else:
+        records = iter_ndjson_records(request.stream())
+    importer = ChunkImporter(db_engine, tenant.tenant_id, space_id, batch_size)
+    try:
+        summary = await importer.run(records)
+    except ChunkImportError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": str(e), "imported": importer.summary.imported},
+        )
+    return ResponseModel(data=summary, success=True)
@@ -1,12 +1,21 @@
 from typing import List, Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from whiskerrag_types.model import Tenant
 
-from core.auth import Action, Resource, get_tenant_with_permissions
+from core.auth import (
+    Action,
+    Resource,
+    authenticate_ak,
+    authenticate_sk,
+    get_tenant_with_permissions,
+    require_operator,
+)
 from core.plugin_manager import PluginManager
 from core.response import ResponseModel
+from core.result_cache import get_retrieval_result_cache
+from core.vector_index import VectorIndexInfo
 
 router = APIRouter(
     prefix="/api/v1/dashboard",
@@ -61,3 +70,70 @@ async def get_tenant_log(
         data=tenant_log,
         message="Success",
     )
+
+
+# the indexes span every tenant's chunks, so they are operator only
+@router.get(
+    "/vector_index",
+    operation_id="get_vector_index",
+    response_model_by_alias=False,
+    dependencies=[Depends(require_operator)],
+)
+async def get_vector_index() -> ResponseModel[List[VectorIndexInfo]]:
+    db_engine = PluginManager().dbPlugin
+    if not hasattr(db_engine, "get_vector_index_report"):
+        raise HTTPException(status_code=501, detail="vector index is not managed")
+    return ResponseModel(
+        success=True,
+        data=await db_engine.get_vector_index_report(),
+        message="Success",
+    )
+
+
+@router.post(
+    "/vector_index/maintain",
+    operation_id="maintain_vector_index",
+    response_model_by_alias=False,
+    dependencies=[Depends(require_operator)],
+)
+async def maintain_vector_index() -> ResponseModel[List[str]]:
+    """Create, rebuild or reindex vector indexes now instead of on the next run"""
+    db_engine = PluginManager().dbPlugin
+    if not hasattr(db_engine, "maintain_vector_indexes"):
+        raise HTTPException(status_code=501, detail="vector index is not managed")
+    return ResponseModel(
+        success=True,
+        data=await db_engine.maintain_vector_indexes(),
+        message="Success",
+    )
+
+
+@router.get(
+    "/retrieval_cache",
+    operation_id="get_retrieval_cache_stats",
+    response_model_by_alias=False,
+)
+async def get_retrieval_cache_stats(
+    tenant: Tenant = get_tenant_with_permissions(Resource.TENANT, [Action.READ]),
+) -> ResponseModel[dict]:
+    """Hit ratio and size of this replica's retrieval result cache"""
+    cache = get_retrieval_result_cache()
+    if cache is None:
+        raise HTTPException(status_code=501, detail="retrieval cache is disabled")
+    return ResponseModel(success=True, data=cache.stats(), message="Success")
+
+
+@router.get(
+    "/auth_cache",
+    operation_id="get_auth_cache_stats",
+    response_model_by_alias=False,
+)
+async def get_auth_cache_stats(
+    tenant: Tenant = get_tenant_with_permissions(Resource.TENANT, [Action.READ]),
+) -> ResponseModel[dict]:
+    """Hit ratio and size of this replica's ak and sk authentication caches"""
+    data = {
+        "api_key": authenticate_ak.cache.stats(),
+        "secret_key": authenticate_sk.cache.stats(),
+    }
+    return ResponseModel(success=True, data=data, message="Success")
@@ -1,6 +1,7 @@
 from typing import Any, Dict, List
 
-from fastapi import APIRouter, Body, HTTPException, Path
+from fastapi import APIRouter, Body, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from whiskerrag_types.model import (
     Knowledge,
@@ -13,6 +14,13 @@ from whiskerrag_utils import get_all_registered_with_metadata
 from whiskerrag_utils.registry import RegisterTypeEnum
 
 from core.auth import Action, Resource, get_tenant_with_permissions, validate_key_string
+from core.export import (
+    EXPORT_MEDIA_TYPES,
+    ExportFormat,
+    is_format_available,
+    iter_arrow,
+    iter_ndjson,
+)
 from core.log import logger
 from core.plugin_manager import PluginManager
 from core.response import ResponseModel
@@ -205,3 +213,32 @@ async def handle_webhook(
         payload=body,
     )
     return ResponseModel(success=True, data=res)
+
+
+@router.get("/export", operation_id="export_knowledge_list")
+async def export_knowledge_list(
+    space_id: str,
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    tenant: Tenant = get_tenant_with_permissions(Resource.KNOWLEDGE, [Action.READ]),
+) -> StreamingResponse:
+    """
+    Stream every knowledge of a space as NDJSON or an Arrow IPC stream
+    """
+    db_engine = PluginManager().dbPlugin
+    if not hasattr(db_engine, "stream_knowledge_list"):
+        raise HTTPException(status_code=501, detail="knowledge export is not supported")
+    if not is_format_available(export_format):
+        raise HTTPException(
+            status_code=400, detail=f"{export_format.value} export is unavailable"
+        )
+    batches = db_engine.stream_knowledge_list(tenant.tenant_id, space_id)
+    if export_format == ExportFormat.ARROW:
+        body = iter_arrow(batches)
+    else:
+        body = iter_ndjson(batches)
+    filename = f"knowledge-{space_id}.{export_format.value}"
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
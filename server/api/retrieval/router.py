@@ -1,7 +1,9 @@
-from typing import List
+import asyncio
+from typing import List, Union
 
 from deprecated import deprecated
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
+from pydantic import BaseModel, Field
 from whiskerrag_types.model import (
     RetrievalByKnowledgeRequest,
     RetrievalBySpaceRequest,
@@ -13,11 +15,14 @@ from whiskerrag_types.model.retrieval import RetrievalRequest
 from core.auth import Action, Resource, get_tenant_with_permissions
 from core.plugin_manager import PluginManager
 from core.response import ResponseModel
+from core.retrieval import server_timing_header
 from core.retrieval_counter import (
-    RetrievalCounter,
+    AnyRetrievalCounter,
+    batch_retrieval_count,
     get_retrieval_counter,
     retrieval_count,
 )
+from core.retrieval_stats import record_retrieval_stats
 
 router = APIRouter(
     prefix="/api/retrieval",
@@ -25,6 +30,15 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+MAX_BATCH_QUERIES = 50
+RetrievalQuery = Union[RetrievalByKnowledgeRequest, RetrievalBySpaceRequest]
+
+
+class BatchRetrievalRequest(BaseModel):
+    queries: List[RetrievalQuery] = Field(
+        ..., min_length=1, max_length=MAX_BATCH_QUERIES
+    )
+
 
 @router.post(
     "/knowledge",
@@ -35,7 +49,7 @@ router = APIRouter(
 async def retrieve_knowledge_content(
     body: RetrievalByKnowledgeRequest,
     tenant: Tenant = get_tenant_with_permissions(Resource.RETRIEVAL, [Action.READ]),
-    counter: RetrievalCounter = Depends(get_retrieval_counter),
+    counter: AnyRetrievalCounter = Depends(get_retrieval_counter),
 ) -> ResponseModel[List[RetrievalChunk]]:
     """
     Retrieve certain chunks within a knowledge_id, for example, within a specific PDF file.
@@ -43,6 +57,7 @@ async def retrieve_knowledge_content(
     db_engine = PluginManager().dbPlugin
     res = await db_engine.search_knowledge_chunk_list(tenant.tenant_id, body)
     retrieval_count(counter, res)
+    record_retrieval_stats(tenant.tenant_id, res)
     return ResponseModel(success=True, data=res)
 
 
@@ -56,7 +71,7 @@ async def retrieve_knowledge_content(
 async def retrieve_space_content(
     body: RetrievalBySpaceRequest,
     tenant: Tenant = get_tenant_with_permissions(Resource.RETRIEVAL, [Action.READ]),
-    counter: RetrievalCounter = Depends(get_retrieval_counter),
+    counter: AnyRetrievalCounter = Depends(get_retrieval_counter),
 ) -> ResponseModel[List[RetrievalChunk]]:
     """
     Retrieve chunks within a space_id, for example, given a petercat bot_id, retrieve all chunks under that bot_id.
@@ -64,6 +79,7 @@ async def retrieve_space_content(
     db_engine = PluginManager().dbPlugin
     res = await db_engine.search_space_chunk_list(tenant.tenant_id, body)
     retrieval_count(counter, res)
+    record_retrieval_stats(tenant.tenant_id, res)
     return ResponseModel(success=True, data=res)
 
 
@@ -75,13 +91,54 @@ async def retrieve_space_content(
 )
 async def retrieve(
     body: RetrievalRequest,
+    response: Response,
     tenant: Tenant = get_tenant_with_permissions(Resource.RETRIEVAL, [Action.READ]),
-    counter: RetrievalCounter = Depends(get_retrieval_counter),
+    counter: AnyRetrievalCounter = Depends(get_retrieval_counter),
 ) -> ResponseModel[List[RetrievalChunk]]:
     """
     Retrieve chunks within a space_id, for example, given a petercat bot_id, retrieve all chunks under that bot_id.
     """
     db_engine = PluginManager().dbPlugin
     res = await db_engine.retrieve(tenant.tenant_id, body)
+    server_timing = server_timing_header()
+    if server_timing:
+        # per-stage latency (embed, vector, fulltext, fuse, fetch, rerank, total)
+        response.headers["Server-Timing"] = server_timing
     retrieval_count(counter, res)
+    record_retrieval_stats(tenant.tenant_id, res)
+    return ResponseModel(success=True, data=res)
+
+
+@router.post(
+    "/batch",
+    operation_id="retrieve_batch",
+    response_model_by_alias=False,
+    response_model_exclude_none=True,
+)
+async def retrieve_batch(
+    body: BatchRetrievalRequest,
+    tenant: Tenant = get_tenant_with_permissions(Resource.RETRIEVAL, [Action.READ]),
+    counter: AnyRetrievalCounter = Depends(get_retrieval_counter),
+) -> ResponseModel[List[List[RetrievalChunk]]]:
+    """
+    Run several knowledge or space retrievals in one request, for example the
+    sub-questions of an agent turn. Results are returned in query order.
+    """
+    db_engine = PluginManager().dbPlugin
+    if hasattr(db_engine, "search_chunk_list_batch"):
+        res = await db_engine.search_chunk_list_batch(tenant.tenant_id, body.queries)
+    else:
+        res = await asyncio.gather(
+            *(
+                (
+                    db_engine.search_knowledge_chunk_list(tenant.tenant_id, query)
+                    if isinstance(query, RetrievalByKnowledgeRequest)
+                    else db_engine.search_space_chunk_list(tenant.tenant_id, query)
+                )
+                for query in body.queries
+            )
+        )
+    batch_retrieval_count(counter, res)
+    for chunks in res:
+        record_retrieval_stats(tenant.tenant_id, chunks)
     return ResponseModel(success=True, data=res)
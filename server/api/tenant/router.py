@@ -6,7 +6,12 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from whiskerrag_types.model import PageQueryParams, PageResponse, Tenant
 
-from core.auth import Action, Resource, get_tenant_with_permissions
+from core.auth import (
+    Action,
+    Resource,
+    get_tenant_with_permissions,
+    invalidate_auth_cache,
+)
 from core.log import logger
 from core.plugin_manager import PluginManager
 from core.response import ResponseModel
@@ -81,6 +86,7 @@ async def delete_tenant(
     tenant = await db_engine.delete_tenant_by_id(id)
     if not tenant:
         raise HTTPException(status_code=404, detail="Tenant not found")
+    invalidate_auth_cache()
     flag = True
     logger.info("[delete_tenant_by_id][end]")
     return ResponseModel(data=flag, success=True)
@@ -108,6 +114,8 @@ async def update_tenant(
             metadata=params.metadata,
         )
     )
+    # the secret key was rotated, the old one must stop working now
+    invalidate_auth_cache()
     logger.info("[update_tenant][end]")
     return ResponseModel(data=tenant, success=True)
 
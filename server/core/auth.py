@@ -1,4 +1,5 @@
 import logging
+import secrets
 from datetime import datetime, timezone
 from typing import Callable, List, Optional, Tuple
 
@@ -8,6 +9,7 @@ from whiskerrag_utils import tracing
 
 from .cache import TTLCache
 from .plugin_manager import PluginManager
+from .settings import settings
 
 AuthResult = Tuple[bool, Optional[Tenant], Optional[APIKey], Optional[str]]
 
@@ -31,7 +33,14 @@ def is_api_key_format(auth_str: str) -> bool:
         return False
 
 
-@TTLCache(ttl=60, maxsize=1000)
+def _auth_failed(result: AuthResult) -> bool:
+    return not result[0]
+
+
+# keyed on the token itself, so "Bearer x" and "bearer x" share one entry;
+# unknown keys are remembered briefly so a misconfigured client retrying an
+# invalid key does not reach the database on every request
+@TTLCache(ttl=60, maxsize=1000, key=extract_key, negative=_auth_failed, negative_ttl=10)
 async def authenticate_ak(auth_header: str) -> AuthResult:
     api_key_str = extract_key(auth_header)
     db = PluginManager().dbPlugin
@@ -46,7 +55,9 @@ async def authenticate_ak(auth_header: str) -> AuthResult:
     return True, tenant, api_key, None
 
 
-@TTLCache(ttl=300, maxsize=1000)
+@TTLCache(
+    ttl=300, maxsize=1000, key=extract_key, negative=_auth_failed, negative_ttl=10
+)
 async def authenticate_sk(auth_header: str) -> AuthResult:
     sk = extract_key(auth_header)
     db = PluginManager().dbPlugin
@@ -57,6 +68,18 @@ async def authenticate_sk(auth_header: str) -> AuthResult:
     return True, tenant, None, None
 
 
+def invalidate_auth_cache(key_value: Optional[str] = None) -> None:
+    """
+    Drop the cached authentication of one ak/sk, or of every key when none is
+    given. Only this process is affected, other replicas follow within the ttl.
+    """
+    for authenticate in (authenticate_ak, authenticate_sk):
+        if key_value is None:
+            authenticate.cache.clear()
+        else:
+            authenticate.cache.invalidate(f"Bearer {key_value}")
+
+
 def check_api_key_validity(api_key: APIKey) -> bool:
     if not api_key.is_active:
         return False
@@ -139,6 +162,25 @@ def get_tenant_with_permissions(resource: Resource, actions: List[Action]) -> Ca
     return Depends(dependency)
 
 
+async def require_operator(
+    header_auth: Optional[str] = Header(None, alias="Authorization"),
+) -> None:
+    """
+    Dependency of endpoints that act on shared infrastructure rather than on one
+    tenant's data. They accept only OPERATOR_SECRET_KEY and are disabled while it
+    is unset.
+    """
+    operator_key = settings.get_env("OPERATOR_SECRET_KEY", "")
+    if not operator_key:
+        raise HTTPException(status_code=403, detail="Operator endpoints are disabled")
+    if not header_auth:
+        raise HTTPException(status_code=401, detail="Authorization header is missing")
+    if not secrets.compare_digest(
+        extract_key(header_auth).encode("utf-8"), operator_key.encode("utf-8")
+    ):
+        raise HTTPException(status_code=403, detail="Operator key required")
+
+
 async def authenticate_by_key_string(
     key_string: str,
     resource: Resource = Resource.PUBLIC,
@@ -1,35 +1,140 @@
+import asyncio
+import hashlib
+import random
 import time
-from functools import lru_cache, wraps
-from typing import Any, Callable, Dict
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
 
 
 class TTLCache:
-    def __init__(self, ttl: int, maxsize: int):
+    """
+    Bounded LRU cache with per-entry TTL for async functions, used as a decorator.
+
+    Keys are sha256 digests, so credentials passed as arguments are never kept in
+    memory as cache keys. Concurrent misses on the same key share one call of the
+    wrapped function. Results for which negative(result) is true are kept for
+    negative_ttl seconds at the cold end of the LRU, so a flood of invalid keys
+    evicts other invalid keys first. Each TTL is shortened by up to jitter of
+    itself so entries written together do not expire together.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        maxsize: int,
+        key: Optional[Callable[..., Any]] = None,
+        negative: Optional[Callable[[Any], bool]] = None,
+        negative_ttl: Optional[float] = None,
+        jitter: float = 0.1,
+    ):
         self.ttl = ttl
         self.maxsize = maxsize
-        self.cache: Dict[str, tuple[Any, float]] = {}
-        self._lru = lru_cache(maxsize=maxsize)
+        self.key = key
+        self.negative = negative
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.jitter = jitter
+        # digest -> (value, expires at on the monotonic clock, negative)
+        self._entries: OrderedDict[str, Tuple[Any, float, bool]] = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expired = 0
+        self.evictions = 0
 
-    def __call__(self, func: Callable):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            cache_key = str(args) + str(kwargs)
+    def make_key(self, *args, **kwargs) -> str:
+        raw = (
+            self.key(*args, **kwargs)
+            if self.key is not None
+            else (args, sorted(kwargs.items()))
+        )
+        return hashlib.sha256(repr(raw).encode("utf-8")).hexdigest()
+
+    def get(self, digest: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return False, None
+        value, expires_at, negative = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[digest]
+            self.expired += 1
+            return False, None
+        if negative:
+            self.negative_hits += 1
+        else:
+            self._entries.move_to_end(digest)
+            self.hits += 1
+        return True, value
 
-            if cache_key in self.cache:
-                result, timestamp = self.cache[cache_key]
-                if time.time() - timestamp < self.ttl:
-                    return result
-                else:
-                    del self.cache[cache_key]
+    def set(self, digest: str, value: Any) -> None:
+        negative = self.negative is not None and self.negative(value)
+        ttl = self.negative_ttl if negative else self.ttl
+        if ttl <= 0:
+            return
+        ttl *= 1 - random.uniform(0, self.jitter)
+        self._entries[digest] = (value, time.monotonic() + ttl, negative)
+        self._entries.move_to_end(digest, last=not negative)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
 
-            result = await func(*args, **kwargs)
+    def invalidate(self, *args, **kwargs) -> None:
+        """Drop the entry of a call with these arguments"""
+        self._entries.pop(self.make_key(*args, **kwargs), None)
 
-            self.cache[cache_key] = (result, time.time())
+    def clear(self) -> None:
+        self._entries.clear()
 
-            if len(self.cache) > self.maxsize:
-                oldest_key = next(iter(self.cache))
-                del self.cache[oldest_key]
+    async def _load(self, digest: str, func: Callable, args, kwargs) -> Any:
+        result = await func(*args, **kwargs)
+        self.set(digest, result)
+        return result
 
-            return result
+    def _done(self, digest: str, future: asyncio.Future) -> None:
+        if self._inflight.get(digest) is future:
+            del self._inflight[digest]
+        if not future.cancelled():
+            # retrieved here so a failure nobody awaits any more is not logged
+            future.exception()
 
+    def __call__(self, func: Callable):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            digest = self.make_key(*args, **kwargs)
+            found, value = self.get(digest)
+            if found:
+                return value
+            future = self._inflight.get(digest)
+            if future is None:
+                self.misses += 1
+                # a task of its own, so a cancelled caller does not cancel the
+                # load for the callers waiting on it
+                future = asyncio.ensure_future(self._load(digest, func, args, kwargs))
+                self._inflight[digest] = future
+                future.add_done_callback(lambda f: self._done(digest, f))
+            else:
+                self.coalesced += 1
+            return await asyncio.shield(future)
+
+        wrapper.cache = self
         return wrapper
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.negative_hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "hit_ratio": (
+                (self.hits + self.negative_hits + self.coalesced) / lookups
+                if lookups
+                else 0.0
+            ),
+        }
@@ -0,0 +1,227 @@
+import json
+import tempfile
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from pydantic import BaseModel, ValidationError
+from whiskerrag_types.interface import DBPluginInterface
+from whiskerrag_types.model import Chunk, EmbeddingModelEnum, Knowledge
+
+from .export import decode_embedding, pa
+from .log import logger
+
+DEFAULT_IMPORT_BATCH_SIZE = 1000
+# a single NDJSON line above this size is rejected instead of buffered
+MAX_NDJSON_LINE_BYTES = 16 * 1024 * 1024
+# arrow uploads are spooled to disk above this size
+ARROW_SPOOL_MAX_MEMORY = 64 * 1024 * 1024
+
+# output dimensions of the built-in embedding models, used when the tenant has no
+# chunks of the model yet
+EMBEDDING_DIMENSIONS: Dict[str, int] = {
+    EmbeddingModelEnum.OPENAI.value: 1536,
+    EmbeddingModelEnum.ALL_MINILM_L6_V2.value: 384,
+    EmbeddingModelEnum.all_mpnet_base_v2.value: 768,
+    EmbeddingModelEnum.PARAPHRASE_MULTILINGUAL_MINILM_L12_V2.value: 384,
+    EmbeddingModelEnum.TEXT2VEC_BASE_CHINESE.value: 768,
+}
+
+
+class ChunkImportError(ValueError):
+    def __init__(self, message: str, row: Optional[int] = None):
+        self.row = row
+        super().__init__(f"row {row}: {message}" if row is not None else message)
+
+
+class ImportBatchProgress(BaseModel):
+    batch: int
+    rows: int
+    imported: int
+    elapsed_ms: float
+
+
+class ImportSummary(BaseModel):
+    imported: int = 0
+    batches: List[ImportBatchProgress] = []
+
+
+async def iter_ndjson_records(stream: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    """Split a byte stream into JSON objects without holding more than one line"""
+    buffer = b""
+    row = 0
+    async for data in stream:
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > MAX_NDJSON_LINE_BYTES:
+            raise ChunkImportError("line too long", row + len(lines) + 1)
+        for line in lines:
+            row += 1
+            if line.strip():
+                yield _load_json_line(line, row)
+    if buffer.strip():
+        yield _load_json_line(buffer, row + 1)
+
+
+def _load_json_line(line: bytes, row: int) -> dict:
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ChunkImportError(f"invalid json: {e}", row)
+    if not isinstance(record, dict):
+        raise ChunkImportError("each line must be a JSON object", row)
+    return record
+
+
+async def iter_arrow_records(stream: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    """
+    Arrow IPC needs a blocking reader, so the upload is spooled (to disk once it
+    exceeds ARROW_SPOOL_MAX_MEMORY) and then read back one record batch at a time.
+    """
+    if pa is None:
+        raise ChunkImportError("pyarrow is required for arrow import")
+    with tempfile.SpooledTemporaryFile(max_size=ARROW_SPOOL_MAX_MEMORY) as spool:
+        async for data in stream:
+            spool.write(data)
+        spool.seek(0)
+        reader = pa.ipc.open_stream(pa.PythonFile(spool, mode="r"))
+        for record_batch in reader:
+            for record in record_batch.to_pylist():
+                yield record
+
+
+class ChunkImporter:
+    """
+    Validates uploaded chunks and writes them with save_chunk_list batch by batch.
+
+    The next rows are only read after the previous batch is stored, so a slow
+    database slows down the upload instead of growing memory. Every chunk must
+    belong to a knowledge of the tenant, in that knowledge's space and embedding
+    model. Chunks get new ids, so an export can be imported again.
+    """
+
+    def __init__(
+        self,
+        db_plugin: DBPluginInterface,
+        tenant_id: str,
+        space_id: Optional[str] = None,
+        batch_size: int = DEFAULT_IMPORT_BATCH_SIZE,
+    ):
+        self.db_plugin = db_plugin
+        self.tenant_id = tenant_id
+        self.space_id = space_id
+        self.batch_size = max(1, batch_size)
+        self._dimensions: Dict[str, int] = {}
+        self._knowledge: Dict[str, Optional[Knowledge]] = {}
+        # kept on the instance so callers can report progress after a failure
+        self.summary = ImportSummary()
+
+    async def _expected_dimension(self, model_name: str, observed: int) -> int:
+        if model_name in self._dimensions:
+            return self._dimensions[model_name]
+        dimension = None
+        if hasattr(self.db_plugin, "get_embedding_dimension"):
+            dimension = await self.db_plugin.get_embedding_dimension(
+                self.tenant_id, model_name
+            )
+        if dimension is None:
+            dimension = EMBEDDING_DIMENSIONS.get(model_name)
+        if dimension is None:
+            # custom model without stored chunks: keep the upload self-consistent
+            logger.warning(
+                f"No known dimension for embedding model {model_name}, "
+                f"using dimension {observed} from the upload"
+            )
+            dimension = observed
+        self._dimensions[model_name] = dimension
+        return dimension
+
+    async def _get_knowledge(self, knowledge_id: Any, row: int) -> Knowledge:
+        try:
+            knowledge_id = str(uuid.UUID(str(knowledge_id)))
+        except ValueError:
+            raise ChunkImportError("knowledge_id must be a uuid", row)
+        if knowledge_id not in self._knowledge:
+            self._knowledge[knowledge_id] = await self.db_plugin.get_knowledge(
+                self.tenant_id, knowledge_id
+            )
+        knowledge = self._knowledge[knowledge_id]
+        if knowledge is None:
+            raise ChunkImportError(f"knowledge {knowledge_id} not found", row)
+        return knowledge
+
+    async def _to_chunk(self, record: Dict[str, Any], row: int) -> Chunk:
+        record = dict(record)
+        record.pop("embedding_dim", None)
+        record.pop("chunk_id", None)
+        record["tenant_id"] = self.tenant_id
+        if not record.get("knowledge_id"):
+            raise ChunkImportError("knowledge_id is required", row)
+        knowledge = await self._get_knowledge(record["knowledge_id"], row)
+        record["knowledge_id"] = knowledge.knowledge_id
+        space_id = self.space_id or record.get("space_id") or knowledge.space_id
+        if space_id != knowledge.space_id:
+            raise ChunkImportError(
+                f"knowledge {knowledge.knowledge_id} belongs to space "
+                f"{knowledge.space_id}, not {space_id}",
+                row,
+            )
+        record["space_id"] = space_id
+        embedding = record.get("embedding")
+        if isinstance(embedding, str):
+            record["embedding"] = embedding = decode_embedding(embedding)
+        if not embedding:
+            raise ChunkImportError("embedding is required", row)
+        model_name = record.get("embedding_model_name")
+        if not model_name:
+            raise ChunkImportError("embedding_model_name is required", row)
+        knowledge_model = getattr(
+            knowledge.embedding_model_name, "value", knowledge.embedding_model_name
+        )
+        if model_name != knowledge_model:
+            raise ChunkImportError(
+                f"knowledge {knowledge.knowledge_id} is embedded with "
+                f"{knowledge_model}, not {model_name}",
+                row,
+            )
+        expected = await self._expected_dimension(model_name, len(embedding))
+        if len(embedding) != expected:
+            raise ChunkImportError(
+                f"embedding has {len(embedding)} dimensions, "
+                f"{model_name} expects {expected}",
+                row,
+            )
+        try:
+            return Chunk(**record)
+        except ValidationError as e:
+            raise ChunkImportError(str(e), row)
+
+    async def _save_batch(self, batch: List[Chunk], start: float) -> None:
+        summary = self.summary
+        await self.db_plugin.save_chunk_list(batch)
+        summary.imported += len(batch)
+        progress = ImportBatchProgress(
+            batch=len(summary.batches) + 1,
+            rows=len(batch),
+            imported=summary.imported,
+            elapsed_ms=round((time.perf_counter() - start) * 1000, 2),
+        )
+        summary.batches.append(progress)
+        logger.info(
+            f"Chunk import batch {progress.batch}: {progress.rows} rows, "
+            f"{progress.imported} total"
+        )
+
+    async def run(self, records: AsyncIterator[dict]) -> ImportSummary:
+        batch: List[Chunk] = []
+        row = 0
+        start = time.perf_counter()
+        async for record in records:
+            row += 1
+            batch.append(await self._to_chunk(record, row))
+            if len(batch) >= self.batch_size:
+                await self._save_batch(batch, start)
+                batch = []
+        if batch:
+            await self._save_batch(batch, start)
+        return self.summary
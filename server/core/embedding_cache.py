@@ -0,0 +1,228 @@
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+import numpy as np
+from whiskerrag_types.interface.embed_interface import BaseEmbedding
+from whiskerrag_utils.registry import (
+    RegisterDict,
+    RegisterTypeEnum,
+    get_all_registered_with_metadata,
+    get_registry_list,
+)
+
+from .log import logger
+from .settings import settings
+
+CacheKey = Tuple[str, str, str]
+
+
+class QueryEmbeddingCache:
+    """
+    Process-wide LRU + TTL cache for query embeddings.
+
+    Entries are keyed by (embedding_model_name, method, normalized text) and stored
+    as float64 arrays, so the byte bound reflects the real memory footprint and a
+    hit returns exactly the floats the model returned on the miss.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 3600,
+        maxsize: int = 10000,
+        max_bytes: int = 256 * 1024 * 1024,
+    ):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, Tuple[np.ndarray, float, int]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(unicodedata.normalize("NFKC", text).split())
+
+    def _make_key(self, model_name: str, method: str, text: str) -> CacheKey:
+        return (str(model_name), method, self.normalize(text))
+
+    def get(self, model_name: str, method: str, text: str) -> Optional[List[float]]:
+        key = self._make_key(model_name, method, text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            vector, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                self._remove(key, size)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return vector.tolist()
+
+    def set(
+        self, model_name: str, method: str, text: str, embedding: List[float]
+    ) -> None:
+        key = self._make_key(model_name, method, text)
+        vector = np.asarray(embedding, dtype=np.float64)
+        size = vector.nbytes + len(key[2].encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            existing = self._entries.pop(key, None)
+            if existing is not None:
+                self.current_bytes -= existing[2]
+            self._entries[key] = (vector, time.monotonic() + self.ttl, size)
+            self.current_bytes += size
+            while self._entries and (
+                len(self._entries) > self.maxsize or self.current_bytes > self.max_bytes
+            ):
+                oldest_key, (_, _, oldest_size) = next(iter(self._entries.items()))
+                self._remove(oldest_key, oldest_size)
+                self.evictions += 1
+
+    def _remove(self, key: CacheKey, size: int) -> None:
+        del self._entries[key]
+        self.current_bytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "bytes": self.current_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+def _wrap_embedding_cls(
+    model_name: str, embedding_cls: Type[BaseEmbedding], cache: QueryEmbeddingCache
+) -> Type[BaseEmbedding]:
+    """Subclass a registered embedding so text embeddings are served from the cache"""
+
+    class CachedEmbedding(embedding_cls):  # type: ignore[valid-type,misc]
+        _query_embedding_cached = True
+        _query_embedding_cache = cache
+
+        async def embed_text(self, text: str, timeout: Optional[int]) -> List[float]:
+            embedding = cache.get(model_name, "embed_text", text)
+            if embedding is None:
+                embedding = await super().embed_text(text, timeout)
+                cache.set(model_name, "embed_text", text, embedding)
+            return embedding
+
+        async def embed_text_query(
+            self, text: str, timeout: Optional[int]
+        ) -> List[float]:
+            embedding = cache.get(model_name, "embed_text_query", text)
+            if embedding is None:
+                embedding = await super().embed_text_query(text, timeout)
+                cache.set(model_name, "embed_text_query", text, embedding)
+            return embedding
+
+    CachedEmbedding.__name__ = embedding_cls.__name__
+    CachedEmbedding.__qualname__ = embedding_cls.__qualname__
+    return CachedEmbedding
+
+
+class CachedEmbeddingRegistry(RegisterDict[BaseEmbedding]):
+    """Embedding registry that wraps every class stored in it with the cache"""
+
+    def __init__(self, cache: QueryEmbeddingCache) -> None:
+        super().__init__()
+        self.cache = cache
+
+    def __setitem__(self, key: Any, value: Type[BaseEmbedding]) -> None:
+        if isinstance(value, type) and not getattr(
+            value, "_query_embedding_cached", False
+        ):
+            value = _wrap_embedding_cls(getattr(key, "value", key), value, self.cache)
+            logger.info(f"Query embedding cache enabled for {key}")
+        super().__setitem__(key, value)
+
+
+async def embed_queries(
+    embedding: BaseEmbedding,
+    model_name: str,
+    texts: List[str],
+    timeout: Optional[int] = None,
+) -> List[List[float]]:
+    """
+    Embed several query texts with one embed_documents call. Duplicates are
+    embedded once, and if the query cache is installed for the model, cached
+    texts are skipped and new embeddings are stored under "embed_text".
+    """
+    cache: Optional[QueryEmbeddingCache] = getattr(
+        embedding, "_query_embedding_cache", None
+    )
+    embeddings: Dict[str, List[float]] = {}
+    missing: List[str] = []
+    for text in dict.fromkeys(texts):
+        cached = cache.get(model_name, "embed_text", text) if cache else None
+        if cached is None:
+            missing.append(text)
+        else:
+            embeddings[text] = cached
+    if missing:
+        vectors = await embedding.embed_documents(missing, timeout)
+        for text, vector in zip(missing, vectors):
+            embeddings[text] = vector
+            if cache:
+                cache.set(model_name, "embed_text", text, vector)
+    return [embeddings[text] for text in texts]
+
+
+_query_embedding_cache: QueryEmbeddingCache | None = None
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    global _query_embedding_cache
+    if _query_embedding_cache is None:
+        _query_embedding_cache = QueryEmbeddingCache(
+            ttl=float(settings.get_env("QUERY_EMBEDDING_CACHE_TTL", 3600)),
+            maxsize=int(settings.get_env("QUERY_EMBEDDING_CACHE_MAXSIZE", 10000)),
+            max_bytes=int(
+                settings.get_env("QUERY_EMBEDDING_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+            ),
+        )
+    return _query_embedding_cache
+
+
+def install_query_embedding_cache() -> None:
+    """
+    Replace every registered embedding class with a cached subclass.
+
+    Plugins resolve embeddings through get_register at call time, so they pick up
+    the cached classes without any change. The embedding registry is swapped for
+    a CachedEmbeddingRegistry, so classes registered later are wrapped as well.
+    """
+    if settings.get_env("QUERY_EMBEDDING_CACHE_ENABLED", "true").lower() != "true":
+        logger.info("Query embedding cache is disabled")
+        return
+
+    registries = get_registry_list()
+    registry = registries[RegisterTypeEnum.EMBEDDING]
+    if isinstance(registry, CachedEmbeddingRegistry):
+        return
+    cached_registry = CachedEmbeddingRegistry(get_query_embedding_cache())
+    registered = get_all_registered_with_metadata(RegisterTypeEnum.EMBEDDING)
+    for model_name, item in registered.items():
+        cached_registry[model_name] = item["class"]
+    registries[RegisterTypeEnum.EMBEDDING] = cached_registry
@@ -0,0 +1,150 @@
+import base64
+import io
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, List
+
+import numpy as np
+
+try:
+    import pyarrow as pa  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+Batch = List[Dict[str, Any]]
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    ARROW = "arrow"
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.ARROW: "application/vnd.apache.arrow.stream",
+}
+
+
+def is_format_available(export_format: ExportFormat) -> bool:
+    return export_format != ExportFormat.ARROW or pa is not None
+
+
+def encode_embedding(embedding: Any) -> str:
+    """Little-endian float32 bytes, base64 encoded: 4 bytes per dimension"""
+    return base64.b64encode(np.asarray(embedding, dtype="<f4").tobytes()).decode()
+
+
+def decode_embedding(value: str) -> List[float]:
+    return np.frombuffer(base64.b64decode(value), dtype="<f4").tolist()
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def row_to_json(row: Dict[str, Any]) -> Dict[str, Any]:
+    data = {}
+    for key, value in row.items():
+        if key == "embedding" and value is not None:
+            data["embedding"] = encode_embedding(value)
+            data["embedding_dim"] = len(value)
+        else:
+            data[key] = _json_value(value)
+    return data
+
+
+async def iter_ndjson(batches: AsyncIterator[Batch]) -> AsyncIterator[bytes]:
+    """One JSON object per line; embeddings are base64 float32 (see encode_embedding)"""
+    async for batch in batches:
+        lines = [json.dumps(row_to_json(row), ensure_ascii=False) for row in batch]
+        if lines:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _arrow_type(value: Any) -> Any:
+    if isinstance(value, bool):
+        return pa.bool_()
+    if isinstance(value, int):
+        return pa.int64()
+    if isinstance(value, float):
+        return pa.float64()
+    if isinstance(value, datetime):
+        return pa.timestamp("us", tz="UTC")
+    return pa.string()
+
+
+def _arrow_value(value: Any, arrow_type: Any) -> Any:
+    if value is None or not pa.types.is_string(arrow_type):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(_json_value(value))
+
+
+def _arrow_schema(batch: Batch) -> Any:
+    fields = []
+    for key in batch[0].keys():
+        if key == "embedding":
+            fields.append(pa.field(key, pa.list_(pa.float32())))
+            continue
+        sample = next((row[key] for row in batch if row[key] is not None), None)
+        fields.append(pa.field(key, _arrow_type(sample)))
+    return pa.schema(fields)
+
+
+async def iter_arrow(batches: AsyncIterator[Batch]) -> AsyncIterator[bytes]:
+    """
+    Arrow IPC stream, one record batch per db batch. The schema is fixed by the
+    first batch; columns that are empty there are exported as strings.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required for arrow export")
+    # the writer tracks its own position, so the buffer can be drained per batch
+    buffer = io.BytesIO()
+    schema = None
+    writer = None
+    async for batch in batches:
+        if not batch:
+            continue
+        if writer is None:
+            schema = _arrow_schema(batch)
+            writer = pa.ipc.new_stream(pa.PythonFile(buffer, mode="w"), schema)
+        columns = []
+        for field in schema:
+            if field.name == "embedding":
+                values = [
+                    (
+                        None
+                        if row.get("embedding") is None
+                        else np.asarray(row["embedding"], dtype=np.float32)
+                    )
+                    for row in batch
+                ]
+            else:
+                values = [
+                    _arrow_value(row.get(field.name), field.type) for row in batch
+                ]
+            columns.append(pa.array(values, type=field.type))
+        writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
+        yield _drain(buffer)
+    if writer is not None:
+        writer.close()
+        yield _drain(buffer)
+
+
+def _drain(buffer: io.BytesIO) -> bytes:
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
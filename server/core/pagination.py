@@ -0,0 +1,113 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from enum import Enum
+from typing import (
+    Any,
+    Collection,
+    Generic,
+    List,
+    Optional,
+    TypeVar,
+    Union,
+    get_args,
+    get_origin,
+)
+
+from pydantic import BaseModel, Field
+from whiskerrag_types.model import PageQueryParams
+
+T = TypeVar("T")
+
+
+class CountMode(str, Enum):
+    EXACT = "exact"
+    # planner estimate, cheap on large tables but approximate
+    ESTIMATED = "estimated"
+    NONE = "none"
+
+
+class CursorPageQueryParams(PageQueryParams[T], Generic[T]):
+    """
+    Keyset pagination params. The first order_by field (default created_at) plus the
+    table primary key form the cursor, so every page costs the same regardless of
+    depth. page is ignored; pass next_cursor of the previous page instead.
+    """
+
+    cursor: Optional[str] = Field(default=None, description="next_cursor of last page")
+    count_mode: CountMode = Field(
+        default=CountMode.NONE, description="exact, estimated or none"
+    )
+
+
+class CursorPageResponse(BaseModel, Generic[T]):
+    items: List[T]
+    page_size: int
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"t": "dt", "v": value.isoformat()}
+    if isinstance(value, uuid.UUID):
+        return {"t": "uuid", "v": str(value)}
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if value.get("t") == "dt":
+            return datetime.fromisoformat(value["v"])
+        if value.get("t") == "uuid":
+            return uuid.UUID(value["v"])
+    return value
+
+
+def encode_cursor(values: List[Any]) -> str:
+    payload = json.dumps([_encode_value(value) for value in values])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        payload = base64.urlsafe_b64decode(cursor.encode("ascii"))
+        values = json.loads(payload)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return [_decode_value(value) for value in values]
+
+
+def _is_scalar_field(annotation: Any) -> bool:
+    # lists, dicts and vectors have no usable order; Optional[X] is Union[X, None]
+    types = get_args(annotation) if get_origin(annotation) is Union else (annotation,)
+    return all(
+        (get_origin(item) or item) not in (list, dict, set, tuple) for item in types
+    )
+
+
+def get_cursor_order_field(
+    page_params: CursorPageQueryParams,
+    model_class: Any,
+    default: str = "created_at",
+    columns: Optional[Collection[str]] = None,
+) -> str:
+    """
+    Keyset pagination orders by a single field. It must be a scalar model field
+    and, when the caller knows the table columns, one of them: model fields
+    such as tags or enabled are not stored in every table.
+    """
+    order_field = (page_params.order_by or default).split(",")[0].strip()
+    field = model_class.model_fields.get(order_field)
+    if (
+        field is None
+        or not _is_scalar_field(field.annotation)
+        or (columns is not None and order_field not in columns)
+    ):
+        raise ValueError(f"Invalid order field: {order_field}")
+    return order_field
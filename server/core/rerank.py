@@ -0,0 +1,92 @@
+import asyncio
+import math
+from abc import abstractmethod
+from typing import Any, List, Optional
+
+from whiskerrag_types.interface.retriever_interface import BaseRetriever
+from whiskerrag_types.model import RetrievalChunk
+from whiskerrag_utils import RegisterTypeEnum, get_register
+
+from .log import logger
+
+# query-passage pairs scored per request at most, bounds the CPU cost of a call
+RERANK_MAX_CANDIDATES = 100
+DEFAULT_RERANK_CANDIDATES = 50
+# seconds; a slower rerank returns the candidates in their retrieval order
+DEFAULT_RERANK_TIMEOUT = 2.0
+
+
+class BaseReranker(BaseRetriever):
+    """
+    Scores query-passage pairs, e.g. with a cross-encoder.
+
+    The registry has no reranker type, so rerankers are registered as
+    RegisterTypeEnum.RETRIEVER under their model name and told apart from
+    retrievers by this base class. They only score candidates and cannot
+    retrieve on their own.
+    """
+
+    async def retrieve(self, params: Any, tenant_id: str) -> List[Any]:
+        raise NotImplementedError("A reranker only scores retrieved candidates")
+
+    @abstractmethod
+    async def score(
+        self, query: str, passages: List[str], timeout: Optional[float]
+    ) -> List[float]:
+        """Relevance of every passage to the query, higher is more relevant"""
+        pass
+
+
+def get_reranker(model_name: str) -> Optional[BaseReranker]:
+    try:
+        RerankerCls = get_register(RegisterTypeEnum.RETRIEVER, model_name)
+    except KeyError:
+        # get_register raises for names nothing was registered under
+        return None
+    if RerankerCls is None or not issubclass(RerankerCls, BaseReranker):
+        return None
+    return RerankerCls()
+
+
+def _sigmoid(score: float) -> float:
+    # cross-encoder logits are unbounded, similarity is reported in [0, 1]
+    if score >= 0:
+        return 1 / (1 + math.exp(-score))
+    return math.exp(score) / (1 + math.exp(score))
+
+
+async def rerank_chunks(
+    query: str,
+    chunks: List[RetrievalChunk],
+    model_name: str,
+    top: int,
+    timeout: float = DEFAULT_RERANK_TIMEOUT,
+) -> List[RetrievalChunk]:
+    """
+    Reorder up to RERANK_MAX_CANDIDATES chunks by reranker score and keep the
+    top ones, with the squashed score as similarity. Unknown models, errors and
+    timeouts keep the retrieval order, so a slow reranker never fails a request.
+    """
+    candidates = chunks[:RERANK_MAX_CANDIDATES]
+    if not candidates:
+        return []
+    reranker = get_reranker(model_name)
+    if reranker is None:
+        logger.warning(f"Unknown reranker {model_name}, keeping retrieval order")
+        return candidates[:top]
+    try:
+        scores = await asyncio.wait_for(
+            reranker.score(query, [chunk.context for chunk in candidates], timeout),
+            timeout=timeout,
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"Rerank with {model_name} timed out after {timeout}s")
+        return candidates[:top]
+    except Exception as e:
+        logger.error(f"Rerank with {model_name} failed: {e}")
+        return candidates[:top]
+    ranked = sorted(zip(candidates, scores), key=lambda item: item[1], reverse=True)
+    return [
+        chunk.model_copy(update={"similarity": _sigmoid(float(score))})
+        for chunk, score in ranked[:top]
+    ]
@@ -0,0 +1,478 @@
+import functools
+import hashlib
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from whiskerrag_types.model import RetrievalChunk
+
+from .embedding_cache import QueryEmbeddingCache
+from .log import logger
+from .settings import settings
+
+# generation name -> value observed before the search ran
+Generations = Dict[str, int]
+Entry = Tuple[List[RetrievalChunk], Generations, float]
+
+SEARCH_METHODS = (
+    "search_space_chunk_list",
+    "search_knowledge_chunk_list",
+    "retrieve",
+)
+
+
+def tenant_generation(tenant_id: str) -> str:
+    return f"t:{tenant_id}"
+
+
+def space_generation(tenant_id: str, space_id: str) -> str:
+    return f"s:{tenant_id}:{space_id}"
+
+
+def knowledge_generation(tenant_id: str, knowledge_id: str) -> str:
+    return f"k:{tenant_id}:{knowledge_id}"
+
+
+def write_generation(tenant_id: str) -> str:
+    # bumped by every write of the tenant; guards stores, entries never depend on it
+    return f"w:{tenant_id}"
+
+
+class SharedResultStore(ABC):
+    """
+    Tier shared by all replicas. It holds serialized entries and the generation
+    counters, so a write on one replica invalidates the entries of every other.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        pass
+
+    @abstractmethod
+    async def get_generations(self, names: List[str]) -> List[int]:
+        """Current value of every counter, 0 for counters never bumped"""
+        pass
+
+    @abstractmethod
+    async def bump_generations(self, names: List[str]) -> None:
+        pass
+
+
+class RedisResultStore(SharedResultStore):
+    """
+    Redis backed shared tier. Generation counters never expire: a counter that
+    fell back to an old value would make entries written before a bump valid again.
+    """
+
+    def __init__(self, url: str, prefix: str = "whisker:retrieval:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise ImportError(
+                "RETRIEVAL_RESULT_CACHE_REDIS_URL requires the redis extra, "
+                "install it with: poetry install -E redis"
+            )
+
+        self.client = redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.client.get(f"{self.prefix}r:{key}")
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        await self.client.set(f"{self.prefix}r:{key}", value, px=int(ttl * 1000))
+
+    async def get_generations(self, names: List[str]) -> List[int]:
+        if not names:
+            return []
+        values = await self.client.mget([f"{self.prefix}g:{n}" for n in names])
+        return [int(value or 0) for value in values]
+
+    async def bump_generations(self, names: List[str]) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for name in names:
+                pipe.incr(f"{self.prefix}g:{name}")
+            await pipe.execute()
+
+
+class RetrievalResultCache:
+    """
+    Cache of retrieval results keyed by the normalized request.
+
+    An entry records the generations of its tenant, of the spaces and knowledge
+    it was scoped to and of those its chunks came from. Writes bump the
+    generations they touch, so an entry is served only while nothing it depends
+    on changed; the TTL bounds what a plugin writing around the wrappers can
+    leave stale. The in-process LRU tier is checked first, then the optional
+    shared tier.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 300,
+        maxsize: int = 10000,
+        shared: Optional[SharedResultStore] = None,
+    ):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.shared = shared
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.errors = 0
+
+    @staticmethod
+    def make_key(tenant_id: str, method: str, params: Any) -> str:
+        payload = params.model_dump(mode="json")
+        for field in ("question", "content"):
+            if isinstance(payload.get(field), str):
+                payload[field] = QueryEmbeddingCache.normalize(payload[field])
+        scope = payload.get("config", payload)
+        for field in ("space_id_list", "knowledge_id_list"):
+            if isinstance(scope.get(field), list):
+                scope[field] = sorted(scope[field])
+        raw = json.dumps([tenant_id, method, payload], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def scope_generations(tenant_id: str, params: Any) -> Optional[List[str]]:
+        """Generations a request depends on before it ran, None if unscoped"""
+        scope = params.model_dump()
+        scope = scope.get("config", scope)
+        space_ids = scope.get("space_id_list") or []
+        knowledge_ids = scope.get("knowledge_id_list") or []
+        if not space_ids and not knowledge_ids:
+            return None
+        return (
+            [write_generation(tenant_id), tenant_generation(tenant_id)]
+            + [space_generation(tenant_id, space_id) for space_id in space_ids]
+            + [knowledge_generation(tenant_id, k) for k in knowledge_ids]
+        )
+
+    async def _read_generations(self, names: Iterable[str]) -> Generations:
+        names = list(dict.fromkeys(names))
+        if self.shared is not None:
+            values = await self.shared.get_generations(names)
+        else:
+            values = [self._generations.get(name, 0) for name in names]
+        return dict(zip(names, values))
+
+    async def _is_current(self, generations: Generations) -> bool:
+        return await self._read_generations(generations) == generations
+
+    async def get(self, key: str) -> Optional[List[RetrievalChunk]]:
+        try:
+            entry = self._entries.get(key)
+            if entry is not None:
+                chunks, generations, expires_at = entry
+                if expires_at > time.monotonic() and await self._is_current(
+                    generations
+                ):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return list(chunks)
+                self._entries.pop(key, None)
+                self.stale += 1
+            if self.shared is not None:
+                value = await self.shared.get(key)
+                if value is not None:
+                    data = json.loads(value)
+                    if await self._is_current(data["generations"]):
+                        chunks = [RetrievalChunk(**c) for c in data["chunks"]]
+                        self._store_local(key, chunks, data["generations"])
+                        self.shared_hits += 1
+                        return list(chunks)
+                    self.stale += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Retrieval result cache lookup failed: {e}")
+        self.misses += 1
+        return None
+
+    async def snapshot(self, tenant_id: str, params: Any) -> Optional[Generations]:
+        """
+        Generations to store a result under, read before the search runs so a
+        write that lands during the search leaves the new entry already stale
+        """
+        names = self.scope_generations(tenant_id, params)
+        if names is None:
+            return None
+        try:
+            return await self._read_generations(names)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Retrieval result cache generation read failed: {e}")
+            return None
+
+    async def set(
+        self,
+        key: str,
+        tenant_id: str,
+        chunks: List[RetrievalChunk],
+        generations: Generations,
+    ) -> None:
+        generations = dict(generations)
+        written = generations.pop(write_generation(tenant_id), 0)
+        # chunks from spaces or knowledge outside the request scope still make
+        # the entry depend on them, a delete there must drop it
+        names = [write_generation(tenant_id)] + [
+            name
+            for name in _chunk_generations(tenant_id, chunks)
+            if name not in generations
+        ]
+        try:
+            current = await self._read_generations(names)
+            if current.pop(write_generation(tenant_id)) != written:
+                # a write landed during the search; its chunks' generations read
+                # now may already include it, so the result is not stored
+                return
+            generations.update(current)
+            self._store_local(key, chunks, generations)
+            if self.shared is not None:
+                value = json.dumps(
+                    {
+                        "generations": generations,
+                        "chunks": [c.model_dump(mode="json") for c in chunks],
+                    }
+                )
+                await self.shared.set(key, value, self.ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Retrieval result cache store failed: {e}")
+
+    def _store_local(
+        self, key: str, chunks: List[RetrievalChunk], generations: Generations
+    ) -> None:
+        self._entries.pop(key, None)
+        self._entries[key] = (
+            list(chunks),
+            dict(generations),
+            time.monotonic() + self.ttl,
+        )
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def invalidate(self, names: Iterable[str]) -> None:
+        names = list(dict.fromkeys(names))
+        if not names:
+            return
+        tenant_ids = [name.split(":")[1] for name in names]
+        names += [write_generation(tenant_id) for tenant_id in set(tenant_ids)]
+        for name in names:
+            self._generations[name] = self._generations.get(name, 0) + 1
+        if self.shared is not None:
+            try:
+                await self.shared.bump_generations(names)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Retrieval result cache invalidation failed: {e}")
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "errors": self.errors,
+            "hit_ratio": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+        }
+
+
+def _chunk_generations(tenant_id: str, chunks: List[Any]) -> List[str]:
+    names = []
+    for chunk in chunks:
+        names.append(space_generation(tenant_id, chunk.space_id))
+        names.append(knowledge_generation(tenant_id, str(chunk.knowledge_id)))
+    return names
+
+
+def _cached_search(
+    cache: RetrievalResultCache, method: str, search: Callable[..., Awaitable[Any]]
+) -> Callable[..., Awaitable[Any]]:
+    @functools.wraps(search)
+    async def wrapper(tenant_id: str, params: Any) -> List[RetrievalChunk]:
+        key = cache.make_key(tenant_id, method, params)
+        chunks = await cache.get(key)
+        if chunks is not None:
+            return chunks
+        generations = await cache.snapshot(tenant_id, params)
+        chunks = await search(tenant_id, params)
+        if generations is not None:
+            await cache.set(key, tenant_id, chunks, generations)
+        return chunks
+
+    return wrapper
+
+
+def _cached_search_batch(
+    cache: RetrievalResultCache, search_batch: Callable[..., Awaitable[Any]]
+) -> Callable[..., Awaitable[Any]]:
+    @functools.wraps(search_batch)
+    async def wrapper(tenant_id: str, params_list: List[Any]) -> List[List[Any]]:
+        # the batch endpoint takes both request types, keyed like the single calls
+        keys = [
+            cache.make_key(
+                tenant_id,
+                (
+                    "search_space_chunk_list"
+                    if hasattr(params, "space_id_list")
+                    else "search_knowledge_chunk_list"
+                ),
+                params,
+            )
+            for params in params_list
+        ]
+        results: List[Optional[List[Any]]] = [await cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            generations = [
+                await cache.snapshot(tenant_id, params_list[i]) for i in missing
+            ]
+            found = await search_batch(tenant_id, [params_list[i] for i in missing])
+            for i, snapshot, chunks in zip(missing, generations, found):
+                results[i] = chunks
+                if snapshot is not None:
+                    await cache.set(keys[i], tenant_id, chunks, snapshot)
+        return results
+
+    return wrapper
+
+
+def _invalidating(
+    write: Callable[..., Awaitable[Any]],
+    generations: Callable[..., Iterable[str]],
+    cache: RetrievalResultCache,
+) -> Callable[..., Awaitable[Any]]:
+    @functools.wraps(write)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        result = None
+        try:
+            result = await write(*args, **kwargs)
+            return result
+        finally:
+            # a failed write may still have changed rows, invalidate regardless
+            await cache.invalidate(generations(result, *args, **kwargs))
+
+    return wrapper
+
+
+def _saved_chunks(result: Any, chunks: List[Any]) -> List[str]:
+    names = []
+    for chunk in chunks or []:
+        names.extend(_chunk_generations(chunk.tenant_id, [chunk]))
+    return names
+
+
+def _deleted_knowledge_chunks(
+    result: Any, tenant_id: str, knowledge_ids: List[str]
+) -> List[str]:
+    return [knowledge_generation(tenant_id, k) for k in knowledge_ids]
+
+
+def _deleted_chunk(result: Any, tenant_id: str, *args: Any) -> List[str]:
+    chunks = result if isinstance(result, list) else [result]
+    chunks = [chunk for chunk in chunks if chunk is not None]
+    if not chunks:
+        # nothing tells which knowledge the chunk belonged to
+        return [tenant_generation(tenant_id)]
+    return _chunk_generations(tenant_id, chunks)
+
+
+def _deleted_knowledge(
+    result: Any, tenant_id: str, knowledge_ids: List[str], *args: Any, **kwargs: Any
+) -> List[str]:
+    return [knowledge_generation(tenant_id, k) for k in knowledge_ids]
+
+
+def _updated_knowledge(result: Any, knowledge: Any) -> List[str]:
+    return [
+        space_generation(knowledge.tenant_id, knowledge.space_id),
+        knowledge_generation(knowledge.tenant_id, str(knowledge.knowledge_id)),
+    ]
+
+
+def _changed_enabled_status(
+    result: Any, tenant_id: str, knowledge_id: str, enabled: bool
+) -> List[str]:
+    if enabled:
+        # enabled chunks join results of spaces the call does not name
+        return [tenant_generation(tenant_id)]
+    return [knowledge_generation(tenant_id, knowledge_id)]
+
+
+def _deleted_space(result: Any, tenant_id: str, *args: Any) -> List[str]:
+    if not args:
+        return [tenant_generation(tenant_id)]
+    return [space_generation(tenant_id, args[0])]
+
+
+WRITE_METHODS: Dict[str, Callable[..., Iterable[str]]] = {
+    "save_chunk_list": _saved_chunks,
+    "update_chunk_list": _saved_chunks,
+    "delete_knowledge_chunk": _deleted_knowledge_chunks,
+    "delete_chunk_by_id": _deleted_chunk,
+    "delete_knowledge": _deleted_knowledge,
+    "update_knowledge": _updated_knowledge,
+    "update_knowledge_enabled_status": _changed_enabled_status,
+    "delete_space": _deleted_space,
+}
+
+
+_retrieval_result_cache: RetrievalResultCache | None = None
+
+
+def get_retrieval_result_cache() -> Optional[RetrievalResultCache]:
+    return _retrieval_result_cache
+
+
+def install_retrieval_result_cache(db_plugin: Any) -> None:
+    """
+    Wrap the search methods of the db plugin with the result cache and its
+    write methods with invalidation. A hit returns before the plugin is called,
+    so it costs neither a query embedding nor a database round trip.
+    """
+    global _retrieval_result_cache
+    if settings.get_env("RETRIEVAL_RESULT_CACHE_ENABLED", "false").lower() != "true":
+        logger.info("Retrieval result cache is disabled")
+        return
+    if getattr(db_plugin, "_retrieval_result_cached", False):
+        return
+
+    shared = None
+    redis_url = settings.get_env("RETRIEVAL_RESULT_CACHE_REDIS_URL", "")
+    if redis_url:
+        shared = RedisResultStore(redis_url)
+    cache = RetrievalResultCache(
+        ttl=float(settings.get_env("RETRIEVAL_RESULT_CACHE_TTL", 300)),
+        maxsize=int(settings.get_env("RETRIEVAL_RESULT_CACHE_MAXSIZE", 10000)),
+        shared=shared,
+    )
+    for method in SEARCH_METHODS:
+        if hasattr(db_plugin, method):
+            search = getattr(db_plugin, method)
+            setattr(db_plugin, method, _cached_search(cache, method, search))
+    if hasattr(db_plugin, "search_chunk_list_batch"):
+        db_plugin.search_chunk_list_batch = _cached_search_batch(
+            cache, db_plugin.search_chunk_list_batch
+        )
+    for method, generations in WRITE_METHODS.items():
+        if hasattr(db_plugin, method):
+            write = getattr(db_plugin, method)
+            setattr(db_plugin, method, _invalidating(write, generations, cache))
+    db_plugin._retrieval_result_cached = True
+    _retrieval_result_cache = cache
+    logger.info(f"Retrieval result cache enabled, shared tier: {redis_url != ''}")
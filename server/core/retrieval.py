@@ -0,0 +1,152 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import Enum
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, Field, model_validator
+from whiskerrag_types.model import RetrievalRequest
+
+from .rerank import (
+    DEFAULT_RERANK_CANDIDATES,
+    DEFAULT_RERANK_TIMEOUT,
+    RERANK_MAX_CANDIDATES,
+)
+
+# k in 1 / (k + rank), 60 is the value from the original RRF paper
+DEFAULT_RRF_K = 60
+# upper bound of top; the legacy space/knowledge requests default to 1024 and
+# are clamped to it
+MAX_RETRIEVAL_TOP = 1000
+
+
+class RecallLevel(str, Enum):
+    """Recall/latency trade-off of approximate vector search"""
+
+    FAST = "fast"
+    BALANCED = "balanced"
+    ACCURATE = "accurate"
+
+
+# (ivfflat.probes, hnsw.ef_search) per level; 40 is the hnsw default, balanced
+# probes suit an ivfflat index of about 100 lists (probes = sqrt(lists))
+ANN_SEARCH_PARAMS: Dict[RecallLevel, Tuple[int, int]] = {
+    RecallLevel.FAST: (1, 40),
+    RecallLevel.BALANCED: (10, 100),
+    RecallLevel.ACCURATE: (40, 400),
+}
+
+
+class HybridRetrievalConfig(BaseModel):
+    """
+    Parsed form of RetrievalRequest.config for the built-in retrievers.
+
+    type selects the stages: "hybrid" runs vector and full-text search and fuses
+    them, "vector" and "fulltext" run a single stage.
+    """
+
+    type: str = "hybrid"
+    embedding_model_name: str
+    space_id_list: Optional[List[str]] = None
+    knowledge_id_list: Optional[List[str]] = None
+    top: int = Field(10, ge=1, le=MAX_RETRIEVAL_TOP)
+    similarity_threshold: float = Field(0.0, ge=0.0, le=1.0)
+    metadata_filter: dict = Field(default_factory=dict)
+    # candidates fetched per stage before fusion, defaults to 4 * top
+    candidates: Optional[int] = Field(None, ge=1, le=5000)
+    rrf_k: int = Field(DEFAULT_RRF_K, ge=1)
+    vector_weight: float = Field(1.0, ge=0.0)
+    text_weight: float = Field(1.0, ge=0.0)
+    # None uses the server default (VECTOR_SEARCH_RECALL)
+    recall: Optional[RecallLevel] = None
+    # reranker registered as a retriever (see core.rerank); it reorders the best
+    # rerank_candidates results and keeps top of them
+    rerank_model: Optional[str] = None
+    rerank_candidates: int = Field(
+        DEFAULT_RERANK_CANDIDATES, ge=1, le=RERANK_MAX_CANDIDATES
+    )
+    rerank_timeout: float = Field(DEFAULT_RERANK_TIMEOUT, gt=0.0, le=30.0)
+
+    @model_validator(mode="after")
+    def validate_scope(self) -> "HybridRetrievalConfig":
+        if not self.space_id_list and not self.knowledge_id_list:
+            raise ValueError("space_id_list or knowledge_id_list is required")
+        if self.type not in ("hybrid", "vector", "fulltext"):
+            raise ValueError(f"Unsupported retrieval type: {self.type}")
+        return self
+
+    @property
+    def result_limit(self) -> int:
+        """Results retrieved before the rerank stage cuts them down to top"""
+        if self.rerank_model:
+            return max(self.top, self.rerank_candidates)
+        return self.top
+
+    @property
+    def candidate_limit(self) -> int:
+        return self.candidates or max(self.top * 4, self.result_limit)
+
+    @classmethod
+    def from_request(cls, params: RetrievalRequest) -> "HybridRetrievalConfig":
+        return cls.model_validate(params.config.model_dump())
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: Sequence[Tuple[Sequence[str], float]], k: int = DEFAULT_RRF_K
+) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked id lists with weighted reciprocal rank fusion.
+
+    Each list contributes weight / (k + rank) for every id it contains (rank starts
+    at 1). Scores are normalized by the best achievable score, so an id ranked first
+    by every list scores 1.0. Returns (id, score) sorted by score descending.
+    """
+    scores: Dict[str, float] = {}
+    for ids, weight in ranked_lists:
+        for rank, item_id in enumerate(ids, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + weight / (k + rank)
+    max_score = sum(weight for _, weight in ranked_lists) / (k + 1)
+    if max_score <= 0:
+        return []
+    fused = [(item_id, score / max_score) for item_id, score in scores.items()]
+    fused.sort(key=lambda item: item[1], reverse=True)
+    return fused
+
+
+# latest StageTimer of the current request, read back for the Server-Timing header
+_current_timer: ContextVar[Optional["StageTimer"]] = ContextVar(
+    "retrieval_stage_timer", default=None
+)
+
+
+class StageTimer:
+    """Collects wall time per retrieval stage in milliseconds"""
+
+    def __init__(self) -> None:
+        self.timings: Dict[str, float] = {}
+        self._start = time.perf_counter()
+        _current_timer.set(self)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+    def finish(self) -> Dict[str, float]:
+        self.timings["total"] = round((time.perf_counter() - self._start) * 1000, 2)
+        return self.timings
+
+    def __str__(self) -> str:
+        return ", ".join(f"{name}={ms}ms" for name, ms in self.timings.items())
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.timings.items())
+
+
+def server_timing_header() -> Optional[str]:
+    """Server-Timing value of the retrieval run by the current request, if any"""
+    timer = _current_timer.get()
+    return timer.server_timing() if timer and timer.timings else None
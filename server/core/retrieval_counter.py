@@ -1,30 +1,131 @@
 import asyncio
+import os
 import threading
+import time
 import traceback
+import uuid
 from collections import defaultdict
+from typing import List, Optional, Tuple, Union
 
 from whiskerrag_types.interface import DBPluginInterface
 from whiskerrag_types.model import RetrievalChunk
 
 from .log import logger
 from .plugin_manager import PluginManager
+from .settings import settings
 
+DEFAULT_SPILL_PATH = "./data/retrieval_counter.spill"
+
+
+def retrieval_count_arrays(records: dict[str, int]) -> Tuple[List[str], List[int]]:
+    """
+    Knowledge ids and deltas as parallel arrays for one increment statement.
+    Ids are sorted so concurrent flushes lock rows in the same order, and ids
+    that are not uuids are dropped instead of failing the whole batch.
+    """
+    ids, deltas = [], []
+    for key in sorted(records):
+        try:
+            uuid.UUID(str(key))
+        except ValueError:
+            logger.warning(f"Skipping retrieval count of invalid knowledge id {key}")
+            continue
+        ids.append(str(key))
+        deltas.append(int(records[key]))
+    return ids, deltas
+
+
+class FlushStatsMixin:
+    """Flush retry policy and flush metrics shared by both counter modes"""
+
+    flush_interval: float
+    # attempts per flush; the data stays buffered for the next flush after that
+    max_flush_attempts = 3
+    retry_backoff = 0.5
+    max_retry_backoff = 5.0
+
+    def _init_flush_stats(self) -> None:
+        self.flush_count = 0
+        self.flush_failures = 0
+        self.flush_retries = 0
+        self.last_flush_duration = 0.0
+        self.max_flush_duration = 0.0
+
+    def _retry_delay(self, attempt: int) -> float:
+        return min(self.retry_backoff * 2**attempt, self.max_retry_backoff)
+
+    def _record_flush_duration(self, duration: float, size: int) -> None:
+        self.flush_count += 1
+        self.last_flush_duration = duration
+        self.max_flush_duration = max(self.max_flush_duration, duration)
+        if duration > self.flush_interval:
+            logger.warning(
+                f"Flushing {size} retrieval counts took {duration:.1f}s, "
+                f"longer than the {self.flush_interval}s flush interval"
+            )
+
+    def stats(self) -> dict:
+        return {
+            "flush_count": self.flush_count,
+            "flush_failures": self.flush_failures,
+            "flush_retries": self.flush_retries,
+            "last_flush_duration": self.last_flush_duration,
+            "max_flush_duration": self.max_flush_duration,
+        }
+
+
+class RetrievalCounter(FlushStatsMixin):
+    """
+    Thread based counter: sharded buffers, flushed by a daemon thread that runs
+    each write on a fresh event loop. Used when no server loop is available or
+    RETRIEVAL_COUNTER_MODE is "thread".
+
+    Recording never waits for I/O: a shard lock only guards the increment, and
+    a full shard wakes the flush thread instead of flushing on the caller. Until
+    that flush swaps the buffers, keys the full shard does not hold yet go to
+    the overflow policy: "drop" counts and discards them, "spill" appends them
+    to spill_path for the next flush. Memory stays within shards *
+    max_buffer_size keys either way.
+    """
 
-class RetrievalCounter:
     max_buffer_size = 100000
+    # how long shutdown waits for the final flush of the flush thread
+    shutdown_timeout = 10.0
 
     def __init__(
-        self, flush_interval=60, shards=16, db_plugin: DBPluginInterface = None
+        self,
+        flush_interval=60,
+        shards=16,
+        db_plugin: DBPluginInterface = None,
+        overflow: str = "drop",
+        spill_path: Optional[str] = None,
     ):
+        if overflow not in ("drop", "spill"):
+            raise ValueError(f"Unknown retrieval counter overflow policy {overflow}")
+        if overflow == "spill":
+            if not spill_path:
+                raise ValueError("The spill overflow policy requires a spill_path")
+            os.makedirs(os.path.dirname(spill_path) or ".", exist_ok=True)
         self.flush_interval = flush_interval
         self.shards = shards
         self.db_plugin = db_plugin
+        self.overflow = overflow
+        self.spill_path = spill_path
         self.active_buffers = [defaultdict(int) for _ in range(shards)]
         self.backup_buffers = [defaultdict(int) for _ in range(shards)]
         self.locks = [threading.Lock() for _ in range(shards)]
+        # serializes flushes of the flush thread, force_flush and shutdown
+        self._flush_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self.pending_counts: dict = {}
+        # dropped per shard, counted under the shard lock
+        self.dropped_counts = [0] * shards
+        self.spilled = 0
         self.running = True
         self.stop_event = threading.Event()
+        self.flush_requested = threading.Event()
         self._shutdown_called = False
+        self._init_flush_stats()
         self.flush_thread = threading.Thread(
             target=self._flush_loop, name=f"RetrievalCounter-{id(self)}", daemon=True
         )
@@ -38,9 +139,16 @@ class RetrievalCounter:
             return
         shard_id = self._get_shard(key)
         with self.locks[shard_id]:
-            if len(self.active_buffers[shard_id]) >= self.max_buffer_size:
-                self._flush()
-            self.active_buffers[shard_id][key] += count
+            buffer = self.active_buffers[shard_id]
+            if key in buffer or len(buffer) < self.max_buffer_size:
+                buffer[key] += count
+                return
+            if self.overflow == "drop":
+                self.dropped_counts[shard_id] += count
+        if not self.flush_requested.is_set():
+            self.flush_requested.set()
+        if self.overflow == "spill":
+            self._spill(key, count)
 
     def batch_record(self, records: dict[str, int]):
         if not records or not self.running:
@@ -48,49 +156,83 @@ class RetrievalCounter:
         for key, count in records.items():
             self.record(key, count)
 
+    @property
+    def dropped(self) -> int:
+        return sum(self.dropped_counts)
+
+    def _spill(self, key, count: int) -> None:
+        with self._spill_lock:
+            try:
+                with open(self.spill_path, "a") as f:
+                    f.write(f"{count}\t{key}\n")
+                self.spilled += count
+            except OSError as e:
+                logger.error(f"Failed to spill retrieval count: {e}")
+
+    def _read_spill(self) -> dict:
+        """Take the spilled counts, the file is removed once read"""
+        if self.overflow != "spill":
+            return {}
+        counts = defaultdict(int)
+        with self._spill_lock:
+            try:
+                with open(self.spill_path) as f:
+                    lines = f.readlines()
+                os.remove(self.spill_path)
+            except FileNotFoundError:
+                return {}
+        for line in lines:
+            count, _, key = line.rstrip("\n").partition("\t")
+            counts[key] += int(count)
+        return counts
+
     def _flush_loop(self):
         try:
             while self.running:
-                if self.stop_event.wait(timeout=self.flush_interval):
-                    break
+                # a full shard requests an early flush
+                self.flush_requested.wait(timeout=self.flush_interval)
+                self.flush_requested.clear()
                 if self.running:
                     self._flush()
         except Exception as e:
             logger.error(f"Error in flush loop: {e}")
         finally:
+            # the final flush runs here rather than on the thread calling shutdown,
+            # which may be serving an event loop that asyncio.run cannot nest in
+            try:
+                self._flush()
+            except Exception as e:
+                logger.warning(f"Error during final flush: {e}")
             logger.debug(f"Flush thread {threading.current_thread().name} exited")
 
     def _flush(self):
         """Switch buffers and write to the database"""
-        if not self.running:
-            return
-
-        # 1. Switch the buffers for all shards
-        for i in range(self.shards):
-            with self.locks[i]:
-                self.active_buffers[i], self.backup_buffers[i] = (
-                    self.backup_buffers[i],
-                    self.active_buffers[i],
-                )
-
-        # 2. Merge data from all shards and write to the database
-        merged_data = defaultdict(int)
-        for buf in self.backup_buffers:
-            for key, count in buf.items():
-                merged_data[key] += count
-        is_success = self._write_to_database(merged_data)
-        if is_success:
-            # 3. Clear the backup buffers
+        with self._flush_lock:
+            # 1. Switch the buffers for all shards
+            for i in range(self.shards):
+                with self.locks[i]:
+                    self.active_buffers[i], self.backup_buffers[i] = (
+                        self.backup_buffers[i],
+                        self.active_buffers[i],
+                    )
+
+            # 2. Merge data from all shards, spilled counts and counts of failed
+            # flushes, then write
+            merged_data = defaultdict(int, self.pending_counts)
             for buf in self.backup_buffers:
+                for key, count in buf.items():
+                    merged_data[key] += count
+                # 3. Clear the backup buffers, a failed write keeps the merged counts
                 buf.clear()
+            for key, count in self._read_spill().items():
+                merged_data[key] += count
+            is_success = self._write_to_database(merged_data)
+            self.pending_counts = {} if is_success else dict(merged_data)
 
     def _write_to_database(self, data) -> bool:
         if not data:
             return True
 
-        if not self.running:
-            return False
-
         # Check if db_plugin is available
         if self.db_plugin is None:
             try:
@@ -103,18 +245,35 @@ class RetrievalCounter:
             logger.warning("Database plugin is None, skipping flush")
             return False
 
+        start = time.monotonic()
         try:
-            asyncio.run(self.db_plugin.batch_update_knowledge_retrieval_count(data))
-            logger.debug(f"Flushed {len(data)} retrieval counts successfully")
-            return True
-        except Exception:
-            logger.error(f"Error flushing retrieval counts: {traceback.format_exc()}")
+            for attempt in range(self.max_flush_attempts):
+                try:
+                    asyncio.run(
+                        self.db_plugin.batch_update_knowledge_retrieval_count(data)
+                    )
+                    logger.debug(f"Flushed {len(data)} retrieval counts successfully")
+                    return True
+                except Exception:
+                    logger.error(
+                        f"Error flushing retrieval counts: {traceback.format_exc()}"
+                    )
+                    if attempt + 1 == self.max_flush_attempts:
+                        break
+                    self.flush_retries += 1
+                    # a shutdown cuts the backoff short, the final flush still tries
+                    self.stop_event.wait(self._retry_delay(attempt))
+            self.flush_failures += 1
             return False
+        finally:
+            self._record_flush_duration(time.monotonic() - start, len(data))
 
     def force_flush(self):
         """Force flush all buffers immediately"""
-        if self.running:
-            self._flush()
+        self._flush()
+
+    def stats(self) -> dict:
+        return {**super().stats(), "dropped": self.dropped, "spilled": self.spilled}
 
     def shutdown(self):
         if self._shutdown_called:
@@ -124,30 +283,171 @@ class RetrievalCounter:
         self._shutdown_called = True
         self.running = False
         self.stop_event.set()
+        self.flush_requested.set()
+
+        # Wait for the flush thread to write what is buffered and exit
+        self.flush_thread.join(timeout=self.shutdown_timeout)
+        if self.flush_thread.is_alive():
+            logger.warning("Flush thread did not finish within timeout")
+
+
+class AsyncRetrievalCounter(FlushStatsMixin):
+    """
+    Counter living on the server event loop. Handlers record into a plain dict
+    on the loop thread, so recording needs no lock, and a task on the same loop
+    flushes it through the db plugin's own pool instead of a new loop per flush.
+    Records from other threads are handed to the loop.
+    """
+
+    max_buffer_size = 100000
+
+    def __init__(self, flush_interval=60, db_plugin: DBPluginInterface = None):
+        self.flush_interval = flush_interval
+        self.db_plugin = db_plugin
+        self.buffer: dict = defaultdict(int)
+        self.pending_counts: dict = {}
+        self.running = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.dropped = 0
+        self._init_flush_stats()
+
+    def start(self) -> None:
+        """Start the flush task, must be called on the loop that serves requests"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self.running = True
+        self._task = self._loop.create_task(
+            self._flush_loop(), name=f"AsyncRetrievalCounter-{id(self)}"
+        )
+
+    def _on_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _add(self, records: dict[str, int]) -> None:
+        for key, count in records.items():
+            if key in self.buffer or len(self.buffer) < self.max_buffer_size:
+                self.buffer[key] += count
+            else:
+                self.dropped += count
+        if len(self.buffer) >= self.max_buffer_size:
+            # flush early on the flush task, the caller does not wait for it
+            self._wakeup.set()
+
+    def record(self, key, count=1):
+        self.batch_record({key: count})
+
+    def batch_record(self, records: dict[str, int]):
+        if not records or not self.running:
+            return
+        if self._on_loop():
+            self._add(records)
+        else:
+            self._loop.call_soon_threadsafe(self._add, dict(records))
+
+    async def _flush_loop(self) -> None:
+        while self.running:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self.running:
+                break
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error in flush loop: {e}")
+
+    async def flush(self) -> bool:
+        async with self._flush_lock:
+            data, self.buffer = self.buffer, defaultdict(int)
+            merged_data = defaultdict(int, self.pending_counts)
+            for key, count in data.items():
+                merged_data[key] += count
+            is_success = await self._write_to_database(merged_data)
+            self.pending_counts = {} if is_success else dict(merged_data)
+            return is_success
+
+    async def _write_to_database(self, data) -> bool:
+        if not data:
+            return True
+        if self.db_plugin is None:
+            self.db_plugin = PluginManager().dbPlugin
+        if self.db_plugin is None:
+            logger.warning("Database plugin is None, skipping flush")
+            return False
+
+        start = time.monotonic()
+        try:
+            for attempt in range(self.max_flush_attempts):
+                try:
+                    await self.db_plugin.batch_update_knowledge_retrieval_count(
+                        dict(data)
+                    )
+                    logger.debug(f"Flushed {len(data)} retrieval counts successfully")
+                    return True
+                except Exception:
+                    logger.error(
+                        f"Error flushing retrieval counts: {traceback.format_exc()}"
+                    )
+                    if attempt + 1 == self.max_flush_attempts:
+                        break
+                    self.flush_retries += 1
+                    await asyncio.sleep(self._retry_delay(attempt))
+            self.flush_failures += 1
+            return False
+        finally:
+            self._record_flush_duration(time.monotonic() - start, len(data))
 
-        # Final flush
+    def stats(self) -> dict:
+        return {**super().stats(), "dropped": self.dropped}
+
+    async def shutdown(self) -> None:
+        """Stop the flush task and write what is buffered, before the pool closes"""
+        if not self.running:
+            return
+        logger.debug("Shutting down AsyncRetrievalCounter")
+        self.running = False
+        self._wakeup.set()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
         try:
-            self.force_flush()
+            await self.flush()
         except Exception as e:
             logger.warning(f"Error during final flush: {e}")
 
-        # Wait for thread to finish
-        if self.flush_thread.is_alive():
-            self.flush_thread.join(timeout=3.0)
-            if self.flush_thread.is_alive():
-                logger.warning(f"Flush thread did not finish within timeout")
 
+AnyRetrievalCounter = Union[RetrievalCounter, AsyncRetrievalCounter]
 
-def retrieval_count(counter: RetrievalCounter, chunks: list[RetrievalChunk]):
+
+def retrieval_count(counter: AnyRetrievalCounter, chunks: list[RetrievalChunk]):
     counter.batch_record(
         {k: 1 for k in list(set([chunk.knowledge_id for chunk in chunks]))}
     )
 
 
-_retrieval_counter: RetrievalCounter | None = None
+def batch_retrieval_count(
+    counter: AnyRetrievalCounter, results: list[list[RetrievalChunk]]
+):
+    """One counter update for a batch, a knowledge counts once per query hit"""
+    records = defaultdict(int)
+    for chunks in results:
+        for knowledge_id in set(chunk.knowledge_id for chunk in chunks):
+            records[knowledge_id] += 1
+    counter.batch_record(dict(records))
+
 
+_retrieval_counter: AnyRetrievalCounter | None = None
 
-def get_retrieval_counter() -> RetrievalCounter:
+
+def get_retrieval_counter() -> AnyRetrievalCounter:
     global _retrieval_counter
     if _retrieval_counter is None:
         # Initialize with None db_plugin, it will be set when available
@@ -158,24 +458,43 @@ def get_retrieval_counter() -> RetrievalCounter:
             db_plugin = None
 
         _retrieval_counter = RetrievalCounter(
-            flush_interval=60, shards=16, db_plugin=db_plugin
+            flush_interval=60,
+            shards=16,
+            db_plugin=db_plugin,
+            overflow=settings.get_env("RETRIEVAL_COUNTER_OVERFLOW", "drop").lower(),
+            spill_path=settings.get_env(
+                "RETRIEVAL_COUNTER_SPILL_PATH", DEFAULT_SPILL_PATH
+            ),
         )
     return _retrieval_counter
 
 
-def shutdown_retrieval_counter():
+async def shutdown_retrieval_counter():
     """Shutdown the global retrieval counter"""
     global _retrieval_counter
-    if _retrieval_counter is not None:
-        _retrieval_counter.shutdown()
-        _retrieval_counter = None
+    counter, _retrieval_counter = _retrieval_counter, None
+    if isinstance(counter, AsyncRetrievalCounter):
+        await counter.shutdown()
+    elif counter is not None:
+        # joining the flush thread blocks, keep it off the event loop
+        await asyncio.to_thread(counter.shutdown)
+    if counter is not None:
         logger.debug("Global retrieval counter shut down")
 
 
-def initialize_retrieval_counter():
-    """Initialize the global retrieval counter"""
+async def initialize_retrieval_counter():
+    """
+    Initialize the global retrieval counter. By default it runs on the server
+    loop; with RETRIEVAL_COUNTER_MODE=thread the thread based counter is created
+    on first access via get_retrieval_counter() instead.
+    """
     global _retrieval_counter
     # Ensure any existing counter is shut down first
-    shutdown_retrieval_counter()
-    # The counter will be created on first access via get_retrieval_counter()
+    await shutdown_retrieval_counter()
+    if settings.get_env("RETRIEVAL_COUNTER_MODE", "async").lower() == "async":
+        counter = AsyncRetrievalCounter(
+            flush_interval=60, db_plugin=PluginManager().dbPlugin
+        )
+        counter.start()
+        _retrieval_counter = counter
     logger.debug("Retrieval counter initialized")
@@ -0,0 +1,287 @@
+import asyncio
+import fcntl
+import json
+import os
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Dict, List, NamedTuple, Optional, Tuple
+
+from whiskerrag_types.model import RetrievalChunk
+
+from .log import logger
+from .plugin_manager import PluginManager
+from .settings import settings
+
+BUCKET_SECONDS = 60
+DEFAULT_RETRIEVAL_STATS_DIR = "./data/retrieval_stats"
+# seconds of hits held in memory only, what a crash can lose
+DEFAULT_SPOOL_INTERVAL = 1.0
+# seconds between bulk loads of sealed spool segments into the database
+DEFAULT_LOAD_INTERVAL = 60.0
+# days of minute buckets kept, the daily rollups are kept indefinitely
+DEFAULT_RETENTION_DAYS = 30
+PRUNE_INTERVAL = 3600.0
+
+RETRIEVAL_STATS_TABLE = "retrieval_stats"
+RETRIEVAL_STATS_DAILY_TABLE = "retrieval_stats_daily"
+RETRIEVAL_STATS_TOTAL_TABLE = "retrieval_stats_total"
+RETRIEVAL_STATS_SEGMENT_TABLE = "retrieval_stats_segment"
+
+OPEN_SUFFIX = ".open"
+SEALED_SUFFIX = ".ndjson"
+
+# (tenant_id, space_id, knowledge_id, chunk_id, bucket start in epoch seconds)
+StatsKey = Tuple[str, str, str, str, int]
+
+
+class RetrievalStatRow(NamedTuple):
+    bucket: datetime
+    tenant_id: str
+    space_id: str
+    knowledge_id: str
+    chunk_id: str
+    hits: int
+
+
+def _is_uuid(value: str) -> bool:
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+
+class RetrievalStatsSpool:
+    """
+    Append-only segment files of aggregated hit counts, one JSON array per line.
+
+    Counts are appended to the open segment and fsynced. Sealing renames it so
+    it can be loaded and a new segment is opened. A segment is deleted only
+    after it was loaded, its file name is the id the database uses to load it
+    exactly once.
+
+    Several processes can share the directory: each holds an flock on its open
+    segment, and sealing takes over only open segments whose lock is free, those
+    left behind by a process that exited or crashed.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._open_file: Optional[IO[str]] = None
+        self._open_path: Optional[Path] = None
+
+    def _open_segment(self) -> IO[str]:
+        segment_id = uuid.uuid4()
+        # locked under a name seal() ignores, so no one sees it without the lock
+        new_path = self.directory / f".{segment_id}.new"
+        f = open(new_path, "a", encoding="utf-8")
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        self._open_path = self.directory / f"{segment_id}{OPEN_SUFFIX}"
+        new_path.rename(self._open_path)
+        return f
+
+    def append(self, counts: Dict[StatsKey, int]) -> None:
+        if not counts:
+            return
+        if self._open_file is None:
+            self._open_file = self._open_segment()
+        lines = "".join(
+            json.dumps([*key, count], separators=(",", ":")) + "\n"
+            for key, count in counts.items()
+        )
+        self._open_file.write(lines)
+        self._open_file.flush()
+        os.fsync(self._open_file.fileno())
+
+    def seal(self) -> None:
+        """Seal the open segment and segments no live process holds open"""
+        if self._open_file is not None:
+            # renamed before the lock is released, so no one else seals it
+            self._open_path.rename(self._open_path.with_suffix(SEALED_SUFFIX))
+            self._open_file.close()
+            self._open_file = None
+        for path in self.directory.glob(f"*{OPEN_SUFFIX}"):
+            try:
+                with open(path, "rb") as f:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    path.rename(path.with_suffix(SEALED_SUFFIX))
+            except (BlockingIOError, FileNotFoundError):
+                # written by a live process, or sealed by another one just now
+                continue
+
+    def sealed(self) -> List[Path]:
+        return sorted(self.directory.glob(f"*{SEALED_SUFFIX}"))
+
+    @staticmethod
+    def read(path: Path) -> Dict[StatsKey, int]:
+        counts: Dict[StatsKey, int] = defaultdict(int)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    # torn write of a crash, the line never became durable
+                    break
+                *key, count = json.loads(line)
+                counts[tuple(key)] += count
+        return counts
+
+
+class RetrievalStatsRecorder:
+    """
+    Per minute hit counts of every retrieved chunk.
+
+    Requests add to an in-memory map on the event loop. A background task spools
+    it every spool_interval seconds and bulk loads the sealed segments every
+    load_interval seconds through the db plugin's load_retrieval_stats.
+    """
+
+    def __init__(
+        self,
+        spool: RetrievalStatsSpool,
+        db_plugin=None,
+        spool_interval: float = DEFAULT_SPOOL_INTERVAL,
+        load_interval: float = DEFAULT_LOAD_INTERVAL,
+        retention_days: int = DEFAULT_RETENTION_DAYS,
+    ):
+        self.spool = spool
+        self.db_plugin = db_plugin
+        self.spool_interval = spool_interval
+        self.load_interval = load_interval
+        self.retention_days = retention_days
+        self.counts: Dict[StatsKey, int] = defaultdict(int)
+        self.running = False
+        self._task: Optional[asyncio.Task] = None
+        self._last_prune = 0.0
+        self.loaded_segments = 0
+        self.load_failures = 0
+
+    def record(self, tenant_id: str, chunks: List[RetrievalChunk]) -> None:
+        bucket = int(time.time()) // BUCKET_SECONDS * BUCKET_SECONDS
+        for chunk in chunks:
+            key = (
+                str(tenant_id),
+                str(chunk.space_id),
+                str(chunk.knowledge_id),
+                str(chunk.chunk_id),
+                bucket,
+            )
+            self.counts[key] += 1
+
+    async def spool_counts(self) -> None:
+        counts, self.counts = self.counts, defaultdict(int)
+        try:
+            await asyncio.to_thread(self.spool.append, counts)
+        except Exception as e:
+            # keep the counts in memory and try again on the next tick
+            logger.error(f"Failed to spool retrieval stats: {e}")
+            for key, count in counts.items():
+                self.counts[key] += count
+
+    async def load(self) -> None:
+        await asyncio.to_thread(self.spool.seal)
+        if self.db_plugin is None:
+            self.db_plugin = PluginManager().dbPlugin
+        for path in self.spool.sealed():
+            counts = await asyncio.to_thread(self.spool.read, path)
+            rows = [
+                RetrievalStatRow(
+                    datetime.fromtimestamp(key[4], timezone.utc), *key[:4], count
+                )
+                for key, count in counts.items()
+                if all(_is_uuid(value) for value in (key[0], key[2], key[3]))
+            ]
+            try:
+                await self.db_plugin.load_retrieval_stats(path.stem, rows)
+            except Exception as e:
+                # segments stay on disk and are loaded in order next time
+                self.load_failures += 1
+                logger.error(f"Failed to load retrieval stats {path.name}: {e}")
+                return
+            # another process may have loaded the same segment concurrently
+            path.unlink(missing_ok=True)
+            self.loaded_segments += 1
+        if not hasattr(self.db_plugin, "prune_retrieval_stats"):
+            return
+        if time.monotonic() - self._last_prune > PRUNE_INTERVAL:
+            self._last_prune = time.monotonic()
+            await self.db_plugin.prune_retrieval_stats(self.retention_days)
+
+    def start(self) -> None:
+        self.running = True
+        self._task = asyncio.get_running_loop().create_task(
+            self._run(), name=f"RetrievalStatsRecorder-{id(self)}"
+        )
+
+    async def _run(self) -> None:
+        last_load = time.monotonic()
+        while self.running:
+            await asyncio.sleep(self.spool_interval)
+            await self.spool_counts()
+            if time.monotonic() - last_load >= self.load_interval:
+                last_load = time.monotonic()
+                try:
+                    await self.load()
+                except Exception as e:
+                    logger.error(f"Error loading retrieval stats: {e}")
+
+    async def shutdown(self) -> None:
+        if not self.running:
+            return
+        self.running = False
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await self.spool_counts()
+        try:
+            await self.load()
+        except Exception as e:
+            logger.warning(f"Retrieval stats stay spooled until the next start: {e}")
+
+
+_retrieval_stats: RetrievalStatsRecorder | None = None
+
+
+def record_retrieval_stats(tenant_id: str, chunks: List[RetrievalChunk]) -> None:
+    """Count the hits of a retrieval response, a no-op when stats are disabled"""
+    if _retrieval_stats is not None:
+        _retrieval_stats.record(tenant_id, chunks)
+
+
+async def initialize_retrieval_stats() -> None:
+    global _retrieval_stats
+    if settings.get_env("RETRIEVAL_STATS_ENABLED", "false").lower() != "true":
+        return
+    db_plugin = PluginManager().dbPlugin
+    if not hasattr(db_plugin, "load_retrieval_stats"):
+        logger.warning("Database plugin cannot store retrieval stats")
+        return
+    recorder = RetrievalStatsRecorder(
+        RetrievalStatsSpool(
+            settings.get_env("RETRIEVAL_STATS_DIR", DEFAULT_RETRIEVAL_STATS_DIR)
+        ),
+        db_plugin,
+        load_interval=float(
+            settings.get_env("RETRIEVAL_STATS_LOAD_INTERVAL", DEFAULT_LOAD_INTERVAL)
+        ),
+        retention_days=int(
+            settings.get_env("RETRIEVAL_STATS_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)
+        ),
+    )
+    try:
+        # segments spooled before a crash or while the database was unreachable
+        await recorder.load()
+    except Exception as e:
+        logger.warning(f"Spooled retrieval stats are loaded later: {e}")
+    recorder.start()
+    _retrieval_stats = recorder
+    logger.debug("Retrieval stats initialized")
+
+
+async def shutdown_retrieval_stats() -> None:
+    global _retrieval_stats
+    recorder, _retrieval_stats = _retrieval_stats, None
+    if recorder is not None:
+        await recorder.shutdown()
@@ -0,0 +1,88 @@
+from enum import Enum
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+
+class VectorQuantization(str, Enum):
+    """
+    What the managed HNSW indexes store. The table always keeps full vectors,
+    quantized indexes are searched for candidates which are re-ranked on them.
+    """
+
+    NONE = "none"
+    # half precision floats, half the index size
+    HALFVEC = "halfvec"
+    # one bit per dimension, 32x smaller, needs many more candidates
+    BIT = "bit"
+
+
+# pgvector cannot build an hnsw index above this many dimensions
+HNSW_MAX_DIMENSIONS = {
+    VectorQuantization.NONE: 2000,
+    VectorQuantization.HALFVEC: 4000,
+    VectorQuantization.BIT: 64000,
+}
+
+# (operator class, distance operator) of the indexed type
+HNSW_OPERATORS = {
+    VectorQuantization.NONE: ("vector_cosine_ops", "<=>"),
+    VectorQuantization.HALFVEC: ("halfvec_cosine_ops", "<=>"),
+    VectorQuantization.BIT: ("bit_hamming_ops", "<~>"),
+}
+
+# candidates read from the index per requested result before re-ranking
+RERANK_FACTORS = {
+    VectorQuantization.NONE: 1,
+    VectorQuantization.HALFVEC: 2,
+    VectorQuantization.BIT: 10,
+}
+
+# largest hnsw.ef_search pgvector accepts, an hnsw scan returns at most this
+# many rows
+HNSW_MAX_EF_SEARCH = 1000
+
+
+def quantized_expression(
+    quantization: VectorQuantization, dimension: int, value: str
+) -> str:
+    """SQL expression of what an index of the given quantization stores for value"""
+    if quantization == VectorQuantization.HALFVEC:
+        return f"{value}::halfvec({dimension})"
+    if quantization == VectorQuantization.BIT:
+        return f"binary_quantize({value}::vector({dimension}))::bit({dimension})"
+    return f"{value}::vector({dimension})"
+
+
+# (row count upper bound, m, ef_construction). Small tables keep the pgvector
+# defaults; larger ones get denser graphs so recall holds at the same ef_search
+HNSW_BUILD_TIERS = [
+    (100_000, 16, 64),
+    (1_000_000, 16, 128),
+    (10_000_000, 24, 200),
+    (None, 32, 256),
+]
+
+
+def hnsw_build_params(rows: int) -> Dict[str, int]:
+    for limit, m, ef_construction in HNSW_BUILD_TIERS:
+        if limit is None or rows < limit:
+            return {"m": m, "ef_construction": ef_construction}
+    raise AssertionError("HNSW_BUILD_TIERS must end with an unbounded tier")
+
+
+class VectorIndexInfo(BaseModel):
+    index_name: str
+    method: str
+    # None for indexes not created by the index manager
+    embedding_model_name: Optional[str] = None
+    dimension: Optional[int] = None
+    quantization: VectorQuantization = VectorQuantization.NONE
+    rows: Optional[int] = None
+    params: Dict[str, int] = {}
+    expected_params: Optional[Dict[str, int]] = None
+    valid: bool = True
+    size_bytes: int = 0
+    size: str = "0 bytes"
+    scans: int = 0
+    needs_rebuild: bool = False
@@ -0,0 +1,454 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+import numpy as np
+from whiskerrag_types.model import Chunk
+
+from .quantization import blockwise_scores, dequantize_int8, quantize_int8
+
+try:
+    import hnswlib  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    hnswlib = None
+
+logger = logging.getLogger("whisker")
+
+# (tenant_id, space_id, embedding_model_name)
+CacheKey = Tuple[str, str, str]
+# yields (chunk_ids, knowledge_ids, float32 matrix) batches of one cache key
+VectorLoader = Callable[[CacheKey], AsyncIterator[Tuple[List[str], List[str], Any]]]
+IndexOp = Callable[["SpaceAnnIndex"], None]
+
+DEFAULT_ANN_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+# a space is loaded after this many misses, so one-off queries stay in Postgres
+DEFAULT_ANN_CACHE_MIN_HITS = 3
+DEFAULT_ANN_CACHE_MAX_SPACE_ROWS = 500_000
+# loaded spaces are reloaded after this long to pick up writes of other processes
+DEFAULT_ANN_CACHE_MAX_AGE = 600
+# below this many rows a brute force matmul beats building a graph
+HNSW_MIN_ROWS = 10_000
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+# compact the matrix once this share of its rows has been deleted
+COMPACT_DELETED_RATIO = 0.3
+# rough per-row overhead of ids and the lookup dicts
+ROW_OVERHEAD_BYTES = 200
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class SpaceAnnIndex:
+    """
+    Vectors of one (tenant, space, model).
+
+    Rows live in a contiguous, L2-normalized float32 matrix with spare capacity,
+    so cosine similarity is a dot product. Once the space reaches HNSW_MIN_ROWS
+    and hnswlib is installed, an inner-product HNSW graph is kept over the same
+    rows (the row number is the label); smaller spaces are searched exactly.
+    Deleted rows are masked and the matrix is compacted once too many are gone.
+    With quantize the matrix holds int8 codes instead, a quarter of the memory
+    for brute-force spaces; the HNSW graph keeps its own float32 copy.
+
+    Searches and updates run in worker threads and are serialized by a lock.
+    """
+
+    def __init__(self, dim: int, quantize: bool = False):
+        self.dim = dim
+        self.quantize = quantize
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        dtype = np.int8 if self.quantize else np.float32
+        self._vectors = np.empty((0, self.dim), dtype=dtype)
+        self._scales = np.empty(0, dtype=np.float32)
+        self._alive = np.empty(0, dtype=bool)
+        self._chunk_ids: List[str] = []
+        self._knowledge_ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._knowledge_rows: Dict[str, Set[int]] = {}
+        self._count = 0
+        self._deleted = 0
+        self._hnsw: Any = None
+
+    def __len__(self) -> int:
+        return self._count - self._deleted
+
+    @property
+    def memory_bytes(self) -> int:
+        size = self._vectors.nbytes + self._scales.nbytes + self._alive.nbytes
+        size += self._count * ROW_OVERHEAD_BYTES
+        if self._hnsw is not None:
+            # hnswlib keeps a float32 copy of every element next to the level 0
+            # graph of 2 * M int32 links
+            size += self._vectors.shape[0] * (self.dim * 4 + 2 * HNSW_M * 4 + 16)
+        return size
+
+    def _ensure_capacity(self, rows: int) -> None:
+        capacity = self._vectors.shape[0]
+        if rows <= capacity:
+            return
+        capacity = max(rows, capacity * 2, 1024)
+        vectors = np.empty((capacity, self.dim), dtype=self._vectors.dtype)
+        vectors[: self._count] = self._vectors[: self._count]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: self._count] = self._alive[: self._count]
+        self._vectors, self._alive = vectors, alive
+        if self.quantize:
+            scales = np.ones(capacity, dtype=np.float32)
+            scales[: self._count] = self._scales[: self._count]
+            self._scales = scales
+        if self._hnsw is not None:
+            self._hnsw.resize_index(capacity)
+
+    def _float_rows(self, rows: Any) -> np.ndarray:
+        if self.quantize:
+            return dequantize_int8(self._vectors[rows], self._scales[rows])
+        return self._vectors[rows]
+
+    def _build_hnsw(self) -> None:
+        index = hnswlib.Index(space="ip", dim=self.dim)
+        index.init_index(
+            max_elements=self._vectors.shape[0],
+            ef_construction=HNSW_EF_CONSTRUCTION,
+            M=HNSW_M,
+        )
+        index.add_items(self._float_rows(slice(self._count)), np.arange(self._count))
+        for row in np.flatnonzero(~self._alive[: self._count]):
+            index.mark_deleted(int(row))
+        self._hnsw = index
+
+    def _remove_row(self, row: Optional[int]) -> None:
+        if row is None or not self._alive[row]:
+            return
+        self._alive[row] = False
+        self._deleted += 1
+        self._rows.pop(self._chunk_ids[row], None)
+        self._knowledge_rows.get(self._knowledge_ids[row], set()).discard(row)
+        if self._hnsw is not None:
+            self._hnsw.mark_deleted(row)
+
+    def _compact(self) -> None:
+        keep = np.flatnonzero(self._alive[: self._count])
+        chunk_ids = [self._chunk_ids[row] for row in keep]
+        knowledge_ids = [self._knowledge_ids[row] for row in keep]
+        vectors = self._float_rows(keep)
+        self._reset()
+        self._append(chunk_ids, knowledge_ids, vectors)
+
+    def _maybe_compact(self) -> None:
+        if self._count >= 1024 and self._deleted > self._count * COMPACT_DELETED_RATIO:
+            self._compact()
+
+    def _append(
+        self, chunk_ids: List[str], knowledge_ids: List[str], vectors: np.ndarray
+    ) -> None:
+        start = self._count
+        end = start + len(chunk_ids)
+        self._ensure_capacity(end)
+        if self.quantize:
+            self._vectors[start:end], self._scales[start:end] = quantize_int8(vectors)
+        else:
+            self._vectors[start:end] = vectors
+        self._alive[start:end] = True
+        self._chunk_ids.extend(chunk_ids)
+        self._knowledge_ids.extend(knowledge_ids)
+        self._count = end
+        if self._hnsw is not None:
+            self._hnsw.add_items(vectors, np.arange(start, end))
+        for row, (chunk_id, knowledge_id) in enumerate(
+            zip(chunk_ids, knowledge_ids), start=start
+        ):
+            # saving an existing chunk id replaces its previous row
+            self._remove_row(self._rows.get(chunk_id))
+            self._rows[chunk_id] = row
+            self._knowledge_rows.setdefault(knowledge_id, set()).add(row)
+        if self._hnsw is None and hnswlib is not None and len(self) >= HNSW_MIN_ROWS:
+            self._build_hnsw()
+
+    def add(self, chunk_ids: List[str], knowledge_ids: List[str], vectors: Any) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"expected vectors of {self.dim} dimensions")
+        with self._lock:
+            self._append(chunk_ids, knowledge_ids, _normalize(vectors))
+
+    def remove_chunks(self, chunk_ids: Iterable[str]) -> None:
+        with self._lock:
+            for chunk_id in chunk_ids:
+                self._remove_row(self._rows.get(chunk_id))
+            self._maybe_compact()
+
+    def remove_knowledge(self, knowledge_ids: Iterable[str]) -> None:
+        with self._lock:
+            for knowledge_id in knowledge_ids:
+                for row in list(self._knowledge_rows.pop(knowledge_id, ())):
+                    self._remove_row(row)
+            self._maybe_compact()
+
+    def _exact_search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        if self.quantize:
+            scores = blockwise_scores(
+                self._vectors[: self._count], query, self._scales[: self._count]
+            )
+        else:
+            scores = self._vectors[: self._count] @ query
+        scores[~self._alive[: self._count]] = -np.inf
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return list(zip(top.tolist(), scores[top].tolist()))
+
+    def search(
+        self, query: Any, k: int, threshold: float = 0.0, ef: int = 100
+    ) -> List[Tuple[str, float]]:
+        """(chunk_id, cosine similarity) of the k nearest rows above threshold"""
+        query = _normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        with self._lock:
+            k = min(k, len(self))
+            if k <= 0:
+                return []
+            results = None
+            if self._hnsw is not None:
+                self._hnsw.set_ef(max(ef, k))
+                try:
+                    labels, distances = self._hnsw.knn_query(query, k=k)
+                    results = zip(labels[0].tolist(), (1 - distances[0]).tolist())
+                except RuntimeError:
+                    # the graph found fewer than k live rows, e.g. after deletes
+                    results = None
+            if results is None:
+                results = self._exact_search(query, k)
+            return [
+                (self._chunk_ids[row], float(similarity))
+                for row, similarity in results
+                if similarity >= threshold
+            ]
+
+
+class AnnIndexCache:
+    """
+    In-process ANN tier in front of Postgres for hot spaces.
+
+    search() answers from memory only when every requested space is loaded and
+    returns None otherwise, so the caller falls back to Postgres. A space is
+    loaded in the background after DEFAULT_ANN_CACHE_MIN_HITS misses, and loaded
+    spaces are evicted least recently used first once max_bytes is exceeded.
+
+    Writes of this process are applied incrementally. Writes that arrive while a
+    space is loading are replayed on top of the loaded snapshot; both adds and
+    deletes are idempotent, so overlap with the snapshot is harmless. Writes of
+    other processes are picked up by reloading entries older than max_age.
+    """
+
+    def __init__(
+        self,
+        loader: VectorLoader,
+        max_bytes: int = DEFAULT_ANN_CACHE_MAX_BYTES,
+        min_hits: int = DEFAULT_ANN_CACHE_MIN_HITS,
+        max_space_rows: int = DEFAULT_ANN_CACHE_MAX_SPACE_ROWS,
+        max_age: float = DEFAULT_ANN_CACHE_MAX_AGE,
+        quantize: bool = False,
+    ):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.min_hits = min_hits
+        self.max_space_rows = max_space_rows
+        self.max_age = max_age
+        self.quantize = quantize
+        self._entries: "OrderedDict[CacheKey, SpaceAnnIndex]" = OrderedDict()
+        self._loaded_at: Dict[CacheKey, float] = {}
+        self._misses: Dict[CacheKey, int] = {}
+        self._loading: Dict[CacheKey, asyncio.Task] = {}
+        self._pending: Dict[CacheKey, List[IndexOp]] = {}
+        # spaces above max_space_rows, not retried until the cache is cleared
+        self._oversized: Set[CacheKey] = set()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(index.memory_bytes for index in self._entries.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "spaces": len(self._entries),
+            "rows": sum(len(index) for index in self._entries.values()),
+            "memory_bytes": self.memory_bytes,
+            "max_bytes": self.max_bytes,
+            "loading": len(self._loading),
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "hnsw": hnswlib is not None,
+            "quantize": self.quantize,
+        }
+
+    def _start_load(self, key: CacheKey) -> None:
+        if key not in self._loading:
+            self._pending[key] = []
+            self._loading[key] = asyncio.create_task(self._load(key))
+
+    def _note_miss(self, key: CacheKey) -> None:
+        if key in self._loading or key in self._oversized:
+            return
+        misses = self._misses.get(key, 0) + 1
+        if misses < self.min_hits:
+            if len(self._misses) > 10_000:
+                self._misses.clear()
+            self._misses[key] = misses
+            return
+        self._misses.pop(key, None)
+        self._start_load(key)
+
+    async def search(
+        self,
+        tenant_id: str,
+        space_ids: Sequence[str],
+        embedding_model_name: str,
+        query: Any,
+        k: int,
+        threshold: float = 0.0,
+        ef: int = 100,
+    ) -> Optional[List[Tuple[str, float]]]:
+        keys = [(tenant_id, space_id, embedding_model_name) for space_id in space_ids]
+        indexes = []
+        for key in keys:
+            index = self._entries.get(key)
+            if index is None:
+                self._note_miss(key)
+                continue
+            self._entries.move_to_end(key)
+            if time.monotonic() - self._loaded_at[key] > self.max_age:
+                # keep serving the current copy until the reload replaces it
+                self._start_load(key)
+            indexes.append(index)
+        if len(indexes) < len(keys):
+            self.misses += 1
+            return None
+        self.hits += 1
+        results: List[Tuple[str, float]] = []
+        for index in indexes:
+            results.extend(
+                await asyncio.to_thread(index.search, query, k, threshold, ef)
+            )
+        results.sort(key=lambda item: item[1], reverse=True)
+        return results[:k]
+
+    async def _load(self, key: CacheKey) -> None:
+        start = time.perf_counter()
+        try:
+            index: Optional[SpaceAnnIndex] = None
+            async for chunk_ids, knowledge_ids, vectors in self.loader(key):
+                if index is None:
+                    index = SpaceAnnIndex(vectors.shape[1], self.quantize)
+                await asyncio.to_thread(index.add, chunk_ids, knowledge_ids, vectors)
+                if len(index) > self.max_space_rows:
+                    logger.info(f"ANN cache: space {key[1]} is too large to cache")
+                    self._oversized.add(key)
+                    return
+            if index is None:
+                return
+            while self._pending.get(key):
+                ops, self._pending[key] = self._pending[key], []
+                for op in ops:
+                    await asyncio.to_thread(op, index)
+            # no await between the last replay and publishing the index
+            self._entries[key] = index
+            self._entries.move_to_end(key)
+            self._loaded_at[key] = time.monotonic()
+            self.loads += 1
+            logger.info(
+                f"ANN cache: loaded space {key[1]} ({len(index)} rows) in "
+                f"{(time.perf_counter() - start) * 1000:.0f}ms"
+            )
+            self._evict()
+        except Exception as e:
+            logger.error(f"ANN cache: failed to load space {key[1]}: {e}")
+        finally:
+            self._loading.pop(key, None)
+            self._pending.pop(key, None)
+
+    def _evict(self) -> None:
+        while self._entries and self.memory_bytes > self.max_bytes:
+            key, _ = self._entries.popitem(last=False)
+            self._loaded_at.pop(key, None)
+            self.evictions += 1
+
+    async def _apply(self, key: CacheKey, op: IndexOp) -> None:
+        if key in self._loading:
+            self._pending[key].append(op)
+        index = self._entries.get(key)
+        if index is None:
+            return
+        try:
+            await asyncio.to_thread(op, index)
+        except Exception as e:
+            # an index that missed a write must not answer queries
+            logger.warning(f"ANN cache: dropping space {key[1]}: {e}")
+            self._entries.pop(key, None)
+            self._loaded_at.pop(key, None)
+
+    def _tenant_keys(self, tenant_id: str) -> List[CacheKey]:
+        keys = set(self._entries) | set(self._loading)
+        return [key for key in keys if key[0] == tenant_id]
+
+    async def add_chunks(self, chunks: Iterable[Chunk]) -> None:
+        groups: Dict[CacheKey, List[Chunk]] = {}
+        for chunk in chunks:
+            key = (str(chunk.tenant_id), chunk.space_id, chunk.embedding_model_name)
+            if chunk.embedding is not None and (
+                key in self._entries or key in self._loading
+            ):
+                groups.setdefault(key, []).append(chunk)
+        for key, group in groups.items():
+            op = partial(
+                SpaceAnnIndex.add,
+                chunk_ids=[str(chunk.chunk_id) for chunk in group],
+                knowledge_ids=[str(chunk.knowledge_id) for chunk in group],
+                vectors=np.asarray(
+                    [chunk.embedding for chunk in group], dtype=np.float32
+                ),
+            )
+            await self._apply(key, op)
+        if groups:
+            self._evict()
+
+    async def remove_chunks(self, tenant_id: str, chunk_ids: List[str]) -> None:
+        op = partial(SpaceAnnIndex.remove_chunks, chunk_ids=list(chunk_ids))
+        for key in self._tenant_keys(tenant_id):
+            await self._apply(key, op)
+
+    async def remove_knowledge(self, tenant_id: str, knowledge_ids: List[str]) -> None:
+        op = partial(SpaceAnnIndex.remove_knowledge, knowledge_ids=list(knowledge_ids))
+        for key in self._tenant_keys(tenant_id):
+            await self._apply(key, op)
+
+    async def close(self) -> None:
+        for task in list(self._loading.values()):
+            task.cancel()
+        self._entries.clear()
+        self._loaded_at.clear()
+        self._oversized.clear()
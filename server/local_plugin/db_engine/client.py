@@ -1,8 +1,21 @@
+import asyncio
 import json
+from datetime import date, datetime, timedelta, timezone
 from enum import Enum
-from typing import Any, Dict, List, Optional, Type, TypeVar
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 import asyncpg
+import numpy as np
 from fastapi import HTTPException, status
 from pgvector.asyncpg import register_vector
 from pydantic import BaseModel
@@ -19,21 +32,148 @@ from whiskerrag_types.model import (
     RetrievalChunk,
     RetrievalRequest,
     Task,
+    TaskStatus,
     Tenant,
 )
 from whiskerrag_utils import RegisterTypeEnum, get_register
 
+from core.embedding_cache import embed_queries
+from core.pagination import (
+    CountMode,
+    CursorPageQueryParams,
+    CursorPageResponse,
+    decode_cursor,
+    encode_cursor,
+    get_cursor_order_field,
+)
+from core.rerank import rerank_chunks
+from core.retrieval import (
+    ANN_SEARCH_PARAMS,
+    MAX_RETRIEVAL_TOP,
+    HybridRetrievalConfig,
+    RecallLevel,
+    StageTimer,
+    reciprocal_rank_fusion,
+)
+from core.retrieval_counter import retrieval_count_arrays
+from core.retrieval_stats import (
+    RETRIEVAL_STATS_DAILY_TABLE,
+    RETRIEVAL_STATS_SEGMENT_TABLE,
+    RETRIEVAL_STATS_TABLE,
+    RETRIEVAL_STATS_TOTAL_TABLE,
+    RetrievalStatRow,
+)
+from core.vector_index import (
+    HNSW_MAX_EF_SEARCH,
+    VectorIndexInfo,
+    VectorQuantization,
+)
+
+from .ann_cache import (
+    DEFAULT_ANN_CACHE_MAX_AGE,
+    DEFAULT_ANN_CACHE_MAX_BYTES,
+    DEFAULT_ANN_CACHE_MAX_SPACE_ROWS,
+    DEFAULT_ANN_CACHE_MIN_HITS,
+    AnnIndexCache,
+    CacheKey,
+)
+from .exact_search import (
+    DEFAULT_EXACT_SEARCH_COMPACT_LOG_BYTES,
+    DEFAULT_EXACT_SEARCH_DIR,
+    DEFAULT_EXACT_SEARCH_MAX_AGE,
+    DEFAULT_EXACT_SEARCH_MAX_ROWS,
+    ExactSearchBackend,
+)
+from .index_manager import (
+    DEFAULT_MAINTENANCE_INTERVAL,
+    DEFAULT_MIN_INDEX_ROWS,
+    VectorIndexManager,
+)
+from .snapshot import SnapshotStore, SpaceKey
+
 T = TypeVar("T", bound=BaseModel)
 
+# rows per COPY batch when bulk saving chunks
+DEFAULT_CHUNK_COPY_BATCH_SIZE = 1000
+# rows fetched per round trip by export cursors
+DEFAULT_EXPORT_BATCH_SIZE = 1000
+# text search configuration of the full-text stage, must match idx_chunk_context_fts;
+# simple keeps identifiers and error codes intact instead of stemming them
+FULLTEXT_CONFIG = "simple"
+# searches of one batch retrieval request running at the same time
+DEFAULT_BATCH_SEARCH_CONCURRENCY = 8
+RETRIEVAL_STATS_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {RETRIEVAL_STATS_TABLE} (
+    bucket TIMESTAMPTZ NOT NULL,
+    tenant_id UUID NOT NULL,
+    space_id VARCHAR(255) NOT NULL,
+    knowledge_id UUID NOT NULL,
+    chunk_id UUID NOT NULL,
+    hits INTEGER NOT NULL,
+    PRIMARY KEY (bucket, tenant_id, space_id, knowledge_id, chunk_id)
+) PARTITION BY RANGE (bucket);
+CREATE TABLE IF NOT EXISTS {RETRIEVAL_STATS_DAILY_TABLE} (
+    day DATE NOT NULL,
+    tenant_id UUID NOT NULL,
+    space_id VARCHAR(255) NOT NULL,
+    knowledge_id UUID NOT NULL,
+    hits BIGINT NOT NULL,
+    PRIMARY KEY (day, tenant_id, space_id, knowledge_id)
+);
+CREATE TABLE IF NOT EXISTS {RETRIEVAL_STATS_TOTAL_TABLE} (
+    tenant_id UUID PRIMARY KEY,
+    hits BIGINT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS {RETRIEVAL_STATS_SEGMENT_TABLE} (
+    segment_id VARCHAR(64) PRIMARY KEY,
+    loaded_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+"""
+# RetrievalStatRow columns passed as parallel arrays
+STATS_ROWS = (
+    "unnest($1::timestamptz[], $2::uuid[], $3::text[], $4::uuid[], $5::uuid[], "
+    "$6::int[]) AS s(bucket, tenant, space, knowledge, chunk, hits)"
+)
+
 
 class PostgresDBPlugin(DBPluginInterface):
     pool: Optional[asyncpg.Pool] = None
+    ann_cache: Optional[AnnIndexCache] = None
+    exact_search: Optional[ExactSearchBackend] = None
 
     def _prepare_value(self, value: Any) -> Any:
         if isinstance(value, dict):
             return json.dumps(value)
         return value
 
+    def _prepare_copy_value(self, column: str, value: Any) -> Any:
+        """
+        Convert a model attribute into a value accepted by asyncpg's binary COPY.
+        Embeddings are passed through untouched so the pgvector codec encodes them.
+        """
+        if value is None or column == "embedding":
+            return value
+        if isinstance(value, Enum):
+            return value.value
+        if isinstance(value, BaseModel):
+            return json.dumps(value.model_dump())
+        return self._prepare_value(value)
+
+    async def _get_table_columns(
+        self, conn: asyncpg.Connection, table_name: str
+    ) -> List[str]:
+        if table_name not in self._table_columns:
+            rows = await conn.fetch(
+                """
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name = $1
+                ORDER BY ordinal_position
+                """,
+                table_name,
+            )
+            self._table_columns[table_name] = [row["column_name"] for row in rows]
+        return self._table_columns[table_name]
+
     async def _check_table_exists(self, pool: asyncpg.Pool, table_name: str) -> bool:
         try:
             async with pool.acquire() as conn:
@@ -108,12 +248,116 @@ class PostgresDBPlugin(DBPluginInterface):
                         f"Table {table_name} does not exist, please create the table first"
                     )
 
+            # schema added after init.sql was first applied, see init.sql
+            async with self.pool.acquire() as conn:
+                await conn.execute(
+                    f"ALTER TABLE {self.settings.KNOWLEDGE_TABLE_NAME} "
+                    "ADD COLUMN IF NOT EXISTS retrieval_count INTEGER DEFAULT 0"
+                )
+                await conn.execute(
+                    f"ALTER TABLE {self.settings.TASK_TABLE_NAME} "
+                    "ADD COLUMN IF NOT EXISTS lease_owner VARCHAR(255), "
+                    "ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ"
+                )
+                await conn.execute(RETRIEVAL_STATS_SCHEMA)
+
             self.converters: Dict[Type[BaseModel], GenericConverter] = {}
             self.knowledge_converter = self._get_converter(Knowledge)
             self.task_converter = self._get_converter(Task)
             self.chunk_converter = self._get_converter(Chunk)
             self.tenant_converter = self._get_converter(Tenant)
             self.retrievalChunk_converter = self._get_converter(RetrievalChunk)
+            self._table_columns: Dict[str, List[str]] = {}
+            self.chunk_copy_batch_size = int(
+                self.settings.get_env(
+                    "CHUNK_COPY_BATCH_SIZE", DEFAULT_CHUNK_COPY_BATCH_SIZE
+                )
+            )
+            self.batch_search_concurrency = int(
+                self.settings.get_env(
+                    "BATCH_SEARCH_CONCURRENCY", DEFAULT_BATCH_SEARCH_CONCURRENCY
+                )
+            )
+            self.vector_search_recall = RecallLevel(
+                self.settings.get_env("VECTOR_SEARCH_RECALL", RecallLevel.BALANCED)
+            )
+            self.index_manager = VectorIndexManager(
+                self.pool,
+                self.settings.CHUNK_TABLE_NAME,
+                min_rows=int(
+                    self.settings.get_env(
+                        "VECTOR_INDEX_MIN_ROWS", DEFAULT_MIN_INDEX_ROWS
+                    )
+                ),
+                maintenance_work_mem=self.settings.get_env(
+                    "VECTOR_INDEX_MAINTENANCE_WORK_MEM"
+                ),
+                quantization=VectorQuantization(
+                    self.settings.get_env(
+                        "VECTOR_INDEX_QUANTIZATION", VectorQuantization.NONE
+                    )
+                ),
+            )
+            await self.index_manager.refresh()
+            auto_maintain = self.settings.get_env("VECTOR_INDEX_AUTO_MAINTAIN", "true")
+            if auto_maintain.lower() == "true":
+                interval = self.settings.get_env(
+                    "VECTOR_INDEX_MAINTENANCE_INTERVAL", DEFAULT_MAINTENANCE_INTERVAL
+                )
+                self.index_manager.start(float(interval))
+            if self.settings.get_env("ANN_CACHE_ENABLED", "false").lower() == "true":
+                quantize = self.settings.get_env("ANN_CACHE_QUANTIZE", "false")
+                self.ann_cache = AnnIndexCache(
+                    self._load_ann_vectors,
+                    max_bytes=int(
+                        self.settings.get_env(
+                            "ANN_CACHE_MAX_BYTES", DEFAULT_ANN_CACHE_MAX_BYTES
+                        )
+                    ),
+                    min_hits=int(
+                        self.settings.get_env(
+                            "ANN_CACHE_MIN_HITS", DEFAULT_ANN_CACHE_MIN_HITS
+                        )
+                    ),
+                    max_space_rows=int(
+                        self.settings.get_env(
+                            "ANN_CACHE_MAX_SPACE_ROWS", DEFAULT_ANN_CACHE_MAX_SPACE_ROWS
+                        )
+                    ),
+                    max_age=float(
+                        self.settings.get_env(
+                            "ANN_CACHE_MAX_AGE", DEFAULT_ANN_CACHE_MAX_AGE
+                        )
+                    ),
+                    quantize=quantize.lower() == "true",
+                )
+            if self.settings.get_env("EXACT_SEARCH_ENABLED", "false").lower() == "true":
+                self.exact_search = ExactSearchBackend(
+                    self._load_exact_space,
+                    SnapshotStore(
+                        self.settings.get_env(
+                            "EXACT_SEARCH_DIR", DEFAULT_EXACT_SEARCH_DIR
+                        ),
+                        dtype=self.settings.get_env("EXACT_SEARCH_DTYPE", "float32"),
+                    ),
+                    max_rows=int(
+                        self.settings.get_env(
+                            "EXACT_SEARCH_MAX_ROWS", DEFAULT_EXACT_SEARCH_MAX_ROWS
+                        )
+                    ),
+                    max_age=float(
+                        self.settings.get_env(
+                            "EXACT_SEARCH_MAX_AGE", DEFAULT_EXACT_SEARCH_MAX_AGE
+                        )
+                    ),
+                    compact_log_bytes=int(
+                        self.settings.get_env(
+                            "EXACT_SEARCH_COMPACT_LOG_BYTES",
+                            DEFAULT_EXACT_SEARCH_COMPACT_LOG_BYTES,
+                        )
+                    ),
+                )
+                self._knowledge_spaces: Dict[str, str] = {}
             self.logger.info("PostgreSQL database connection initialized successfully")
 
         except Exception as e:
@@ -128,6 +372,10 @@ class PostgresDBPlugin(DBPluginInterface):
         return self.converters[model_class]
 
     async def cleanup(self) -> None:
+        if getattr(self, "index_manager", None):
+            await self.index_manager.stop()
+        if self.ann_cache:
+            await self.ann_cache.close()
         if self.pool:
             await self.pool.close()
             self.logger.info("Database connection pool closed")
@@ -147,6 +395,28 @@ class PostgresDBPlugin(DBPluginInterface):
             self.logger.error(f"Database health check failed: {e}")
             return False
 
+    def _build_eq_conditions(
+        self, tenant_id: str, page_params: PageQueryParams
+    ) -> Tuple[List[str], List[Any]]:
+        where_conditions: List[str] = []
+        params: List[Any] = []
+        if page_params.eq_conditions:
+            for field, value in page_params.eq_conditions.items():
+                if field == "tenant_id" and value != tenant_id:
+                    raise HTTPException(
+                        status_code=status.HTTP_403_FORBIDDEN,
+                        detail=f"Tenant {value} is not allowed to access this data.",
+                    )
+
+                if isinstance(value, Enum):
+                    value = value.value
+                elif isinstance(value, BaseModel):
+                    value = json.dumps(value.model_dump())
+
+                params.append(value)
+                where_conditions.append(f"{field} = ${len(params)}")
+        return where_conditions, params
+
     async def _get_paginated_data(
         self,
         tenant_id: str,
@@ -155,30 +425,10 @@ class PostgresDBPlugin(DBPluginInterface):
         page_params: PageQueryParams,
     ) -> PageResponse[T]:
         try:
-            params: List[any] = []
-            param_index = 1
-
             query = f"SELECT * FROM {table_name}"
             count_query = f"SELECT COUNT(*) FROM {table_name}"
 
-            where_conditions = []
-
-            if page_params.eq_conditions:
-                for field, value in page_params.eq_conditions.items():
-                    if field == "tenant_id" and value != tenant_id:
-                        raise HTTPException(
-                            status_code=status.HTTP_403_FORBIDDEN,
-                            detail=f"Tenant {value} is not allowed to access this data.",
-                        )
-
-                    if isinstance(value, Enum):
-                        value = value.value
-                    elif isinstance(value, BaseModel):
-                        value = json.dumps(value.model_dump())
-
-                    where_conditions.append(f"{field} = ${param_index}")
-                    params.append(value)
-                    param_index += 1
+            where_conditions, params = self._build_eq_conditions(tenant_id, page_params)
 
             if where_conditions:
                 where_clause = " WHERE " + " AND ".join(where_conditions)
@@ -230,6 +480,151 @@ class PostgresDBPlugin(DBPluginInterface):
                 detail=f"Database error: {str(e)}",
             )
 
+    async def _estimate_count(
+        self,
+        conn: asyncpg.Connection,
+        table_name: str,
+        where_clause: str,
+        params: List[Any],
+    ) -> int:
+        """Row estimate from the planner instead of a COUNT(*) scan"""
+        if not where_clause:
+            return int(
+                await conn.fetchval(
+                    "SELECT GREATEST(reltuples, 0)::bigint FROM pg_class "
+                    "WHERE oid = $1::regclass",
+                    table_name,
+                )
+                or 0
+            )
+        plan = await conn.fetchval(
+            f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {table_name}{where_clause}", *params
+        )
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def _keyset_condition(
+        self,
+        order_field: str,
+        primary_key: str,
+        is_desc: bool,
+        last_values: List[Any],
+        params: List[Any],
+    ) -> str:
+        """
+        Rows after the cursor, appends its values to params. Postgres sorts NULLs
+        last ascending and first descending, and a row comparison with a NULL is
+        never true, so NULL order values are handled explicitly.
+        """
+        last_order_value, last_primary_key = last_values
+        comparator = "<" if is_desc else ">"
+        if last_order_value is None:
+            params.append(last_primary_key)
+            after_nulls = (
+                f"({order_field} IS NULL AND {primary_key} {comparator} "
+                f"${len(params)})"
+            )
+            # descending, the non-NULL values all follow the NULLs
+            if is_desc:
+                return f"({after_nulls} OR {order_field} IS NOT NULL)"
+            return after_nulls
+        params.extend([last_order_value, last_primary_key])
+        after_values = (
+            f"({order_field}, {primary_key}) {comparator} "
+            f"(${len(params) - 1}, ${len(params)})"
+        )
+        # ascending, the NULLs all follow the non-NULL values
+        if not is_desc:
+            return f"({after_values} OR {order_field} IS NULL)"
+        return after_values
+
+    async def _get_cursor_paginated_data(
+        self,
+        tenant_id: str,
+        table_name: str,
+        model_class: T,
+        primary_key: str,
+        page_params: CursorPageQueryParams,
+    ) -> CursorPageResponse[T]:
+        """
+        Keyset pagination: WHERE (order_field, pk) > (last values) ORDER BY both.
+        Unlike OFFSET, deep pages cost the same as the first one.
+        """
+        try:
+            async with self.pool.acquire() as conn:
+                columns = await self._get_table_columns(conn, table_name)
+            order_field = get_cursor_order_field(
+                page_params, model_class, columns=columns
+            )
+            where_conditions, params = self._build_eq_conditions(tenant_id, page_params)
+            filter_clause = (
+                " WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+            )
+            is_desc = (page_params.order_direction or "asc").lower() == "desc"
+            page_conditions = list(where_conditions)
+            page_params_values = list(params)
+            if page_params.cursor:
+                last_values = decode_cursor(page_params.cursor)
+                if len(last_values) != 2:
+                    raise ValueError("Invalid cursor")
+                page_conditions.append(
+                    self._keyset_condition(
+                        order_field,
+                        primary_key,
+                        is_desc,
+                        last_values,
+                        page_params_values,
+                    )
+                )
+            direction = "DESC" if is_desc else "ASC"
+            query = f"SELECT * FROM {table_name}"
+            if page_conditions:
+                query += " WHERE " + " AND ".join(page_conditions)
+            # fetch one extra row to know whether another page exists
+            query += (
+                f" ORDER BY {order_field} {direction}, {primary_key} {direction}"
+                f" LIMIT {page_params.page_size + 1}"
+            )
+
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(query, *page_params_values)
+                total = None
+                if page_params.count_mode == CountMode.EXACT:
+                    total = await conn.fetchval(
+                        f"SELECT COUNT(*) FROM {table_name}{filter_clause}", *params
+                    )
+                elif page_params.count_mode == CountMode.ESTIMATED:
+                    total = await self._estimate_count(
+                        conn, table_name, filter_clause, params
+                    )
+
+            next_cursor = None
+            if len(rows) > page_params.page_size:
+                rows = rows[: page_params.page_size]
+                last_row = rows[-1]
+                next_cursor = encode_cursor(
+                    [last_row[order_field], last_row[primary_key]]
+                )
+            converter = self._get_converter(model_class)
+            return CursorPageResponse[T](
+                items=[converter.from_db_dict(dict(row)) for row in rows],
+                page_size=page_params.page_size,
+                next_cursor=next_cursor,
+                total=total,
+            )
+
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        except HTTPException:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error in _get_cursor_paginated_data: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Database error: {str(e)}",
+            )
+
     # =============== Knowledge ===============
     async def save_knowledge_list(
         self, knowledge_list: List[Knowledge]
@@ -330,28 +725,84 @@ class PostgresDBPlugin(DBPluginInterface):
             self.logger.error(f"Error in delete_knowledge: {e}")
             raise HTTPException(status_code=500, detail="Failed to delete knowledge")
 
+    async def batch_update_knowledge_retrieval_count(
+        self, knowledge_id_list: dict[str, int]
+    ) -> None:
+        """
+        Add the buffered counts with one UPDATE joined to the unnested arrays,
+        instead of a round trip per knowledge. Deleted knowledge is skipped.
+        """
+        knowledge_ids, deltas = retrieval_count_arrays(knowledge_id_list)
+        if not knowledge_ids:
+            return None
+        query = f"""
+            UPDATE {self.settings.KNOWLEDGE_TABLE_NAME} AS k
+            SET retrieval_count = COALESCE(k.retrieval_count, 0) + d.delta
+            FROM unnest($1::uuid[], $2::int[]) AS d(knowledge_id, delta)
+            WHERE k.knowledge_id = d.knowledge_id
+        """
+        try:
+            async with self.pool.acquire() as conn:
+                await conn.execute(query, knowledge_ids, deltas)
+        except Exception as e:
+            self.logger.error(f"Error in batch_update_knowledge_retrieval_count: {e}")
+            raise HTTPException(
+                status_code=500, detail="Failed to update knowledge retrieval counts"
+            )
+
     # =============== Chunk ===============
+    async def _copy_chunk_batch(
+        self, conn: asyncpg.Connection, chunk_batch: List[Chunk]
+    ) -> None:
+        table_columns = await self._get_table_columns(
+            conn, self.settings.CHUNK_TABLE_NAME
+        )
+        model_columns = [
+            column for column in table_columns if column in Chunk.model_fields
+        ]
+        # COPY writes every listed column, so a None would become an explicit NULL;
+        # chunks are grouped by the columns they carry a value for and each group is
+        # copied with only those columns, letting database defaults fill the rest
+        groups: Dict[Tuple[str, ...], List[tuple]] = {}
+        for chunk in chunk_batch:
+            values = {
+                column: getattr(chunk, column)
+                for column in model_columns
+                if getattr(chunk, column) is not None
+            }
+            groups.setdefault(tuple(values), []).append(
+                tuple(
+                    self._prepare_copy_value(column, value)
+                    for column, value in values.items()
+                )
+            )
+        for columns, records in groups.items():
+            await conn.copy_records_to_table(
+                self.settings.CHUNK_TABLE_NAME, records=records, columns=list(columns)
+            )
+
     async def save_chunk_list(self, chunk_list: List[Chunk]) -> List[Chunk]:
+        """
+        Bulk insert chunks with binary COPY in batches of `CHUNK_COPY_BATCH_SIZE`.
+        chunk_id is generated on the client side, so the saved chunks are returned
+        as-is instead of reading every row back with RETURNING.
+        """
         if not chunk_list:
             return []
 
+        batch_size = max(1, self.chunk_copy_batch_size)
         async with self.pool.acquire() as conn:
-            saved_chunks = []
-            for chunk in chunk_list:
-                chunk_dict = chunk.model_dump(exclude_unset=True, exclude_none=True)
-                keys = list(chunk_dict.keys())
-                placeholders = [f"${i+1}" for i in range(len(keys))]
-                query = f"""
-                INSERT INTO {self.settings.CHUNK_TABLE_NAME} 
-                ({', '.join(keys)}) 
-                VALUES ({', '.join(placeholders)})
-                RETURNING *
-                """
-                values = [self._prepare_value(chunk_dict[k]) for k in keys]
-                row = await conn.fetchrow(query, *values)
-                saved_chunks.append(self.chunk_converter.from_db_dict(dict(row)))
+            async with conn.transaction():
+                for start in range(0, len(chunk_list), batch_size):
+                    await self._copy_chunk_batch(
+                        conn, chunk_list[start : start + batch_size]
+                    )
+        if self.ann_cache:
+            await self.ann_cache.add_chunks(chunk_list)
+        if self.exact_search:
+            await self.exact_search.add_chunks(chunk_list)
 
-            return saved_chunks
+        return chunk_list
 
     async def get_chunk_list(
         self, tenant_id: str, page_params: PageQueryParams[Chunk]
@@ -363,6 +814,17 @@ class PostgresDBPlugin(DBPluginInterface):
             page_params,
         )
 
+    async def get_chunk_list_by_cursor(
+        self, tenant_id: str, page_params: CursorPageQueryParams[Chunk]
+    ) -> CursorPageResponse[Chunk]:
+        return await self._get_cursor_paginated_data(
+            tenant_id,
+            self.settings.CHUNK_TABLE_NAME,
+            Chunk,
+            "chunk_id",
+            page_params,
+        )
+
     async def get_chunk_by_id(self, tenant_id: str, chunk_id: str) -> Optional[Chunk]:
         try:
             async with self.pool.acquire() as conn:
@@ -378,6 +840,22 @@ class PostgresDBPlugin(DBPluginInterface):
             self.logger.error(f"Error in get_chunk_by_id: {e}")
             raise HTTPException(status_code=500, detail="Failed to retrieve chunk")
 
+    async def get_embedding_dimension(
+        self, tenant_id: str, embedding_model_name: str
+    ) -> Optional[int]:
+        """Dimension of the tenant's stored chunks of a model, None without any"""
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval(
+                f"""
+                SELECT vector_dims(embedding) FROM {self.settings.CHUNK_TABLE_NAME}
+                WHERE tenant_id = $1 AND embedding_model_name = $2
+                AND embedding IS NOT NULL
+                LIMIT 1
+                """,
+                tenant_id,
+                embedding_model_name,
+            )
+
     async def delete_knowledge_chunk(
         self, tenant_id: str, knowledge_ids: List[str]
     ) -> List[Chunk]:
@@ -390,8 +868,12 @@ class PostgresDBPlugin(DBPluginInterface):
                     RETURNING *
                 """
                 rows = await conn.fetch(query, knowledge_ids, tenant_id)
+            if self.ann_cache:
+                await self.ann_cache.remove_knowledge(tenant_id, knowledge_ids)
+            if self.exact_search:
+                await self.exact_search.remove_knowledge(tenant_id, knowledge_ids)
 
-                return [self.chunk_converter.from_db_dict(dict(row)) for row in rows]
+            return [self.chunk_converter.from_db_dict(dict(row)) for row in rows]
 
         except Exception as e:
             self.logger.error(f"Error in delete_knowledge_chunk: {e}")
@@ -410,13 +892,83 @@ class PostgresDBPlugin(DBPluginInterface):
                     RETURNING *
                 """
                 rows = await conn.fetch(query, tenant_id, chunk_id, model_name)
+            if self.ann_cache:
+                await self.ann_cache.remove_chunks(tenant_id, [chunk_id])
+            if self.exact_search:
+                await self.exact_search.remove_chunks(tenant_id, [chunk_id])
 
-                return [self.chunk_converter.from_db_dict(dict(row)) for row in rows]
+            return [self.chunk_converter.from_db_dict(dict(row)) for row in rows]
 
         except Exception as e:
             self.logger.error(f"Error in delete_chunk: {e}")
             raise HTTPException(status_code=500, detail="Failed to delete chunks")
 
+    # =============== Export ===============
+    async def _stream_rows(
+        self, query: str, params: List[Any], batch_size: int
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Yield rows in batches from a server-side cursor, so memory stays constant
+        however many rows match. The snapshot is consistent for the whole export.
+        """
+        async with self.pool.acquire() as conn:
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                statement = await conn.prepare(query)
+                json_columns = [
+                    attribute.name
+                    for attribute in statement.get_attributes()
+                    if attribute.type.name in ("json", "jsonb")
+                ]
+                cursor = await statement.cursor(*params)
+                while True:
+                    rows = await cursor.fetch(batch_size)
+                    if not rows:
+                        break
+                    batch = []
+                    for row in rows:
+                        item = dict(row)
+                        for column in json_columns:
+                            if isinstance(item[column], str):
+                                item[column] = json.loads(item[column])
+                        batch.append(item)
+                    yield batch
+
+    async def stream_chunk_list(
+        self,
+        tenant_id: str,
+        space_id: str,
+        knowledge_id: Optional[str] = None,
+        batch_size: int = DEFAULT_EXPORT_BATCH_SIZE,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        query = f"""
+            SELECT * FROM {self.settings.CHUNK_TABLE_NAME}
+            WHERE tenant_id = $1 AND space_id = $2
+        """
+        params: List[Any] = [tenant_id, space_id]
+        if knowledge_id:
+            query += " AND knowledge_id = $3"
+            params.append(knowledge_id)
+        async for batch in self._stream_rows(query, params, batch_size):
+            yield batch
+
+    async def stream_knowledge_list(
+        self,
+        tenant_id: str,
+        space_id: str,
+        batch_size: int = DEFAULT_EXPORT_BATCH_SIZE,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        query = f"""
+            SELECT * FROM {self.settings.KNOWLEDGE_TABLE_NAME}
+            WHERE tenant_id = $1 AND space_id = $2
+        """
+        async for batch in self._stream_rows(query, [tenant_id, space_id], batch_size):
+            for item in batch:
+                # same masking as get_knowledge_list
+                source_config = item.get("source_config")
+                if isinstance(source_config, dict) and source_config.get("auth_info"):
+                    source_config["auth_info"] = "***"
+            yield batch
+
     # =============== Task ===============
     async def save_task_list(self, task_list: List[Task]) -> List[Task]:
         async with self.pool.acquire() as conn:
@@ -490,6 +1042,92 @@ class PostgresDBPlugin(DBPluginInterface):
             self.logger.error(f"Error in get_task_by_id: {str(e)}")
             raise
 
+    async def claim_tasks(
+        self,
+        owner: str,
+        lease_seconds: float,
+        task_ids: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+    ) -> List[Task]:
+        """
+        Lease tasks to owner for lease_seconds, oldest first. Only tasks without a
+        live lease are claimed, and rows another process is claiming are skipped,
+        so every task is leased by at most one process. Without task_ids, the
+        pending and running tasks of every tenant are claimed, at most limit of
+        them so the rest stay available to other processes.
+        """
+        if task_ids is None:
+            task_filter = "status = ANY($3)"
+            filter_value = [
+                TaskStatus.PENDING.value,
+                TaskStatus.PENDING_RETRY.value,
+                TaskStatus.RUNNING.value,
+            ]
+        else:
+            task_filter = "task_id = ANY($3::uuid[])"
+            filter_value = task_ids
+        table = self.settings.TASK_TABLE_NAME
+        try:
+            async with self.pool.acquire() as conn:
+                # LIMIT NULL does not limit
+                rows = await conn.fetch(
+                    f"""
+                    UPDATE {table}
+                    SET lease_owner = $1,
+                        lease_expires_at = now() + make_interval(secs => $2)
+                    WHERE task_id IN (
+                        SELECT task_id FROM {table}
+                        WHERE {task_filter}
+                        AND (lease_expires_at IS NULL OR lease_expires_at < now())
+                        ORDER BY created_at ASC
+                        LIMIT $4
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING *
+                    """,
+                    owner,
+                    float(lease_seconds),
+                    filter_value,
+                    limit,
+                )
+                tasks = [self.task_converter.from_db_dict(dict(row)) for row in rows]
+                return sorted(tasks, key=lambda task: task.created_at)
+
+        except Exception as e:
+            self.logger.error(f"Error in claim_tasks: {str(e)}")
+            raise
+
+    async def renew_task_leases(
+        self, owner: str, task_ids: List[str], lease_seconds: float
+    ) -> List[str]:
+        """Extend the leases owner still holds, returns the ids of those tasks"""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                f"""
+                UPDATE {self.settings.TASK_TABLE_NAME}
+                SET lease_expires_at = now() + make_interval(secs => $3)
+                WHERE task_id = ANY($2::uuid[]) AND lease_owner = $1
+                RETURNING task_id
+                """,
+                owner,
+                task_ids,
+                float(lease_seconds),
+            )
+            return [str(row["task_id"]) for row in rows]
+
+    async def release_task_leases(self, owner: str, task_ids: List[str]) -> None:
+        """Give up leases so another process can claim the tasks right away"""
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                f"""
+                UPDATE {self.settings.TASK_TABLE_NAME}
+                SET lease_owner = NULL, lease_expires_at = NULL
+                WHERE task_id = ANY($2::uuid[]) AND lease_owner = $1
+                """,
+                owner,
+                task_ids,
+            )
+
     async def delete_knowledge_task(
         self, tenant_id: str, knowledge_ids: List[str]
     ) -> List[Task] | None:
@@ -592,7 +1230,37 @@ class PostgresDBPlugin(DBPluginInterface):
             self.logger.error(f"Error in update_tenant: {e}")
             raise HTTPException(status_code=500, detail="Failed to update tenant")
 
+    # =============== Vector index ===============
+    async def get_vector_index_report(self) -> List[VectorIndexInfo]:
+        """Vector indexes on the chunk table with size, usage and rebuild state"""
+        return await self.index_manager.report()
+
+    async def maintain_vector_indexes(self) -> List[str]:
+        return await self.index_manager.maintain()
+
     # =============== Retrieval ===============
+    async def _search_similar_chunks(
+        self,
+        tenant_id: str,
+        params: Union[RetrievalBySpaceRequest, RetrievalByKnowledgeRequest],
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[RetrievalChunk]:
+        values = params.model_dump(exclude={"question"})
+        values["top"] = min(values["top"], MAX_RETRIEVAL_TOP)
+        config = HybridRetrievalConfig(type="vector", **values)
+        if query_embedding is None:
+            EmbeddingCls = get_register(
+                RegisterTypeEnum.EMBEDDING, config.embedding_model_name
+            )
+            query_embedding = await EmbeddingCls().embed_text(params.question, 10)
+        scores = await self._in_process_search(
+            tenant_id, config, query_embedding, config.top
+        )
+        if scores is not None:
+            return await self._fetch_retrieval_chunks(tenant_id, scores)
+        rows = await self._vector_search(tenant_id, config, query_embedding, config.top)
+        return [self.retrievalChunk_converter.from_db_dict(dict(row)) for row in rows]
+
     async def search_space_chunk_list(
         self,
         tenant_id: str,
@@ -602,66 +1270,7 @@ class PostgresDBPlugin(DBPluginInterface):
         search similar chunks based on space_id
         """
         try:
-            embedding_model = get_register(
-                RegisterTypeEnum.EMBEDDING, params.embedding_model_name
-            )
-            query_embedding = await embedding_model().embed_text(params.question, 10)
-
-            query = """
-            WITH filtered_chunks AS (
-                SELECT c.*,
-                    c.embedding <=> $1 as similarity
-                FROM chunks c
-                INNER JOIN knowledge k ON c.knowledge_id = k.knowledge_id
-                WHERE 
-                    k.space_id = ANY($2)
-                    AND k.tenant_id = $3
-                    AND c.embedding_model_name = $4
-                    AND ($5::jsonb IS NULL OR c.metadata @> $5::jsonb)
-            )
-            SELECT 
-                chunk_id,
-                knowledge_id,
-                content,
-                metadata,
-                embedding_model_name,
-                similarity
-            FROM filtered_chunks
-            WHERE similarity <= $6
-            ORDER BY similarity ASC
-            LIMIT $7;
-            """
-
-            params_dict = {
-                "query_embedding": query_embedding,
-                "space_id_list": params.space_id_list,
-                "tenant_id": tenant_id,
-                "embedding_model_name": params.embedding_model_name,
-                "metadata_filter": (
-                    json.dumps(params.metadata_filter)
-                    if params.metadata_filter
-                    else None
-                ),
-                "similarity_threshold": params.similarity_threshold,
-                "top": params.top,
-            }
-
-            async with self.pool.acquire() as conn:
-                rows = await conn.fetch(
-                    query,
-                    params_dict["query_embedding"],
-                    params_dict["space_id_list"],
-                    params_dict["tenant_id"],
-                    params_dict["embedding_model_name"],
-                    params_dict["metadata_filter"],
-                    params_dict["similarity_threshold"],
-                    params_dict["top"],
-                )
-                return [
-                    self.retrievalChunk_converter.from_db_dict(dict(row))
-                    for row in rows
-                ]
-
+            return await self._search_similar_chunks(tenant_id, params)
         except Exception as e:
             self.logger.error(f"Error in search_space_chunk_list: {str(e)}")
             raise
@@ -675,74 +1284,594 @@ class PostgresDBPlugin(DBPluginInterface):
         Search for similar text chunks based on knowledge IDs
         """
         try:
-            EmbeddingCls = get_register(
-                RegisterTypeEnum.EMBEDDING, params.embedding_model_name
-            )
-            embedding_instance = EmbeddingCls()
-            query_embedding = await embedding_instance.embed_text(params.question, 10)
-
-            query = """
-            WITH filtered_chunks AS (
-                SELECT c.*,
-                    c.embedding <=> $1 as similarity
-                FROM chunks c
-                WHERE 
-                    c.knowledge_id = ANY($2)
-                    AND c.tenant_id = $3
-                    AND c.embedding_model_name = $4
-                    AND ($5::jsonb IS NULL OR c.metadata @> $5::jsonb)
-            )
-            SELECT 
-                chunk_id,
-                knowledge_id,
-                content,
-                metadata,
-                embedding_model_name,
-                similarity
-            FROM filtered_chunks
-            WHERE similarity <= $6
-            ORDER BY similarity ASC
-            LIMIT $7;
+            return await self._search_similar_chunks(tenant_id, params)
+        except Exception as e:
+            self.logger.error(f"Error in search_knowledge_chunk_list: {str(e)}")
+            raise
+
+    async def _embed_batch_questions(
+        self,
+        params_list: List[Union[RetrievalBySpaceRequest, RetrievalByKnowledgeRequest]],
+    ) -> List[List[float]]:
+        """Query embeddings in request order, one embed call per embedding model"""
+        positions: Dict[str, List[int]] = {}
+        for position, params in enumerate(params_list):
+            model_name = params.model_dump()["embedding_model_name"]
+            positions.setdefault(model_name, []).append(position)
+
+        async def embed_model(model_name: str) -> List[List[float]]:
+            EmbeddingCls = get_register(RegisterTypeEnum.EMBEDDING, model_name)
+            questions = [params_list[i].question for i in positions[model_name]]
+            return await embed_queries(EmbeddingCls(), model_name, questions, 10)
+
+        model_names = list(positions)
+        embeddings: List[List[float]] = [[] for _ in params_list]
+        for model_name, vectors in zip(
+            model_names,
+            await asyncio.gather(*(embed_model(name) for name in model_names)),
+        ):
+            for position, vector in zip(positions[model_name], vectors):
+                embeddings[position] = vector
+        return embeddings
+
+    async def search_chunk_list_batch(
+        self,
+        tenant_id: str,
+        params_list: List[Union[RetrievalBySpaceRequest, RetrievalByKnowledgeRequest]],
+    ) -> List[List[RetrievalChunk]]:
+        """
+        Several space/knowledge searches in one call, results in request order.
+        Questions are embedded in one batch per model; the searches then run
+        concurrently, at most batch_search_concurrency at a time so one batch
+        does not hold the whole connection pool.
+        """
+        try:
+            embeddings = await self._embed_batch_questions(params_list)
+            semaphore = asyncio.Semaphore(self.batch_search_concurrency)
+
+            async def search(params, query_embedding):
+                async with semaphore:
+                    return await self._search_similar_chunks(
+                        tenant_id, params, query_embedding
+                    )
+
+            return await asyncio.gather(
+                *(
+                    search(params, query_embedding)
+                    for params, query_embedding in zip(params_list, embeddings)
+                )
+            )
+        except Exception as e:
+            self.logger.error(f"Error in search_chunk_list_batch: {str(e)}")
+            raise
+
+    def _build_retrieval_scope(
+        self, tenant_id: str, config: HybridRetrievalConfig, params: List[Any]
+    ) -> List[str]:
+        """Shared WHERE conditions of the retrieval stages, appends to params"""
+        params.extend([tenant_id, config.embedding_model_name])
+        conditions = [
+            f"tenant_id = ${len(params) - 1}",
+            f"embedding_model_name = ${len(params)}",
+        ]
+        if config.space_id_list:
+            params.append(config.space_id_list)
+            conditions.append(f"space_id = ANY(${len(params)})")
+        if config.knowledge_id_list:
+            params.append(config.knowledge_id_list)
+            conditions.append(f"knowledge_id = ANY(${len(params)}::uuid[])")
+        if config.metadata_filter:
+            params.append(json.dumps(config.metadata_filter))
+            conditions.append(f"metadata @> ${len(params)}::jsonb")
+        return conditions
+
+    async def _set_ann_search_params(
+        self, conn: asyncpg.Connection, recall: Optional[RecallLevel], limit: int = 0
+    ) -> None:
+        """
+        Scope index scan parameters to the current transaction. Both are set since
+        either index type may back the query, the unused one has no effect. An hnsw
+        scan returns at most ef_search rows, so it is raised to the LIMIT, up to
+        the largest value pgvector accepts.
+        """
+        probes, ef_search = ANN_SEARCH_PARAMS[recall or self.vector_search_recall]
+        ef_search = min(max(ef_search, limit), HNSW_MAX_EF_SEARCH)
+        await conn.execute(
+            f"SET LOCAL ivfflat.probes = {probes}; "
+            f"SET LOCAL hnsw.ef_search = {ef_search}"
+        )
+
+    async def _get_retrieval_columns(self, conn: asyncpg.Connection) -> List[str]:
+        # vectors are not part of retrieval responses
+        return [
+            column
+            for column in await self._get_table_columns(
+                conn, self.settings.CHUNK_TABLE_NAME
+            )
+            if column != "embedding"
+        ]
+
+    async def _vector_search(
+        self,
+        tenant_id: str,
+        config: HybridRetrievalConfig,
+        query_embedding: List[float],
+        limit: int,
+        columns: Optional[List[str]] = None,
+    ) -> List[asyncpg.Record]:
+        """
+        Nearest chunks by cosine distance, with similarity = 1 - distance.
+
+        The inner query orders by the bare distance expression under a LIMIT, which
+        is the only shape the planner serves from an ANN index. The similarity
+        threshold is applied to the limited candidates afterwards; filtering on the
+        computed distance first forces a sequential scan and a full sort. A
+        quantized index orders by its compact distance and returns rerank_factor
+        times more candidates, whose similarity is computed on the full vectors;
+        no more than an hnsw scan can return, but never fewer than the limit.
+        """
+        model_name = config.embedding_model_name
+        candidates = max(
+            limit,
+            min(
+                limit * self.index_manager.rerank_factor(model_name),
+                HNSW_MAX_EF_SEARCH,
+            ),
+        )
+        params: List[Any] = [query_embedding]
+        conditions = self._build_retrieval_scope(tenant_id, config, params)
+        params.extend([candidates, config.similarity_threshold, limit])
+        # a managed per-model index is only used if the query repeats its
+        # expression and partial predicate
+        distance = f"{self.index_manager.vector_expression(model_name)} <=> $1"
+        index_distance = self.index_manager.index_distance(model_name)
+        model_condition = self.index_manager.model_condition(model_name)
+        if model_condition:
+            conditions.append(model_condition)
+        async with self.pool.acquire() as conn:
+            columns = columns or await self._get_retrieval_columns(conn)
+            query = f"""
+                SELECT * FROM (
+                    SELECT {', '.join(columns)}, 1 - ({distance}) AS similarity
+                    FROM {self.settings.CHUNK_TABLE_NAME}
+                    WHERE {' AND '.join(conditions)}
+                    ORDER BY {index_distance}
+                    LIMIT ${len(params) - 2}
+                ) candidates
+                WHERE similarity >= ${len(params) - 1}
+                ORDER BY similarity DESC
+                LIMIT ${len(params)}
             """
+            async with conn.transaction(readonly=True):
+                await self._set_ann_search_params(conn, config.recall, candidates)
+                return await conn.fetch(query, *params)
+
+    async def _load_ann_vectors(
+        self, key: CacheKey
+    ) -> AsyncIterator[Tuple[List[str], List[str], np.ndarray]]:
+        tenant_id, space_id, embedding_model_name = key
+        query = f"""
+            SELECT chunk_id, knowledge_id, embedding
+            FROM {self.settings.CHUNK_TABLE_NAME}
+            WHERE tenant_id = $1 AND space_id = $2 AND embedding_model_name = $3
+            AND embedding IS NOT NULL
+        """
+        async for batch in self._stream_rows(
+            query,
+            [tenant_id, space_id, embedding_model_name],
+            DEFAULT_EXPORT_BATCH_SIZE,
+        ):
+            yield (
+                [str(row["chunk_id"]) for row in batch],
+                [str(row["knowledge_id"]) for row in batch],
+                np.stack([np.asarray(row["embedding"], np.float32) for row in batch]),
+            )
 
-            params_dict = {
-                "query_embedding": query_embedding,
-                "knowledge_id_list": params.knowledge_id_list,
-                "tenant_id": tenant_id,
-                "embedding_model_name": params.embedding_model_name,
-                "metadata_filter": (
-                    json.dumps(params.metadata_filter)
-                    if params.metadata_filter
-                    else None
+    async def _load_exact_space(
+        self, key: SpaceKey, max_rows: int
+    ) -> Optional[List[Dict[str, Any]]]:
+        tenant_id, space_id, embedding_model_name = key
+        table_name = self.settings.CHUNK_TABLE_NAME
+        conditions = """
+            tenant_id = $1 AND space_id = $2 AND embedding_model_name = $3
+            AND embedding IS NOT NULL
+        """
+        params = [tenant_id, space_id, embedding_model_name]
+        async with self.pool.acquire() as conn:
+            # bounded count, large spaces are not read past max_rows
+            count = await conn.fetchval(
+                f"""
+                SELECT count(*) FROM (
+                    SELECT 1 FROM {table_name} WHERE {conditions} LIMIT $4
+                ) bounded
+                """,
+                *params,
+                max_rows + 1,
+            )
+            if count > max_rows:
+                return None
+            rows = await conn.fetch(
+                f"""
+                SELECT chunk_id, knowledge_id, embedding, context, metadata
+                FROM {table_name} WHERE {conditions}
+                """,
+                *params,
+            )
+        return [
+            {
+                **dict(row),
+                "metadata": (
+                    json.loads(row["metadata"])
+                    if isinstance(row["metadata"], str)
+                    else row["metadata"]
                 ),
-                "similarity_threshold": params.similarity_threshold,
-                "top": params.top,
             }
+            for row in rows
+        ]
 
+    async def _knowledge_space_ids(
+        self, tenant_id: str, knowledge_ids: List[str]
+    ) -> List[str]:
+        # the space of a knowledge never changes, so the mapping is kept for good
+        missing = [
+            knowledge_id
+            for knowledge_id in knowledge_ids
+            if knowledge_id not in self._knowledge_spaces
+        ]
+        if missing:
             async with self.pool.acquire() as conn:
                 rows = await conn.fetch(
-                    query,
-                    params_dict["query_embedding"],
-                    params_dict["knowledge_id_list"],
-                    params_dict["tenant_id"],
-                    params_dict["embedding_model_name"],
-                    params_dict["metadata_filter"],
-                    params_dict["similarity_threshold"],
-                    params_dict["top"],
+                    f"""
+                    SELECT knowledge_id, space_id
+                    FROM {self.settings.KNOWLEDGE_TABLE_NAME}
+                    WHERE tenant_id = $1 AND knowledge_id = ANY($2::uuid[])
+                    """,
+                    tenant_id,
+                    missing,
                 )
+            for row in rows:
+                self._knowledge_spaces[str(row["knowledge_id"])] = row["space_id"]
+        return sorted(
+            {
+                self._knowledge_spaces[knowledge_id]
+                for knowledge_id in knowledge_ids
+                if knowledge_id in self._knowledge_spaces
+            }
+        )
 
-                return [
-                    self.retrievalChunk_converter.from_db_dict(dict(row))
-                    for row in rows
-                ]
+    async def _in_process_search(
+        self,
+        tenant_id: str,
+        config: HybridRetrievalConfig,
+        query_embedding: List[float],
+        limit: int,
+    ) -> Optional[List[Tuple[str, float]]]:
+        """
+        (chunk_id, cosine similarity) from an in-process backend, or None when
+        the request has to go to Postgres. Small spaces are searched exactly;
+        the ANN cache only holds whole spaces, so it takes no filtered requests.
+        """
+        if self.exact_search is not None:
+            space_ids = config.space_id_list or await self._knowledge_space_ids(
+                tenant_id, config.knowledge_id_list or []
+            )
+            scores = await self.exact_search.search(
+                tenant_id,
+                space_ids,
+                config.embedding_model_name,
+                query_embedding,
+                limit,
+                threshold=config.similarity_threshold,
+                knowledge_ids=config.knowledge_id_list,
+                metadata_filter=config.metadata_filter,
+            )
+            if scores is not None:
+                return scores
+        if (
+            self.ann_cache is None
+            or not config.space_id_list
+            or config.knowledge_id_list
+            or config.metadata_filter
+        ):
+            return None
+        _, ef_search = ANN_SEARCH_PARAMS[config.recall or self.vector_search_recall]
+        return await self.ann_cache.search(
+            tenant_id,
+            config.space_id_list,
+            config.embedding_model_name,
+            query_embedding,
+            limit,
+            threshold=config.similarity_threshold,
+            ef=ef_search,
+        )
 
-        except Exception as e:
-            self.logger.error(f"Error in search_knowledge_chunk_list: {str(e)}")
-            raise
+    async def _vector_candidates(
+        self,
+        tenant_id: str,
+        config: HybridRetrievalConfig,
+        query_embedding: List[float],
+        timer: StageTimer,
+    ) -> List[Tuple[str, float]]:
+        """(chunk_id, cosine similarity) ordered by distance"""
+        with timer.stage("vector"):
+            scores = await self._in_process_search(
+                tenant_id, config, query_embedding, config.candidate_limit
+            )
+            if scores is not None:
+                return scores
+            rows = await self._vector_search(
+                tenant_id,
+                config,
+                query_embedding,
+                config.candidate_limit,
+                columns=["chunk_id"],
+            )
+            return [(str(row["chunk_id"]), float(row["similarity"])) for row in rows]
+
+    async def _fulltext_candidates(
+        self,
+        tenant_id: str,
+        config: HybridRetrievalConfig,
+        content: str,
+        timer: StageTimer,
+    ) -> List[Tuple[str, float]]:
+        """(chunk_id, ts_rank_cd) ordered by rank, matches idx_chunk_context_fts"""
+        with timer.stage("fulltext"):
+            params: List[Any] = [content]
+            conditions = self._build_retrieval_scope(tenant_id, config, params)
+            params.append(config.candidate_limit)
+            document = f"to_tsvector('{FULLTEXT_CONFIG}', context)"
+            query = f"""
+                SELECT chunk_id, ts_rank_cd({document}, query) AS rank
+                FROM {self.settings.CHUNK_TABLE_NAME},
+                    websearch_to_tsquery('{FULLTEXT_CONFIG}', $1) query
+                WHERE {document} @@ query AND {' AND '.join(conditions)}
+                ORDER BY rank DESC
+                LIMIT ${len(params)}
+            """
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(query, *params)
+            return [(str(row["chunk_id"]), float(row["rank"])) for row in rows]
+
+    async def _fetch_retrieval_chunks(
+        self, tenant_id: str, scores: List[Tuple[str, float]]
+    ) -> List[RetrievalChunk]:
+        if not scores:
+            return []
+        async with self.pool.acquire() as conn:
+            columns = await self._get_retrieval_columns(conn)
+            rows = await conn.fetch(
+                f"""
+                SELECT {', '.join(columns)} FROM {self.settings.CHUNK_TABLE_NAME}
+                WHERE tenant_id = $1 AND chunk_id = ANY($2::uuid[])
+                """,
+                tenant_id,
+                [chunk_id for chunk_id, _ in scores],
+            )
+        rows_by_id = {str(row["chunk_id"]): dict(row) for row in rows}
+        return [
+            self.retrievalChunk_converter.from_db_dict(
+                {**rows_by_id[chunk_id], "similarity": score}
+            )
+            for chunk_id, score in scores
+            if chunk_id in rows_by_id
+        ]
 
     async def retrieve(
         self,
         tenant_id: str,
         params: RetrievalRequest,
     ) -> List[RetrievalChunk]:
-        pass
+        """
+        Hybrid retrieval: pgvector ANN and full-text search run concurrently on
+        separate pooled connections and are fused with reciprocal rank fusion.
+        Fused results carry the normalized RRF score as similarity, vector-only
+        results their cosine similarity. With a rerank_model the best
+        rerank_candidates results are reordered by the reranker instead.
+        """
+        try:
+            config = HybridRetrievalConfig.from_request(params)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        timer = StageTimer()
+        stages = []
+        if config.type in ("hybrid", "vector"):
+            with timer.stage("embed"):
+                EmbeddingCls = get_register(
+                    RegisterTypeEnum.EMBEDDING, config.embedding_model_name
+                )
+                if EmbeddingCls is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"Unknown embedding model {config.embedding_model_name}",
+                    )
+                query_embedding = await EmbeddingCls().embed_text(params.content, 10)
+            stages.append(
+                (
+                    self._vector_candidates(tenant_id, config, query_embedding, timer),
+                    config.vector_weight,
+                )
+            )
+        if config.type in ("hybrid", "fulltext"):
+            stages.append(
+                (
+                    self._fulltext_candidates(tenant_id, config, params.content, timer),
+                    config.text_weight,
+                )
+            )
+
+        try:
+            results = await asyncio.gather(*(stage for stage, _ in stages))
+            with timer.stage("fuse"):
+                if config.type == "vector":
+                    # a single vector stage keeps its cosine similarity
+                    scores = results[0][: config.result_limit]
+                else:
+                    fused = reciprocal_rank_fusion(
+                        [
+                            ([chunk_id for chunk_id, _ in result], weight)
+                            for result, (_, weight) in zip(results, stages)
+                        ],
+                        k=config.rrf_k,
+                    )
+                    scores = fused[: config.result_limit]
+            with timer.stage("fetch"):
+                chunks = await self._fetch_retrieval_chunks(tenant_id, scores)
+            if config.rerank_model:
+                with timer.stage("rerank"):
+                    chunks = await rerank_chunks(
+                        params.content,
+                        chunks,
+                        config.rerank_model,
+                        config.top,
+                        config.rerank_timeout,
+                    )
+        except Exception as e:
+            self.logger.error(f"Error in retrieve: {str(e)}")
+            raise
+        timer.finish()
+        self.logger.info(f"retrieve {config.type}: {len(chunks)} chunks, {timer}")
+        return chunks
+
+    # =============== Retrieval stats ===============
+    async def _ensure_stats_partitions(
+        self, conn: asyncpg.Connection, days: List[date]
+    ) -> None:
+        for day in days:
+            await conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {RETRIEVAL_STATS_TABLE}_{day:%Y%m%d}
+                PARTITION OF {RETRIEVAL_STATS_TABLE}
+                FOR VALUES FROM ('{day} 00:00+00') TO ('{day + timedelta(1)} 00:00+00')
+                """
+            )
+
+    async def load_retrieval_stats(
+        self, segment_id: str, rows: List[RetrievalStatRow]
+    ) -> bool:
+        """
+        Bulk load one spool segment and add it to the daily and tenant rollups, in
+        one transaction that also records the segment id. Returns False for a
+        segment loaded before, e.g. when the spool file outlived a crash.
+        """
+        columns = list(zip(*rows))
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                loaded = await conn.fetchval(
+                    f"""
+                    INSERT INTO {RETRIEVAL_STATS_SEGMENT_TABLE} (segment_id)
+                    VALUES ($1) ON CONFLICT DO NOTHING RETURNING segment_id
+                    """,
+                    segment_id,
+                )
+                if loaded is None:
+                    return False
+                if not rows:
+                    return True
+                days = sorted({row.bucket.date() for row in rows})
+                await self._ensure_stats_partitions(conn, days)
+                await conn.execute(
+                    f"""
+                    INSERT INTO {RETRIEVAL_STATS_TABLE} AS r
+                        (bucket, tenant_id, space_id, knowledge_id, chunk_id, hits)
+                    SELECT * FROM {STATS_ROWS}
+                    ON CONFLICT (bucket, tenant_id, space_id, knowledge_id, chunk_id)
+                    DO UPDATE SET hits = r.hits + EXCLUDED.hits
+                    """,
+                    *columns,
+                )
+                await conn.execute(
+                    f"""
+                    INSERT INTO {RETRIEVAL_STATS_DAILY_TABLE} AS r
+                        (day, tenant_id, space_id, knowledge_id, hits)
+                    SELECT (bucket AT TIME ZONE 'UTC')::date, tenant, space,
+                        knowledge, sum(hits)
+                    FROM {STATS_ROWS}
+                    GROUP BY 1, 2, 3, 4
+                    ON CONFLICT (day, tenant_id, space_id, knowledge_id)
+                    DO UPDATE SET hits = r.hits + EXCLUDED.hits
+                    """,
+                    *columns,
+                )
+                await conn.execute(
+                    f"""
+                    INSERT INTO {RETRIEVAL_STATS_TOTAL_TABLE} AS r (tenant_id, hits)
+                    SELECT tenant, sum(hits) FROM {STATS_ROWS}
+                    GROUP BY tenant
+                    ON CONFLICT (tenant_id) DO UPDATE SET hits = r.hits + EXCLUDED.hits
+                    """,
+                    *columns,
+                )
+        return True
+
+    async def prune_retrieval_stats(self, retention_days: int) -> List[str]:
+        """Drop minute bucket partitions older than retention_days, rollups stay"""
+        oldest = datetime.now(timezone.utc).date() - timedelta(retention_days)
+        cutoff = f"{RETRIEVAL_STATS_TABLE}_{oldest:%Y%m%d}"
+        async with self.pool.acquire() as conn:
+            partitions = await conn.fetch(
+                """
+                SELECT child.relname FROM pg_inherits
+                JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+                JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+                WHERE parent.relname = $1
+                """,
+                RETRIEVAL_STATS_TABLE,
+            )
+            dropped = [row["relname"] for row in partitions if row["relname"] < cutoff]
+            for name in dropped:
+                await conn.execute(f"DROP TABLE IF EXISTS {name}")
+        if dropped:
+            self.logger.info(f"Dropped retrieval stats partitions {dropped}")
+        return dropped
+
+    async def get_system_info(self) -> Dict[str, Any]:
+        """
+        Dashboard totals from the retrieval stats rollup and planner estimates.
+        Spaces are counted from the n_distinct statistic of knowledge.space_id;
+        only a knowledge table that has not been analyzed yet, which autovacuum
+        does after its first few dozen rows, is counted directly.
+        """
+        knowledge_table = self.settings.KNOWLEDGE_TABLE_NAME
+        async with self.pool.acquire() as conn:
+            estimates = await conn.fetch(
+                "SELECT relname, reltuples FROM pg_class WHERE relname = ANY($1)",
+                [
+                    knowledge_table,
+                    self.settings.TASK_TABLE_NAME,
+                    self.settings.TENANT_TABLE_NAME,
+                ],
+            )
+            rows = {row["relname"]: max(int(row["reltuples"]), 0) for row in estimates}
+            n_distinct = await conn.fetchval(
+                """
+                SELECT n_distinct FROM pg_stats
+                WHERE schemaname = 'public' AND tablename = $1
+                AND attname = 'space_id'
+                """,
+                knowledge_table,
+            )
+            if n_distinct is None:
+                space_count = await conn.fetchval(
+                    f"SELECT count(DISTINCT space_id) FROM {knowledge_table}"
+                )
+            elif n_distinct >= 0:
+                space_count = int(n_distinct)
+            else:
+                # a negative n_distinct is the distinct share of the rows
+                space_count = round(-n_distinct * rows.get(knowledge_table, 0))
+            retrieval_count = await conn.fetchval(
+                f"SELECT COALESCE(sum(hits), 0) FROM {RETRIEVAL_STATS_TOTAL_TABLE}"
+            )
+            storage_size = await conn.fetchval(
+                "SELECT pg_size_pretty(pg_database_size(current_database()))"
+            )
+        return {
+            "space_count": space_count,
+            "knowledge_count": rows.get(knowledge_table, 0),
+            "task_count": rows.get(self.settings.TASK_TABLE_NAME, 0),
+            "tenant_count": rows.get(self.settings.TENANT_TABLE_NAME, 0),
+            "retrieval_count": int(retrieval_count),
+            "storage_size": storage_size,
+        }
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from whiskerrag_types.model import Chunk
+
+from .snapshot import (
+    DEFAULT_SNAPSHOT_DIR,
+    SnapshotStore,
+    SpaceKey,
+    SpaceSnapshot,
+    add_entry,
+    delete_entry,
+    delete_knowledge_entry,
+    is_filter_supported,
+)
+
+logger = logging.getLogger("whisker")
+
+# rows of a space (chunk_id, knowledge_id, embedding, context, metadata), or None
+# when the space has more than the given number of rows
+SpaceLoader = Callable[[SpaceKey, int], Awaitable[Optional[List[Dict[str, Any]]]]]
+
+DEFAULT_EXACT_SEARCH_MAX_ROWS = 50_000
+DEFAULT_EXACT_SEARCH_DIR = DEFAULT_SNAPSHOT_DIR
+# snapshots are kept current by the append log; a full rebuild after this long
+# only catches rows changed behind the plugin's back (e.g. by hand-written SQL)
+DEFAULT_EXACT_SEARCH_MAX_AGE = 24 * 3600
+# the log is folded into a new snapshot version once it grows past this size
+DEFAULT_EXACT_SEARCH_COMPACT_LOG_BYTES = 64 * 1024 * 1024
+
+
+def _search_snapshots(
+    snapshots: List[SpaceSnapshot],
+    query: Any,
+    k: int,
+    threshold: float,
+    knowledge_ids: Optional[Sequence[str]],
+    metadata_filter: Optional[dict],
+) -> List[Tuple[str, float]]:
+    results: List[Tuple[str, float]] = []
+    for snapshot in snapshots:
+        snapshot.refresh()
+        results.extend(
+            snapshot.search(query, k, threshold, knowledge_ids, metadata_filter)
+        )
+    results.sort(key=lambda item: item[1], reverse=True)
+    return results[:k]
+
+
+class ExactSearchBackend:
+    """
+    Brute-force retrieval for small, read-mostly spaces, picked automatically by
+    size and served from on-disk snapshots (see snapshot.SnapshotStore).
+
+    The first query of a space counts its rows (bounded by max_rows) and builds a
+    snapshot in the background if it is small; until then and for large spaces
+    search() returns None and the caller uses Postgres. Every worker process maps
+    the same snapshot files, writes are appended to the snapshot log and picked
+    up by all of them on their next search.
+    """
+
+    def __init__(
+        self,
+        loader: SpaceLoader,
+        store: Optional[SnapshotStore] = None,
+        max_rows: int = DEFAULT_EXACT_SEARCH_MAX_ROWS,
+        max_age: float = DEFAULT_EXACT_SEARCH_MAX_AGE,
+        compact_log_bytes: int = DEFAULT_EXACT_SEARCH_COMPACT_LOG_BYTES,
+    ):
+        self.loader = loader
+        self.store = store or SnapshotStore()
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.compact_log_bytes = compact_log_bytes
+        self._snapshots: Dict[SpaceKey, SpaceSnapshot] = {}
+        # spaces found too large, with the time they were counted
+        self._large: Dict[SpaceKey, float] = {}
+        self._loading: Dict[SpaceKey, asyncio.Task] = {}
+
+    def _schedule(self, key: SpaceKey, job: Callable[[SpaceKey], Awaitable]) -> None:
+        if key not in self._loading:
+            self._loading[key] = asyncio.create_task(self._run(key, job))
+
+    async def _run(self, key: SpaceKey, job: Callable[[SpaceKey], Awaitable]) -> None:
+        try:
+            await job(key)
+        except Exception as e:
+            logger.error(f"Exact search: failed to build snapshot of {key[1]}: {e}")
+        finally:
+            self._loading.pop(key, None)
+
+    async def _build(self, key: SpaceKey) -> None:
+        position = await asyncio.to_thread(self.store.log_position, key)
+        rows = await self.loader(key, self.max_rows)
+        if rows is None:
+            self._large[key] = time.monotonic()
+            self._snapshots.pop(key, None)
+            await asyncio.to_thread(self.store.discard, key)
+            return
+        self._large.pop(key, None)
+        await asyncio.to_thread(self.store.write, key, rows, position)
+
+    async def _compact(self, key: SpaceKey) -> None:
+        await asyncio.to_thread(self.store.compact, key)
+
+    def _get_snapshot(self, key: SpaceKey) -> Optional[SpaceSnapshot]:
+        counted_at = self._large.get(key)
+        if counted_at is not None and time.monotonic() - counted_at < self.max_age:
+            return None
+        path = self.store.current_path(key)
+        if path is None:
+            self._schedule(key, self._build)
+            return None
+        snapshot = self._snapshots.get(key)
+        if snapshot is None or snapshot.path != path:
+            # another process may have published a new version
+            try:
+                snapshot = SpaceSnapshot(path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Exact search: unreadable snapshot {path}: {e}")
+                self._schedule(key, self._build)
+                return None
+            self._snapshots[key] = snapshot
+        if len(snapshot) > self.max_rows:
+            self._large[key] = time.monotonic()
+            self._snapshots.pop(key, None)
+            return None
+        if time.time() - snapshot.manifest["created_at"] > self.max_age:
+            self._schedule(key, self._build)
+        elif snapshot.log_offset > self.compact_log_bytes:
+            self._schedule(key, self._compact)
+        # a stale version keeps serving until the rebuild replaces it
+        return snapshot
+
+    async def search(
+        self,
+        tenant_id: str,
+        space_ids: Sequence[str],
+        embedding_model_name: str,
+        query: Any,
+        k: int,
+        threshold: float = 0.0,
+        knowledge_ids: Optional[Sequence[str]] = None,
+        metadata_filter: Optional[dict] = None,
+    ) -> Optional[List[Tuple[str, float]]]:
+        if not space_ids or not is_filter_supported(metadata_filter):
+            return None
+        snapshots = [
+            self._get_snapshot((tenant_id, space_id, embedding_model_name))
+            for space_id in space_ids
+        ]
+        if any(snapshot is None for snapshot in snapshots):
+            return None
+        return await asyncio.to_thread(
+            _search_snapshots,
+            snapshots,
+            query,
+            k,
+            threshold,
+            knowledge_ids,
+            metadata_filter,
+        )
+
+    # ---------- writes ----------
+    async def add_chunks(self, chunks: List[Chunk]) -> None:
+        entries: Dict[SpaceKey, List[Dict[str, Any]]] = {}
+        for chunk in chunks:
+            if chunk.embedding is None:
+                continue
+            key = (str(chunk.tenant_id), chunk.space_id, chunk.embedding_model_name)
+            entries.setdefault(key, []).append(
+                add_entry(
+                    {
+                        "chunk_id": chunk.chunk_id,
+                        "knowledge_id": chunk.knowledge_id,
+                        "embedding": chunk.embedding,
+                        "context": chunk.context,
+                        "metadata": chunk.metadata,
+                    }
+                )
+            )
+        for key, space_entries in entries.items():
+            await asyncio.to_thread(self.store.append, key, space_entries)
+
+    async def remove_chunks(self, tenant_id: str, chunk_ids: List[str]) -> None:
+        await asyncio.to_thread(
+            self.store.append_tenant, tenant_id, [delete_entry(chunk_ids)]
+        )
+
+    async def remove_knowledge(self, tenant_id: str, knowledge_ids: List[str]) -> None:
+        await asyncio.to_thread(
+            self.store.append_tenant, tenant_id, [delete_knowledge_entry(knowledge_ids)]
+        )
@@ -0,0 +1,363 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from typing import Dict, List, Optional
+
+import asyncpg
+
+from core.vector_index import (
+    HNSW_MAX_DIMENSIONS,
+    HNSW_OPERATORS,
+    RERANK_FACTORS,
+    VectorIndexInfo,
+    VectorQuantization,
+    hnsw_build_params,
+    quantized_expression,
+)
+
+logger = logging.getLogger("whisker")
+
+MANAGED_INDEX_PREFIX = "idx_chunk_hnsw_"
+# models with fewer chunks are served well enough by a sequential scan
+DEFAULT_MIN_INDEX_ROWS = 10_000
+DEFAULT_MAINTENANCE_INTERVAL = 3600
+# pg_try_advisory_lock key, keeps several server processes from building at once
+MAINTENANCE_LOCK_KEY = 0x57484953
+
+
+def _quote_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def managed_index_name(embedding_model_name: str) -> str:
+    """Stable, identifier-safe name; the hash keeps similar model names apart"""
+    slug = re.sub(r"[^a-z0-9]+", "_", embedding_model_name.lower()).strip("_")
+    digest = hashlib.sha1(embedding_model_name.encode("utf-8")).hexdigest()[:8]
+    return f"{MANAGED_INDEX_PREFIX}{slug[:30]}_{digest}"
+
+
+class VectorIndexManager:
+    """
+    Maintains one partial HNSW index per embedding model on the chunk table.
+
+    The shared embedding column has no fixed dimension, so each index is built on
+    the expression embedding::vector(dim) with WHERE embedding_model_name = '<name>'.
+    Queries must repeat both (see vector_expression and model_condition) for the
+    planner to pick the index. Model name and dimension are stored as the index
+    comment, which makes the catalog the only source of truth. Once a model is
+    indexed, inserting one of its chunks with another dimension fails the cast.
+
+    With a quantization the index is built on embedding::halfvec(dim) or on the
+    binary quantized vector instead, and queries re-rank the candidates it
+    returns on the full vectors (index_distance, rerank_factor).
+
+    Build parameters follow the model's row count (hnsw_build_params); an index
+    whose parameters or quantization no longer match is rebuilt side by side and
+    swapped in, an invalid one (failed concurrent build) is reindexed
+    concurrently.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        table_name: str,
+        min_rows: int = DEFAULT_MIN_INDEX_ROWS,
+        maintenance_work_mem: Optional[str] = None,
+        quantization: VectorQuantization = VectorQuantization.NONE,
+    ):
+        self.pool = pool
+        self.table_name = table_name
+        self.min_rows = min_rows
+        self.maintenance_work_mem = maintenance_work_mem
+        self.quantization = quantization
+        # valid managed indexes by embedding model name
+        self._indexes: Dict[str, VectorIndexInfo] = {}
+        self._model_rows: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def get_index(self, embedding_model_name: str) -> Optional[VectorIndexInfo]:
+        return self._indexes.get(embedding_model_name)
+
+    def vector_expression(self, embedding_model_name: str) -> str:
+        index = self.get_index(embedding_model_name)
+        if index is None:
+            return "embedding"
+        return f"embedding::vector({index.dimension})"
+
+    def index_distance(self, embedding_model_name: str, value: str = "$1") -> str:
+        """Distance to order by for the index of the model to serve the query"""
+        index = self.get_index(embedding_model_name)
+        if index is None:
+            return f"embedding <=> {value}"
+        _, operator = HNSW_OPERATORS[index.quantization]
+        indexed = quantized_expression(index.quantization, index.dimension, "embedding")
+        query = quantized_expression(index.quantization, index.dimension, value)
+        return f"{indexed} {operator} {query}"
+
+    def rerank_factor(self, embedding_model_name: str) -> int:
+        index = self.get_index(embedding_model_name)
+        return RERANK_FACTORS[index.quantization] if index else 1
+
+    def model_condition(self, embedding_model_name: str) -> Optional[str]:
+        """Literal predicate matching the partial index, None without an index"""
+        if self.get_index(embedding_model_name) is None:
+            return None
+        return f"embedding_model_name = {_quote_literal(embedding_model_name)}"
+
+    async def _list_indexes(self, conn: asyncpg.Connection) -> List[VectorIndexInfo]:
+        rows = await conn.fetch(
+            """
+            SELECT
+                c.relname AS index_name,
+                am.amname AS method,
+                obj_description(c.oid, 'pg_class') AS comment,
+                c.reloptions,
+                i.indisvalid AS valid,
+                pg_relation_size(c.oid) AS size_bytes,
+                pg_size_pretty(pg_relation_size(c.oid)) AS size,
+                COALESCE(s.idx_scan, 0) AS scans
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_am am ON am.oid = c.relam
+            LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = i.indexrelid
+            WHERE i.indrelid = $1::regclass AND am.amname IN ('hnsw', 'ivfflat')
+            ORDER BY c.relname
+            """,
+            self.table_name,
+        )
+        indexes = []
+        for row in rows:
+            info = VectorIndexInfo(
+                index_name=row["index_name"],
+                method=row["method"],
+                valid=row["valid"],
+                size_bytes=row["size_bytes"],
+                size=row["size"],
+                scans=row["scans"],
+                params={
+                    key: int(value)
+                    for key, value in (
+                        option.split("=", 1) for option in row["reloptions"] or []
+                    )
+                    if value.isdigit()
+                },
+            )
+            if row["index_name"].startswith(MANAGED_INDEX_PREFIX) and row["comment"]:
+                try:
+                    comment = json.loads(row["comment"])
+                    model_name = comment["embedding_model_name"]
+                    dimension = int(comment["dimension"])
+                    quantization = VectorQuantization(
+                        comment.get("quantization", VectorQuantization.NONE)
+                    )
+                except (ValueError, KeyError, TypeError):
+                    logger.warning(f"Unreadable comment on index {info.index_name}")
+                else:
+                    # leftovers of an interrupted rebuild carry the same comment
+                    if info.index_name == managed_index_name(model_name):
+                        info.embedding_model_name = model_name
+                        info.dimension = dimension
+                        info.quantization = quantization
+            indexes.append(info)
+        return indexes
+
+    async def _collect_model_stats(
+        self, conn: asyncpg.Connection
+    ) -> List[asyncpg.Record]:
+        # a full pass over the table, only run from maintenance
+        return await conn.fetch(
+            f"""
+            SELECT
+                embedding_model_name,
+                min(vector_dims(embedding)) AS min_dim,
+                max(vector_dims(embedding)) AS max_dim,
+                count(*) AS row_count
+            FROM {self.table_name}
+            WHERE embedding IS NOT NULL AND embedding_model_name IS NOT NULL
+            GROUP BY embedding_model_name
+            """
+        )
+
+    async def refresh(self, conn: Optional[asyncpg.Connection] = None) -> None:
+        """Reload the valid managed indexes used to route queries"""
+        if conn is None:
+            async with self.pool.acquire() as conn:
+                return await self.refresh(conn)
+        self._indexes = {
+            index.embedding_model_name: index
+            for index in await self._list_indexes(conn)
+            if index.valid and index.embedding_model_name and index.dimension
+        }
+
+    async def report(self) -> List[VectorIndexInfo]:
+        async with self.pool.acquire() as conn:
+            indexes = await self._list_indexes(conn)
+        for index in indexes:
+            rows = self._model_rows.get(index.embedding_model_name or "")
+            if rows is None:
+                continue
+            index.rows = rows
+            index.expected_params = hnsw_build_params(rows)
+            index.needs_rebuild = (
+                not index.valid
+                or index.params != index.expected_params
+                or index.quantization != self.quantization
+            )
+        return indexes
+
+    async def _create_index(
+        self,
+        conn: asyncpg.Connection,
+        index_name: str,
+        embedding_model_name: str,
+        dimension: int,
+        params: Dict[str, int],
+    ) -> None:
+        options = ", ".join(f"{key} = {value}" for key, value in params.items())
+        expression = quantized_expression(self.quantization, dimension, "embedding")
+        operator_class, _ = HNSW_OPERATORS[self.quantization]
+        try:
+            # CONCURRENTLY cannot run inside a transaction block
+            await conn.execute(
+                f"""
+                CREATE INDEX CONCURRENTLY {index_name} ON {self.table_name}
+                USING hnsw (({expression}) {operator_class})
+                WITH ({options})
+                WHERE embedding_model_name = {_quote_literal(embedding_model_name)}
+                """
+            )
+        except Exception:
+            # a failed concurrent build leaves an invalid index behind
+            await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+            raise
+        comment = json.dumps(
+            {
+                "embedding_model_name": embedding_model_name,
+                "dimension": dimension,
+                "quantization": self.quantization.value,
+            }
+        )
+        await conn.execute(
+            f"COMMENT ON INDEX {index_name} IS {_quote_literal(comment)}"
+        )
+
+    async def _maintain_model(
+        self,
+        conn: asyncpg.Connection,
+        stats: asyncpg.Record,
+        current: Optional[VectorIndexInfo],
+    ) -> Optional[str]:
+        model_name = stats["embedding_model_name"]
+        dimension = stats["max_dim"]
+        if stats["min_dim"] != dimension:
+            logger.warning(
+                f"Embedding model {model_name} has mixed dimensions "
+                f"{stats['min_dim']}..{dimension}, skipping vector index"
+            )
+            return None
+        max_dimensions = HNSW_MAX_DIMENSIONS[self.quantization]
+        if dimension > max_dimensions:
+            logger.warning(
+                f"Embedding model {model_name} has {dimension} dimensions, "
+                f"above the {self.quantization.value} hnsw limit of {max_dimensions}"
+            )
+            return None
+        if current is None and stats["row_count"] < self.min_rows:
+            return None
+
+        index_name = managed_index_name(model_name)
+        params = hnsw_build_params(stats["row_count"])
+        if current is None:
+            await self._create_index(conn, index_name, model_name, dimension, params)
+            return f"created {index_name} {params}"
+        if not current.valid:
+            await conn.execute(f"REINDEX INDEX CONCURRENTLY {index_name}")
+            return f"reindexed {index_name}"
+        if (
+            current.dimension != dimension
+            or current.params != params
+            or current.quantization != self.quantization
+        ):
+            # build the replacement first so queries keep an index throughout
+            new_name = f"{index_name}_new"
+            await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {new_name}")
+            await self._create_index(conn, new_name, model_name, dimension, params)
+            await conn.execute(f"DROP INDEX CONCURRENTLY {index_name}")
+            await conn.execute(f"ALTER INDEX {new_name} RENAME TO {index_name}")
+            return (
+                f"rebuilt {index_name} {current.quantization.value} {current.params}"
+                f" -> {self.quantization.value} {params}"
+            )
+        return None
+
+    async def maintain(self) -> List[str]:
+        """
+        Create, rebuild or reindex managed indexes to match the current data.
+        Returns a description of every action taken.
+        """
+        actions: List[str] = []
+        async with self.pool.acquire() as conn:
+            if not await conn.fetchval(
+                "SELECT pg_try_advisory_lock($1)", MAINTENANCE_LOCK_KEY
+            ):
+                logger.info("Vector index maintenance already running elsewhere")
+                # pick up what the process holding the lock built or rebuilt
+                await self.refresh(conn)
+                return actions
+            try:
+                if self.maintenance_work_mem:
+                    await conn.execute(
+                        "SET maintenance_work_mem = "
+                        f"{_quote_literal(self.maintenance_work_mem)}"
+                    )
+                stats_list = await self._collect_model_stats(conn)
+                self._model_rows = {
+                    stats["embedding_model_name"]: stats["row_count"]
+                    for stats in stats_list
+                }
+                current = {
+                    index.embedding_model_name: index
+                    for index in await self._list_indexes(conn)
+                    if index.embedding_model_name
+                }
+                for stats in stats_list:
+                    model_name = stats["embedding_model_name"]
+                    try:
+                        action = await self._maintain_model(
+                            conn, stats, current.get(model_name)
+                        )
+                    except Exception as e:
+                        logger.error(f"Vector index maintenance for {model_name}: {e}")
+                        continue
+                    if action:
+                        logger.info(f"Vector index maintenance: {action}")
+                        actions.append(action)
+                await self.refresh(conn)
+            finally:
+                await conn.execute(
+                    "SELECT pg_advisory_unlock($1)", MAINTENANCE_LOCK_KEY
+                )
+        return actions
+
+    async def _maintenance_loop(self, interval: float) -> None:
+        while True:
+            try:
+                await self.maintain()
+            except Exception as e:
+                logger.error(f"Vector index maintenance failed: {e}")
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float = DEFAULT_MAINTENANCE_INTERVAL) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._maintenance_loop(interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
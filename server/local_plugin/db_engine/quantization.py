@@ -0,0 +1,40 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+# rows scored per block, bounds the float32 temporaries of quantized scoring
+SCORE_BLOCK_ROWS = 8192
+# candidates scored on codes per result re-ranked at full precision
+DEFAULT_RERANK_FACTOR = 4
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-row int8 codes: row ≈ codes * scale. A quarter of the float32
+    size; on normalized embeddings the cosine error stays around 1e-3.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=-1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[..., None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    return codes.astype(np.float32) * scales[..., None]
+
+
+def blockwise_scores(
+    vectors: np.ndarray, query: np.ndarray, scales: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    vectors @ query for float16 or int8 rows, upcast block by block instead of
+    materializing a float32 copy of the whole (possibly memory-mapped) matrix
+    """
+    scores = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+        block = vectors[start : start + SCORE_BLOCK_ROWS]
+        scores[start : start + len(block)] = block.astype(np.float32) @ query
+    if scales is not None:
+        scores *= scales
+    return scores
@@ -0,0 +1,570 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.export import decode_embedding, encode_embedding
+
+from .quantization import DEFAULT_RERANK_FACTOR, blockwise_scores, quantize_int8
+
+logger = logging.getLogger("whisker")
+
+# (tenant_id, space_id, embedding_model_name)
+SpaceKey = Tuple[str, str, str]
+# (log path, byte offset) a new version has to replay the log from
+LogPosition = Tuple[Optional[str], int]
+
+SNAPSHOT_FORMAT_VERSION = 1
+DEFAULT_SNAPSHOT_DIR = "./data/snapshots"
+# int8 keeps float32 vectors next to the codes for re-ranking, only the codes
+# are scanned per query
+SNAPSHOT_DTYPES = ("float32", "float16", "int8")
+CURRENT_FILE = "CURRENT"
+LOG_FILE = "log.ndjson"
+LOCK_FILE = ".lock"
+BUILD_LOCK_FILE = ".build.lock"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _encode_scalar(value: Any) -> Optional[str]:
+    """
+    Comparable form of a JSON scalar, None for containers. Numbers compare by
+    value like jsonb does (1 == 1.0), so they are encoded as floats.
+    """
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "b:true" if value else "b:false"
+    if isinstance(value, (int, float)):
+        return f"n:{float(value)!r}"
+    if isinstance(value, str):
+        return f"s:{value}"
+    return None
+
+
+def is_filter_supported(metadata_filter: Optional[dict]) -> bool:
+    """
+    Only flat scalar equality maps onto columns, jsonb containment of nested
+    objects and arrays is left to Postgres
+    """
+    return all(
+        _encode_scalar(value) is not None for value in (metadata_filter or {}).values()
+    )
+
+
+def add_entry(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Log entry for an inserted or updated chunk"""
+    return {
+        "op": "add",
+        "chunk_id": str(row["chunk_id"]),
+        "knowledge_id": str(row["knowledge_id"]),
+        "embedding": encode_embedding(row["embedding"]),
+        "context": row.get("context") or "",
+        "metadata": row.get("metadata") or {},
+    }
+
+
+def delete_entry(chunk_ids: Sequence[str]) -> Dict[str, Any]:
+    return {"op": "delete", "chunk_ids": [str(chunk_id) for chunk_id in chunk_ids]}
+
+
+def delete_knowledge_entry(knowledge_ids: Sequence[str]) -> Dict[str, Any]:
+    return {"op": "delete_knowledge", "knowledge_ids": [str(i) for i in knowledge_ids]}
+
+
+@contextmanager
+def _flock(path: str, flags: int = fcntl.LOCK_EX) -> Iterator[bool]:
+    """Inter-process lock on a file; yields False if LOCK_NB was given and busy"""
+    with open(path, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _save_blob(path: str, values: List[bytes]) -> None:
+    """Concatenated values plus an int64 offsets array, value i is [o[i], o[i+1])"""
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in values], out=offsets[1:])
+    with open(f"{path}.bin", "wb") as blob:
+        blob.write(b"".join(values))
+    np.save(f"{path}_offsets.npy", offsets)
+
+
+def write_snapshot(
+    path: str,
+    rows: Iterable[Dict[str, Any]],
+    key: SpaceKey,
+    dtype: str = "float32",
+) -> int:
+    """
+    Write one snapshot version directory:
+
+        manifest.json          format version, key, dim, rows, dtype
+        vectors.npy            (rows, dim) L2-normalized, float32 or float16
+        codes.npy, scales.npy  int8 only: per-row scalar quantized vectors
+        chunk_ids.npy          fixed-width bytes
+        knowledge_codes.npy    int32 index into knowledge_ids.json
+        content.bin            utf-8 chunk contexts, sliced by content_offsets.npy
+        metadata.bin           JSON metadata per row, sliced by metadata_offsets.npy
+        log.ndjson             changes since the snapshot was written (appended)
+
+    Every array is a plain .npy file so readers can np.load(mmap_mode="r") it.
+    """
+    if dtype not in SNAPSHOT_DTYPES:
+        raise ValueError(f"Unsupported snapshot dtype {dtype}")
+    vectors, chunk_ids, knowledge_ids, contexts, metadata = [], [], [], [], []
+    for row in rows:
+        vectors.append(np.asarray(row["embedding"], dtype=np.float32))
+        chunk_ids.append(str(row["chunk_id"]).encode("utf-8"))
+        knowledge_ids.append(str(row["knowledge_id"]))
+        contexts.append((row.get("context") or "").encode("utf-8"))
+        metadata.append(json.dumps(row.get("metadata") or {}).encode("utf-8"))
+    dim = len(vectors[0]) if vectors else 0
+
+    os.makedirs(path)
+    matrix = _normalize(np.stack(vectors)) if vectors else np.empty((0, 0))
+    if dtype == "int8":
+        codes, scales = quantize_int8(matrix)
+        np.save(os.path.join(path, "codes.npy"), codes)
+        np.save(os.path.join(path, "scales.npy"), scales)
+        np.save(os.path.join(path, "vectors.npy"), matrix.astype(np.float32))
+    else:
+        np.save(os.path.join(path, "vectors.npy"), matrix.astype(dtype))
+    np.save(os.path.join(path, "chunk_ids.npy"), np.array(chunk_ids, dtype=bytes))
+    dictionary = sorted(set(knowledge_ids))
+    codes = {knowledge_id: code for code, knowledge_id in enumerate(dictionary)}
+    np.save(
+        os.path.join(path, "knowledge_codes.npy"),
+        np.array([codes[i] for i in knowledge_ids], dtype=np.int32),
+    )
+    with open(os.path.join(path, "knowledge_ids.json"), "w") as file:
+        json.dump(dictionary, file)
+    _save_blob(os.path.join(path, "content"), contexts)
+    _save_blob(os.path.join(path, "metadata"), metadata)
+    open(os.path.join(path, LOG_FILE), "ab").close()
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "tenant_id": key[0],
+        "space_id": key[1],
+        "embedding_model_name": key[2],
+        "dim": dim,
+        "rows": len(chunk_ids),
+        "dtype": dtype,
+        "created_at": time.time(),
+    }
+    with open(os.path.join(path, "manifest.json"), "w") as file:
+        json.dump(manifest, file)
+    return len(chunk_ids)
+
+
+class SpaceSnapshot:
+    """
+    Read side of a snapshot version.
+
+    The base arrays are memory-mapped, so every worker process shares one copy
+    in the page cache. Entries appended to the version's log are applied in
+    memory on refresh(): deleted base rows are masked, added rows kept in a
+    small float32 delta. Searches are exact, except that int8 snapshots pick
+    rerank_factor * k candidates from the codes and re-rank those at full
+    precision.
+    """
+
+    rerank_factor = DEFAULT_RERANK_FACTOR
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as file:
+            self.manifest = json.load(file)
+        if self.manifest["format_version"] != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format in {path}")
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, name), mmap_mode="r")
+
+        self.vectors = load("vectors.npy")
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        if self.manifest["dtype"] == "int8":
+            self.codes = load("codes.npy")
+            self.scales = load("scales.npy")
+        self.chunk_ids = load("chunk_ids.npy")
+        self.knowledge_codes = load("knowledge_codes.npy")
+        with open(os.path.join(path, "knowledge_ids.json")) as file:
+            self.knowledge_dictionary: List[str] = json.load(file)
+        self._content_offsets = load("content_offsets.npy")
+        self._metadata_offsets = load("metadata_offsets.npy")
+        self._content = self._map_blob("content.bin")
+        self._metadata = self._map_blob("metadata.bin")
+
+        self.alive = np.ones(len(self.chunk_ids), dtype=bool)
+        self._base_rows: Optional[Dict[str, int]] = None
+        self._metadata_columns: Optional[Dict[str, np.ndarray]] = None
+        # chunk_id -> (knowledge_id, normalized vector, context, metadata)
+        self._delta: Dict[str, Tuple[str, np.ndarray, str, dict]] = {}
+        self._delta_arrays: Optional[Tuple[List[str], np.ndarray, List[str]]] = None
+        self.log_path = os.path.join(path, LOG_FILE)
+        self.log_offset = 0
+        self._lock = threading.Lock()
+
+    def _map_blob(self, name: str) -> np.ndarray:
+        if os.path.getsize(os.path.join(self.path, name)) == 0:
+            return np.empty(0, dtype=np.uint8)
+        return np.memmap(os.path.join(self.path, name), dtype=np.uint8, mode="r")
+
+    @property
+    def dim(self) -> int:
+        return self.manifest["dim"]
+
+    def __len__(self) -> int:
+        return int(self.alive.sum()) + len(self._delta)
+
+    def _blob_value(self, blob: np.ndarray, offsets: np.ndarray, row: int) -> str:
+        return blob[offsets[row] : offsets[row + 1]].tobytes().decode("utf-8")
+
+    def context(self, row: int) -> str:
+        return self._blob_value(self._content, self._content_offsets, row)
+
+    def _row_metadata(self, row: int) -> dict:
+        return json.loads(self._blob_value(self._metadata, self._metadata_offsets, row))
+
+    def _base_row_map(self) -> Dict[str, int]:
+        if self._base_rows is None:
+            self._base_rows = {
+                chunk_id.decode("utf-8"): row
+                for row, chunk_id in enumerate(self.chunk_ids.tolist())
+            }
+        return self._base_rows
+
+    # ---------- log ----------
+    def _apply(self, entry: Dict[str, Any]) -> None:
+        op = entry.get("op")
+        if op == "add":
+            chunk_id = entry["chunk_id"]
+            row = self._base_row_map().get(chunk_id)
+            if row is not None:
+                self.alive[row] = False
+            vector = np.asarray(decode_embedding(entry["embedding"]), np.float32)
+            self._delta[chunk_id] = (
+                entry["knowledge_id"],
+                _normalize(vector),
+                entry.get("context", ""),
+                entry.get("metadata") or {},
+            )
+        elif op == "delete":
+            rows = self._base_row_map()
+            for chunk_id in entry["chunk_ids"]:
+                self._delta.pop(chunk_id, None)
+                if chunk_id in rows:
+                    self.alive[rows[chunk_id]] = False
+        elif op == "delete_knowledge":
+            knowledge_ids = set(entry["knowledge_ids"])
+            codes = [
+                code
+                for code, knowledge_id in enumerate(self.knowledge_dictionary)
+                if knowledge_id in knowledge_ids
+            ]
+            if codes:
+                self.alive[np.isin(self.knowledge_codes, codes)] = False
+            for chunk_id, item in list(self._delta.items()):
+                if item[0] in knowledge_ids:
+                    del self._delta[chunk_id]
+        self._delta_arrays = None
+
+    def refresh(self) -> None:
+        """Apply log entries appended since the last refresh"""
+        with self._lock:
+            size = os.path.getsize(self.log_path)
+            if size <= self.log_offset:
+                return
+            with open(self.log_path, "rb") as log:
+                log.seek(self.log_offset)
+                data = log.read(size - self.log_offset)
+            # a line still being written is picked up by the next refresh
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                if line.strip():
+                    self._apply(json.loads(line))
+            self.log_offset += end
+
+    # ---------- search ----------
+    def _metadata_column(self, key: str) -> np.ndarray:
+        if self._metadata_columns is None:
+            self._metadata_columns = {}
+        if key not in self._metadata_columns:
+            self._metadata_columns[key] = np.array(
+                [
+                    _encode_scalar(self._row_metadata(row).get(key, ...))
+                    for row in range(len(self.chunk_ids))
+                ],
+                dtype=object,
+            )
+        return self._metadata_columns[key]
+
+    def _base_mask(
+        self, knowledge_ids: Optional[Sequence[str]], metadata_filter: Optional[dict]
+    ) -> np.ndarray:
+        mask = self.alive.copy()
+        if knowledge_ids:
+            wanted = set(knowledge_ids)
+            codes = [
+                code
+                for code, knowledge_id in enumerate(self.knowledge_dictionary)
+                if knowledge_id in wanted
+            ]
+            mask &= np.isin(self.knowledge_codes, codes)
+        for key, value in (metadata_filter or {}).items():
+            mask &= self._metadata_column(key) == _encode_scalar(value)
+        return mask
+
+    def _base_scores(self, query: np.ndarray) -> np.ndarray:
+        if self.codes is not None:
+            return blockwise_scores(self.codes, query, self.scales)
+        if self.vectors.dtype == np.float32:
+            return self.vectors @ query
+        return blockwise_scores(self.vectors, query)
+
+    def _delta_matches(
+        self, knowledge_ids: Optional[Sequence[str]], metadata_filter: Optional[dict]
+    ) -> List[Tuple[str, np.ndarray]]:
+        wanted = set(knowledge_ids or ())
+        return [
+            (chunk_id, vector)
+            for chunk_id, (knowledge_id, vector, _, metadata) in self._delta.items()
+            if (not wanted or knowledge_id in wanted)
+            and all(
+                _encode_scalar(metadata.get(key, ...)) == _encode_scalar(value)
+                for key, value in (metadata_filter or {}).items()
+            )
+        ]
+
+    def search(
+        self,
+        query: Any,
+        k: int,
+        threshold: float = 0.0,
+        knowledge_ids: Optional[Sequence[str]] = None,
+        metadata_filter: Optional[dict] = None,
+    ) -> List[Tuple[str, float]]:
+        """(chunk_id, cosine similarity) of the k best live rows above threshold"""
+        query = _normalize(np.asarray(query, dtype=np.float32))
+        results: List[Tuple[str, float]] = []
+        with self._lock:
+            if len(self.chunk_ids):
+                scores = self._base_scores(query)
+                scores[~self._base_mask(knowledge_ids, metadata_filter)] = -np.inf
+                rerank = self.codes is not None
+                top_k = min(k * self.rerank_factor if rerank else k, len(scores))
+                top = np.argpartition(-scores, top_k - 1)[:top_k]
+                top = top[np.isfinite(scores[top])]
+                if rerank:
+                    # sorted rows read the mapped float32 file front to back
+                    top = np.sort(top)
+                    top_scores = self.vectors[top] @ query
+                else:
+                    top_scores = scores[top]
+                results.extend(
+                    (self.chunk_ids[row].decode("utf-8"), float(score))
+                    for row, score in zip(top.tolist(), top_scores.tolist())
+                    if score >= threshold
+                )
+            delta = self._delta_matches(knowledge_ids, metadata_filter)
+            if delta:
+                delta_scores = np.stack([vector for _, vector in delta]) @ query
+                results.extend(
+                    (chunk_id, float(score))
+                    for (chunk_id, _), score in zip(delta, delta_scores.tolist())
+                    if score >= threshold
+                )
+        results.sort(key=lambda item: item[1], reverse=True)
+        return results[:k]
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        """Live rows with full precision vectors, used to write the next version"""
+        for row in np.flatnonzero(self.alive).tolist():
+            yield {
+                "chunk_id": self.chunk_ids[row].decode("utf-8"),
+                "knowledge_id": self.knowledge_dictionary[self.knowledge_codes[row]],
+                "embedding": np.asarray(self.vectors[row], dtype=np.float32),
+                "context": self.context(row),
+                "metadata": self._row_metadata(row),
+            }
+        for chunk_id, (knowledge_id, vector, context, metadata) in list(
+            self._delta.items()
+        ):
+            yield {
+                "chunk_id": chunk_id,
+                "knowledge_id": knowledge_id,
+                "embedding": vector,
+                "context": context,
+                "metadata": metadata,
+            }
+
+
+class SnapshotStore:
+    """
+    Snapshot versions of every space under one root directory:
+
+        <root>/<tenant_id>/<sha1(space_id, model)>/CURRENT   name of live version
+                                                  /v<N>/     see write_snapshot
+
+    Writers append to the live version's log under an exclusive file lock. A
+    rebuild (from the chunk table or by compacting the live version with its
+    log) writes v<N+1> next to it, copies the log entries appended meanwhile,
+    then switches CURRENT, all under the same lock. Log entries are idempotent,
+    so replaying one the new base already contains is harmless.
+    """
+
+    def __init__(self, root: str = DEFAULT_SNAPSHOT_DIR, dtype: str = "float32"):
+        if dtype not in SNAPSHOT_DTYPES:
+            raise ValueError(f"Unsupported snapshot dtype {dtype}")
+        self.root = root
+        self.dtype = dtype
+
+    def space_dir(self, key: SpaceKey) -> str:
+        tenant_id, space_id, model_name = key
+        name = hashlib.sha1(json.dumps([space_id, model_name]).encode()).hexdigest()
+        return os.path.join(self.root, tenant_id, name)
+
+    def current_path(self, key: SpaceKey) -> Optional[str]:
+        space_dir = self.space_dir(key)
+        try:
+            with open(os.path.join(space_dir, CURRENT_FILE)) as file:
+                return os.path.join(space_dir, file.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def open(self, key: SpaceKey) -> Optional[SpaceSnapshot]:
+        path = self.current_path(key)
+        return SpaceSnapshot(path) if path else None
+
+    def log_position(self, key: SpaceKey) -> LogPosition:
+        """
+        Where the live log ends now; a rebuild replays everything after it.
+        Before the first version exists, writes go to a pending log in the
+        space directory, so the first build does not lose them either.
+        """
+        path = self.current_path(key)
+        if path is None:
+            path = self.space_dir(key)
+            os.makedirs(path, exist_ok=True)
+        log_path = os.path.join(path, LOG_FILE)
+        open(log_path, "ab").close()
+        return log_path, os.path.getsize(log_path)
+
+    def _append_lines(self, space_dir: str, data: bytes) -> None:
+        with _flock(os.path.join(space_dir, LOCK_FILE)):
+            try:
+                with open(os.path.join(space_dir, CURRENT_FILE)) as file:
+                    log_dir = os.path.join(space_dir, file.read().strip())
+            except FileNotFoundError:
+                log_dir = space_dir
+            with open(os.path.join(log_dir, LOG_FILE), "ab") as log:
+                log.write(data)
+
+    def append(self, key: SpaceKey, entries: List[Dict[str, Any]]) -> None:
+        """Log changes of a space; spaces without a snapshot need no log"""
+        space_dir = self.space_dir(key)
+        if entries and os.path.isdir(space_dir):
+            self._append_lines(space_dir, _encode_entries(entries))
+
+    def append_tenant(self, tenant_id: str, entries: List[Dict[str, Any]]) -> None:
+        """Log changes whose space is unknown to every snapshot of the tenant"""
+        tenant_dir = os.path.join(self.root, tenant_id)
+        if not entries or not os.path.isdir(tenant_dir):
+            return
+        data = _encode_entries(entries)
+        for name in os.listdir(tenant_dir):
+            try:
+                self._append_lines(os.path.join(tenant_dir, name), data)
+            except FileNotFoundError:
+                # discarded meanwhile
+                continue
+
+    def write(
+        self,
+        key: SpaceKey,
+        rows: Iterable[Dict[str, Any]],
+        position: LogPosition,
+    ) -> Optional[SpaceSnapshot]:
+        """
+        Publish rows as the next version. position is log_position() taken
+        before the rows were read. Returns None if another process is already
+        rebuilding this space.
+        """
+        space_dir = self.space_dir(key)
+        os.makedirs(space_dir, exist_ok=True)
+        with _flock(
+            os.path.join(space_dir, BUILD_LOCK_FILE), fcntl.LOCK_EX | fcntl.LOCK_NB
+        ) as acquired:
+            if not acquired:
+                return None
+            versions = [
+                int(name[1:])
+                for name in os.listdir(space_dir)
+                if name.startswith("v") and name[1:].isdigit()
+            ]
+            version = f"v{max(versions, default=0) + 1}"
+            path = os.path.join(space_dir, version)
+            tmp_path = f"{path}.tmp-{os.getpid()}"
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            write_snapshot(tmp_path, rows, key, self.dtype)
+            os.rename(tmp_path, path)
+
+            with _flock(os.path.join(space_dir, LOCK_FILE)):
+                log_path, offset = position
+                if log_path and os.path.exists(log_path):
+                    with open(log_path, "rb") as old_log:
+                        old_log.seek(offset)
+                        tail = old_log.read()
+                    with open(os.path.join(path, LOG_FILE), "ab") as new_log:
+                        new_log.write(tail)
+                current_tmp = os.path.join(space_dir, f"{CURRENT_FILE}.tmp")
+                with open(current_tmp, "w") as file:
+                    file.write(version)
+                os.replace(current_tmp, os.path.join(space_dir, CURRENT_FILE))
+                if os.path.exists(os.path.join(space_dir, LOG_FILE)):
+                    os.remove(os.path.join(space_dir, LOG_FILE))
+
+            # keep the previous version for readers that are just opening it,
+            # mapped files of older ones stay valid after unlinking
+            for old in sorted(versions)[:-1]:
+                shutil.rmtree(os.path.join(space_dir, f"v{old}"), ignore_errors=True)
+        return SpaceSnapshot(path)
+
+    def discard(self, key: SpaceKey) -> None:
+        """Drop every version of a space, e.g. once it outgrew snapshot search"""
+        shutil.rmtree(self.space_dir(key), ignore_errors=True)
+
+    def compact(self, key: SpaceKey) -> Optional[SpaceSnapshot]:
+        """Fold the live version's log into a new version"""
+        snapshot = self.open(key)
+        if snapshot is None:
+            return None
+        snapshot.refresh()
+        return self.write(
+            key, snapshot.iter_rows(), (snapshot.log_path, snapshot.log_offset)
+        )
+
+
+def _encode_entries(entries: List[Dict[str, Any]]) -> bytes:
+    # one write per batch, O_APPEND keeps concurrent appenders from interleaving
+    return "".join(json.dumps(entry) + "\n" for entry in entries).encode("utf-8")
@@ -1,7 +1,13 @@
-from typing import List, Optional
+import asyncio
+import os
+import socket
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Set
 
 import boto3  # type: ignore
-from whiskerrag_types.interface import TaskEnginPluginInterface
+from whiskerrag_types.interface import DBPluginInterface, TaskEnginPluginInterface
 from whiskerrag_types.model import (
     Knowledge,
     KnowledgeTypeEnum,
@@ -9,7 +15,12 @@ from whiskerrag_types.model import (
     TaskStatus,
     Tenant,
 )
-from whiskerrag_utils import get_chunks_by_knowledge, init_register
+from whiskerrag_utils import init_register
+
+from .ingest import DEFAULT_EMBED_BATCH_SIZE, ChunkIngestPipeline
+from .parse_pool import ParseProcessPool
+from .registry.embedding_scheduler import shutdown_embedding_schedulers
+from .registry.model_pool import warm_up_models
 
 
 class LocalEnginePlugin(TaskEnginPluginInterface):
@@ -20,6 +31,191 @@ class LocalEnginePlugin(TaskEnginPluginInterface):
 
     async def init(self):
         init_register("local_plugin.task_engine.registry")
+        # tasks run in the background, bounded globally and per tenant
+        self.max_concurrency = int(self.settings.get_env("TASK_MAX_CONCURRENCY", 4))
+        self.tenant_concurrency = int(
+            self.settings.get_env("TASK_TENANT_CONCURRENCY", 2)
+        )
+        self._global_semaphore = asyncio.Semaphore(self.max_concurrency)
+        # semaphores of tenants with queued or running tasks, dropped when idle
+        self._tenant_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._tenant_users: Dict[str, int] = {}
+        # task_id -> running task, every one leased to this process in the db
+        self._running: Dict[str, asyncio.Task] = {}
+        # leases are renewed every third of their length while tasks run; a
+        # task whose lease expired is claimed by the next process that polls
+        self.lease_seconds = float(self.settings.get_env("TASK_LEASE_SECONDS", 60))
+        self.lease_owner = (
+            f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        )
+        self._lease_loop_task: Optional[asyncio.Task] = None
+        # set when a task finishes, so the lease loop claims work for the slot
+        self._slot_freed = asyncio.Event()
+        # optionally parse and split documents in worker processes
+        self.parse_pool: Optional[ParseProcessPool] = None
+        if self.settings.get_env("TASK_PARSE_PROCESS_POOL", "false").lower() == "true":
+            workers = self.settings.get_env("TASK_PARSE_PROCESS_WORKERS", None)
+            self.parse_pool = ParseProcessPool(
+                max_workers=int(workers) if workers else None,
+                timeout=float(self.settings.get_env("TASK_PARSE_TIMEOUT", 600)),
+            )
+        self.embed_batch_size = int(
+            self.settings.get_env("EMBED_BATCH_SIZE", DEFAULT_EMBED_BATCH_SIZE)
+        )
+        # comma separated model names to load before the first request
+        warmup_models = self.settings.get_env("EMBEDDING_WARMUP_MODELS", "")
+        model_names = [
+            name.strip() for name in warmup_models.split(",") if name.strip()
+        ]
+        if model_names:
+            await warm_up_models(model_names)
+
+    async def ensure_initialized(self, db_plugin: Optional[DBPluginInterface]) -> None:
+        was_initialized = self.is_initialized
+        await super().ensure_initialized(db_plugin)
+        if not was_initialized and self._supports_leases():
+            await self.resume_unfinished_tasks()
+            self._lease_loop_task = asyncio.create_task(self._lease_loop())
+
+    def _supports_leases(self) -> bool:
+        return hasattr(self.db_plugin, "claim_tasks")
+
+    async def _claim(self, task_list: List[Task]) -> Set[str]:
+        """Ids of the tasks this process may run, all of them without leases"""
+        if not self._supports_leases():
+            return {task.task_id for task in task_list}
+        claimed = await self.db_plugin.claim_tasks(
+            self.lease_owner,
+            self.lease_seconds,
+            [task.task_id for task in task_list if task.task_id not in self._running],
+        )
+        return {task.task_id for task in claimed}
+
+    async def resume_unfinished_tasks(self) -> None:
+        """
+        The task table is the durable queue: pending and running tasks whose
+        lease expired, because the process that ran them is gone, are claimed
+        and scheduled again. Only as many as there are free slots are claimed,
+        the rest are left to other processes. Called on startup, on every lease
+        renewal and whenever a task finishes.
+        """
+        free_slots = self.max_concurrency - len(self._running)
+        if free_slots <= 0:
+            return
+        task_list = await self.db_plugin.claim_tasks(
+            self.lease_owner, self.lease_seconds, limit=free_slots
+        )
+        resumed = 0
+        for task in task_list:
+            knowledge = await self.db_plugin.get_knowledge(
+                task.tenant_id, task.knowledge_id
+            )
+            if knowledge is None:
+                task.status = TaskStatus.CANCELED
+                task.error_message = "knowledge not found"
+                await self.db_plugin.update_task_list([task])
+                continue
+            if task.status == TaskStatus.RUNNING:
+                # the lease expired, nobody writes these chunks any more; drop
+                # them before retrying
+                await self.db_plugin.delete_knowledge_chunk(
+                    task.tenant_id, [task.knowledge_id]
+                )
+            self._submit(task, knowledge)
+            resumed += 1
+        if resumed:
+            self.logger.info(f"Resumed {resumed} unfinished tasks")
+
+    async def _renew_leases(self) -> None:
+        task_ids = list(self._running)
+        if not task_ids:
+            return
+        renewed = set(
+            await self.db_plugin.renew_task_leases(
+                self.lease_owner, task_ids, self.lease_seconds
+            )
+        )
+        for task_id in task_ids:
+            running = self._running.get(task_id)
+            if task_id not in renewed and running is not None and not running.done():
+                # another process claimed it after our lease expired
+                self.logger.warning(f"Task {task_id} lost its lease, cancelling")
+                running.cancel()
+
+    async def _lease_loop(self) -> None:
+        renew_at = time.monotonic() + self.lease_seconds / 3
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._slot_freed.wait(), max(renew_at - time.monotonic(), 0)
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._slot_freed.clear()
+            try:
+                if time.monotonic() >= renew_at:
+                    renew_at = time.monotonic() + self.lease_seconds / 3
+                    await self._renew_leases()
+                await self.resume_unfinished_tasks()
+            except Exception as e:
+                self.logger.error(f"Error renewing task leases: {e}")
+
+    @asynccontextmanager
+    async def _tenant_slot(self, tenant_id: str) -> AsyncIterator[None]:
+        semaphore = self._tenant_semaphores.get(tenant_id)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.tenant_concurrency)
+            self._tenant_semaphores[tenant_id] = semaphore
+        self._tenant_users[tenant_id] = self._tenant_users.get(tenant_id, 0) + 1
+        try:
+            async with semaphore:
+                yield
+        finally:
+            self._tenant_users[tenant_id] -= 1
+            if not self._tenant_users[tenant_id]:
+                del self._tenant_users[tenant_id]
+                del self._tenant_semaphores[tenant_id]
+
+    async def _run_task(self, task: Task, knowledge: Knowledge) -> None:
+        # take the tenant slot first, so a busy tenant never holds global slots
+        async with self._tenant_slot(task.tenant_id):
+            async with self._global_semaphore:
+                try:
+                    await self.process_task(task, knowledge)
+                except Exception as e:
+                    self.logger.error(f"Task {task.task_id} failed: {e}")
+
+    def _submit(self, task: Task, knowledge: Knowledge) -> None:
+        running = asyncio.create_task(self._run_task(task, knowledge))
+        self._running[task.task_id] = running
+
+        def done(_: asyncio.Task) -> None:
+            if self._running.get(task.task_id) is running:
+                del self._running[task.task_id]
+                self._slot_freed.set()
+
+        running.add_done_callback(done)
+
+    async def shutdown(self) -> None:
+        """
+        Cancel in-flight tasks and release their leases; they stay pending/running
+        and are resumed by the next process that claims them
+        """
+        if self._lease_loop_task is not None:
+            self._lease_loop_task.cancel()
+        task_ids = list(self._running)
+        running = list(self._running.values())
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        if task_ids and self._supports_leases():
+            try:
+                await self.db_plugin.release_task_leases(self.lease_owner, task_ids)
+            except Exception as e:
+                self.logger.warning(f"Task leases expire on their own: {e}")
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown()
+        await shutdown_embedding_schedulers()
 
     async def init_task_from_knowledge(
         self, knowledge_list: List[Knowledge], tenant: Tenant
@@ -41,24 +237,33 @@ class LocalEnginePlugin(TaskEnginPluginInterface):
         try:
             task.status = TaskStatus.RUNNING
             await self.db_plugin.update_task_list([task])
-            chunk_list = await get_chunks_by_knowledge(knowledge)
+            pipeline = ChunkIngestPipeline(
+                self.db_plugin, batch_size=self.embed_batch_size
+            )
+            parsed = None
+            if self.parse_pool is not None:
+                parsed = await self.parse_pool.parse(knowledge)
+            await pipeline.run(knowledge, parsed)
             task.status = TaskStatus.SUCCESS
-            await self.db_plugin.save_chunk_list(chunk_list)
         except Exception as e:
             task.status = TaskStatus.FAILED
             task.error_message = str(e)
-        finally:
-            await self.db_plugin.update_task_list([task])
+        # not reached when cancelled on shutdown or after losing the lease, the
+        # process that runs the task next records its status
+        await self.db_plugin.update_task_list([task])
         return task
 
     async def batch_execute_task(
         self, task_list: List[Task], knowledge_list: List[Knowledge]
     ) -> List[Task]:
+        """Schedule the tasks in the background and return without waiting for them"""
         knowledge_dict = {
             knowledge.knowledge_id: knowledge for knowledge in knowledge_list
         }
+        # a task another process holds a live lease on is already running there
+        claimed = await self._claim(task_list)
         for task in task_list:
             knowledge = knowledge_dict.get(task.knowledge_id)
-            if knowledge:
-                task = await self.process_task(task, knowledge)
+            if knowledge and task.task_id in claimed:
+                self._submit(task, knowledge)
         return task_list
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import uuid
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from whiskerrag_types.interface import DBPluginInterface
+from whiskerrag_types.interface.embed_interface import BaseEmbedding
+from whiskerrag_types.model import Chunk, Knowledge, KnowledgeTypeEnum
+from whiskerrag_types.model.multi_modal import Image, Text
+from whiskerrag_utils import RegisterTypeEnum, get_register
+
+logger = logging.getLogger("whisker")
+
+DEFAULT_EMBED_BATCH_SIZE = 64
+
+
+async def parse_knowledge(knowledge: Knowledge) -> Tuple[List[Text], List[Image]]:
+    """Load and split a knowledge item the same way get_chunks_by_knowledge does"""
+    parse_type = getattr(
+        knowledge.split_config,
+        "type",
+        (
+            "base_image"
+            if knowledge.knowledge_type is KnowledgeTypeEnum.IMAGE
+            else "base_text"
+        ),
+    )
+    LoaderCls = get_register(RegisterTypeEnum.KNOWLEDGE_LOADER, knowledge.source_type)
+    ParserCls = get_register(RegisterTypeEnum.PARSER, parse_type)
+    if ParserCls is None:
+        logger.warning(f"No parser found for type: {parse_type}")
+        return [], []
+
+    if LoaderCls is None:
+        parse_results = await ParserCls().parse(knowledge, None)
+    else:
+        parse_results = []
+        for content in await LoaderCls(knowledge).load() or []:
+            parse_results.extend(await ParserCls().parse(knowledge, content))
+
+    text_items = [item for item in parse_results if isinstance(item, Text)]
+    image_items = [item for item in parse_results if isinstance(item, Image)]
+    return text_items, image_items
+
+
+def build_chunk(
+    knowledge: Knowledge, item: Union[Text, Image], vector: Sequence[float]
+) -> Chunk:
+    """Chunk of a parsed item, with the metadata get_chunks_by_knowledge stores"""
+    metadata = {**knowledge.metadata, **item.metadata}
+    metadata["_knowledge_type"] = knowledge.knowledge_type
+    metadata["_reference_url"] = metadata.get("_reference_url", "")
+    tags = metadata.get("_tags")
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.split(",") if tag.strip()]
+    elif not isinstance(tags, list):
+        tags = []
+    return Chunk(
+        chunk_id=str(uuid.uuid4()),
+        space_id=knowledge.space_id,
+        tenant_id=knowledge.tenant_id,
+        knowledge_id=knowledge.knowledge_id,
+        context=item.content if isinstance(item, Text) else "",
+        embedding=vector,
+        enabled=knowledge.enabled,
+        embedding_model_name=knowledge.embedding_model_name,
+        metadata=metadata,
+        tags=tags,
+        f1=metadata.get("_f1"),
+        f2=metadata.get("_f2"),
+        f3=metadata.get("_f3"),
+        f4=metadata.get("_f4"),
+        f5=metadata.get("_f5"),
+    )
+
+
+class ChunkIngestPipeline:
+    """
+    Embed and store the chunks of one knowledge item batch by batch.
+
+    Texts are embedded with embed_documents in batches of batch_size into a float32
+    buffer. While batch N is being inserted, batch N+1 is already being embedded;
+    at most one insert is in flight, so memory stays bounded by two batches.
+    """
+
+    def __init__(
+        self,
+        db_plugin: DBPluginInterface,
+        batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+        embed_timeout: int = 60,
+    ):
+        self.db_plugin = db_plugin
+        self.batch_size = max(1, batch_size)
+        self.embed_timeout = embed_timeout
+
+    def _build_chunks(
+        self, knowledge: Knowledge, items: List[Text], vectors: np.ndarray
+    ) -> List[Chunk]:
+        return [
+            build_chunk(knowledge, item, vector) for item, vector in zip(items, vectors)
+        ]
+
+    async def _embed_batch(
+        self, embedding: BaseEmbedding, documents: List[str]
+    ) -> np.ndarray:
+        vectors = np.asarray(
+            await embedding.embed_documents(documents, timeout=self.embed_timeout),
+            dtype=np.float32,
+        )
+        if vectors.ndim != 2 or vectors.shape[0] != len(documents):
+            raise ValueError(
+                f"Embedding returned {len(vectors)} vectors for {len(documents)} texts"
+            )
+        return vectors
+
+    async def _embed_images(
+        self, knowledge: Knowledge, embedding: BaseEmbedding, image_items: List[Image]
+    ) -> List[Chunk]:
+        """Images that fail to embed are skipped, as in get_chunks_by_knowledge"""
+        chunks = []
+        for image_item in image_items:
+            try:
+                vector = await embedding.embed_image(image_item, timeout=60 * 5)
+            except Exception as e:
+                logger.error(f"Error processing image item: {e}")
+                continue
+            if not vector:
+                logger.warning(f"[warn]: embed image failed, image item: {image_item}")
+                continue
+            chunks.append(build_chunk(knowledge, image_item, vector))
+        return chunks
+
+    async def run(
+        self,
+        knowledge: Knowledge,
+        parsed: Optional[Tuple[List[Text], List[Image]]] = None,
+    ) -> int:
+        """Returns the number of chunks stored, partial writes are removed on failure"""
+        EmbeddingCls = get_register(
+            RegisterTypeEnum.EMBEDDING, knowledge.embedding_model_name
+        )
+        if EmbeddingCls is None:
+            raise ValueError(
+                f"No embedding model found for name: {knowledge.embedding_model_name}"
+            )
+        text_items, image_items = parsed or await parse_knowledge(knowledge)
+        embedding = EmbeddingCls()
+
+        saved = 0
+        pending_save: Optional[asyncio.Task] = None
+        try:
+            for start in range(0, len(text_items), self.batch_size):
+                batch = text_items[start : start + self.batch_size]
+                vectors = await self._embed_batch(
+                    embedding, [item.content for item in batch]
+                )
+                chunks = self._build_chunks(knowledge, batch, vectors)
+                if pending_save is not None:
+                    saved += len(await pending_save)
+                pending_save = asyncio.create_task(
+                    self.db_plugin.save_chunk_list(chunks)
+                )
+            if pending_save is not None:
+                saved += len(await pending_save)
+                pending_save = None
+
+            if image_items:
+                image_chunks = await self._embed_images(
+                    knowledge, embedding, image_items
+                )
+                if image_chunks:
+                    saved += len(await self.db_plugin.save_chunk_list(image_chunks))
+        except Exception:
+            if pending_save is not None:
+                # let the in-flight insert finish so the cleanup below sees its rows
+                await asyncio.gather(pending_save, return_exceptions=True)
+            if saved or pending_save is not None:
+                await self.db_plugin.delete_knowledge_chunk(
+                    knowledge.tenant_id, [knowledge.knowledge_id]
+                )
+            raise
+        logger.info(f"Stored {saved} chunks for knowledge {knowledge.knowledge_id}")
+        return saved
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from whiskerrag_types.model import Knowledge
+from whiskerrag_types.model.multi_modal import Image, Text
+from whiskerrag_utils import init_register
+
+from .ingest import parse_knowledge
+
+logger = logging.getLogger("whisker")
+
+
+def _parse_in_worker(knowledge_json: str) -> Dict[str, List[Dict[str, Any]]]:
+    knowledge = Knowledge.model_validate_json(knowledge_json)
+    text_items, image_items = asyncio.run(parse_knowledge(knowledge))
+    return {
+        "texts": [item.model_dump(mode="json") for item in text_items],
+        "images": [item.model_dump(mode="json") for item in image_items],
+    }
+
+
+def _worker_main(
+    conn: Connection,
+    register_packages: Sequence[str],
+    target: Callable[[str], Any],
+) -> None:
+    # registries are per process, loaders and parsers must be registered again
+    for package in register_packages:
+        init_register(package)
+    conn.send(("ready", None))
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        try:
+            reply = ("ok", target(job))
+        except Exception as e:
+            try:
+                pickle.dumps(e)
+                reply = ("error", e)
+            except Exception:
+                reply = ("error", RuntimeError(f"{type(e).__name__}: {e}"))
+        conn.send(reply)
+
+
+class _Worker:
+    """One parse process, fed one job at a time over a pipe"""
+
+    def __init__(self, register_packages: Sequence[str], target: Callable):
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        # spawn keeps the event loop, db pool and model threads out of workers
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, tuple(register_packages), target),
+            daemon=True,
+        )
+        self._child_conn = child_conn
+
+    def start(self) -> None:
+        self.process.start()
+        self._child_conn.close()
+        status, _ = self.conn.recv()
+        if status != "ready":
+            raise RuntimeError("Parse worker failed to start")
+
+    def run(self, job: str) -> Tuple[str, Any]:
+        self.conn.send(job)
+        return self.conn.recv()
+
+    def kill(self) -> None:
+        # the thread blocked on the pipe sees EOF once the process is gone
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class ParseProcessPool:
+    """
+    Runs load/parse/split of knowledge items in worker processes.
+
+    Parsing large PDFs or repositories is CPU bound and would otherwise block the
+    event loop. Knowledge goes in as JSON and parse results come back as plain
+    dicts. Each worker handles one knowledge item at a time, so a worker that
+    crashes or exceeds timeout is terminated and replaced without touching the
+    parses running in the other workers.
+    """
+
+    target: Callable[[str], Any] = staticmethod(_parse_in_worker)
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        timeout: float = 600,
+        register_packages: Sequence[str] = (
+            "whiskerrag_utils.loader",
+            "whiskerrag_utils.parser",
+        ),
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.register_packages = tuple(register_packages)
+        self._idle: List[_Worker] = []
+        self._busy: List[_Worker] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        # pipe reads block, each busy worker is waited on from its own thread;
+        # the spare threads cover reads still draining from killed workers
+        self._threads = ThreadPoolExecutor(
+            max_workers=self.max_workers * 2, thread_name_prefix="parse"
+        )
+
+    async def _acquire(self) -> _Worker:
+        if self._idle:
+            return self._idle.pop()
+        worker = _Worker(self.register_packages, self.target)
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self._threads, worker.start
+            )
+        except BaseException:
+            worker.kill()
+            raise
+        return worker
+
+    async def parse(self, knowledge: Knowledge) -> Tuple[List[Text], List[Image]]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        async with self._slots:
+            try:
+                worker = await self._acquire()
+            except (EOFError, OSError):
+                raise RuntimeError("Parse worker crashed during startup")
+            self._busy.append(worker)
+            try:
+                status, payload = await asyncio.wait_for(
+                    asyncio.get_running_loop().run_in_executor(
+                        self._threads, worker.run, knowledge.model_dump_json()
+                    ),
+                    timeout=self.timeout,
+                )
+            except asyncio.TimeoutError:
+                worker.kill()
+                logger.warning(
+                    f"Parse worker for {knowledge.knowledge_id} killed after "
+                    f"{self.timeout} seconds"
+                )
+                raise TimeoutError(
+                    f"Parsing knowledge {knowledge.knowledge_id} timed out "
+                    f"after {self.timeout} seconds"
+                )
+            except (EOFError, OSError):
+                worker.kill()
+                raise RuntimeError(
+                    f"Parse worker crashed while processing {knowledge.knowledge_id}"
+                )
+            except BaseException:
+                # cancelled mid job, the worker still holds it and cannot be reused
+                worker.kill()
+                raise
+            finally:
+                self._busy.remove(worker)
+            self._idle.append(worker)
+        if status == "error":
+            raise payload
+        return (
+            [Text.model_validate(item) for item in payload["texts"]],
+            [Image.model_validate(item) for item in payload["images"]],
+        )
+
+    def shutdown(self) -> None:
+        for worker in self._idle + self._busy:
+            worker.kill()
+        self._idle.clear()
+        self._busy.clear()
+        self._threads.shutdown(wait=False, cancel_futures=True)
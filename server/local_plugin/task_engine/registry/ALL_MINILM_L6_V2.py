@@ -1,18 +1,18 @@
-import asyncio
 import os
 from pathlib import Path
 from typing import List, Optional
 
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from whiskerrag_types.interface.embed_interface import BaseEmbedding, Image
 from whiskerrag_types.model.knowledge import EmbeddingModelEnum
 from whiskerrag_utils import RegisterTypeEnum, register
 
+from .embedding_scheduler import ScheduledEmbeddingMixin
 from .model_manager import HuggingFaceModelManager
+from .model_pool import get_huggingface_embeddings
 
 
 @register(RegisterTypeEnum.EMBEDDING, EmbeddingModelEnum.ALL_MINILM_L6_V2)
-class ALL_MINILM_L6_V2(BaseEmbedding):
+class ALL_MINILM_L6_V2(ScheduledEmbeddingMixin, BaseEmbedding):
     def __init__(self):
         self.model_name = EmbeddingModelEnum.ALL_MINILM_L6_V2
         self.cache_dir = os.getenv("HF_HOME", Path.home() / ".cache/huggingface")
@@ -21,13 +21,9 @@ class ALL_MINILM_L6_V2(BaseEmbedding):
 
     def _initialize_embeddings(self) -> None:
         try:
-            model_kwargs = {"device": "cpu"}  # cuda or cpu
-            encode_kwargs = {"normalize_embeddings": True}
-            self.embeddings = HuggingFaceEmbeddings(
-                model_name=self.model_name,
-                model_kwargs=model_kwargs,
-                encode_kwargs=encode_kwargs,
-                cache_folder=str(self.cache_dir),
+            # shared across instances, weights are loaded once per process
+            self.embeddings = get_huggingface_embeddings(
+                self.model_name, str(self.cache_dir)
             )
         except Exception as e:
             raise Exception(f"Failed to initialize embeddings: {str(e)}")
@@ -57,17 +53,5 @@ class ALL_MINILM_L6_V2(BaseEmbedding):
             print(f"Health check failed: {str(e)}")
             return False
 
-    async def embed_text(self, text: str, timeout: Optional[int]) -> List[float]:
-        timeout = timeout or 15
-        loop = asyncio.get_event_loop()
-        try:
-            embedding = await asyncio.wait_for(
-                loop.run_in_executor(None, self.embeddings.embed_query, text),
-                timeout=timeout,
-            )
-            return embedding
-        except asyncio.TimeoutError:
-            raise TimeoutError(f"Embedding timed out after {timeout} seconds")
-
     async def embed_image(self, image: Image, timeout: Optional[int]) -> List[float]:
         raise NotImplementedError("OpenAI does not support image embedding")
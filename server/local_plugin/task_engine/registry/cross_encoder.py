@@ -0,0 +1,88 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, List, Optional
+
+from whiskerrag_utils import RegisterTypeEnum, register
+
+from core.rerank import BaseReranker
+
+from .model_pool import model_pool
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_rerank_executor() -> ThreadPoolExecutor:
+    """
+    Dedicated executor for cross-encoder passes. One worker by default, so
+    reranking holds at most RERANK_EXECUTOR_WORKERS cores however many
+    requests ask for it.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("RERANK_EXECUTOR_WORKERS", 1)),
+                thread_name_prefix="rerank",
+            )
+        return _executor
+
+
+class LocalCrossEncoder(BaseReranker):
+    """sentence-transformers CrossEncoder, loaded once per process"""
+
+    model_name: str
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.cache_dir = os.getenv("HF_HOME", Path.home() / ".cache/huggingface")
+        self.batch_size = int(os.getenv("RERANK_BATCH_SIZE", 32))
+
+    def _load(self) -> Any:
+        def factory() -> Any:
+            from sentence_transformers import CrossEncoder
+
+            return CrossEncoder(
+                self.model_name, device="cpu", cache_folder=str(self.cache_dir)
+            )
+
+        return model_pool.get(self.model_name, factory)
+
+    def _predict(
+        self, pairs: List[List[str]], deadline: Optional[float]
+    ) -> Optional[List[float]]:
+        # requests that timed out while queued are skipped instead of computed
+        if deadline is not None and time.monotonic() > deadline:
+            return None
+        scores = self._load().predict(pairs, batch_size=self.batch_size)
+        return [float(score) for score in scores]
+
+    async def score(
+        self, query: str, passages: List[str], timeout: Optional[float]
+    ) -> List[float]:
+        deadline = time.monotonic() + timeout if timeout else None
+        loop = asyncio.get_running_loop()
+        scores = await loop.run_in_executor(
+            get_rerank_executor(),
+            self._predict,
+            [[query, passage] for passage in passages],
+            deadline,
+        )
+        if scores is None:
+            raise asyncio.TimeoutError()
+        return scores
+
+
+@register(RegisterTypeEnum.RETRIEVER, "cross-encoder/ms-marco-MiniLM-L-6-v2")
+class MS_MARCO_MINILM_L6_V2(LocalCrossEncoder):
+    model_name = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+@register(RegisterTypeEnum.RETRIEVER, "BAAI/bge-reranker-base")
+class BGE_RERANKER_BASE(LocalCrossEncoder):
+    # multilingual, covers the Chinese content served by text2vec-base-chinese
+    model_name = "BAAI/bge-reranker-base"
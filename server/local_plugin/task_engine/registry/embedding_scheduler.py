@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("whisker")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_embedding_executor() -> ThreadPoolExecutor:
+    """
+    Dedicated executor for model forward passes, kept apart from the default
+    executor so embedding load cannot starve file and network work.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("EMBEDDING_EXECUTOR_WORKERS", 2)),
+                thread_name_prefix="embedding",
+            )
+        return _executor
+
+
+class EmbeddingQueueFullError(RuntimeError):
+    pass
+
+
+class EmbeddingSchedulerClosedError(RuntimeError):
+    pass
+
+
+class _LoopState:
+    def __init__(self) -> None:
+        self.queue: "asyncio.Queue[Tuple[str, asyncio.Future]]" = asyncio.Queue()
+        self.worker: Optional[asyncio.Task] = None
+        # requests taken off the queue and not answered yet
+        self.batch: List[Tuple[str, asyncio.Future]] = []
+
+
+class EmbeddingBatchScheduler:
+    """
+    Coalesces concurrent embed requests for one model into batched forward passes.
+
+    Requests arriving within batch_window seconds of the first one are encoded
+    together through embed_documents, up to max_batch_size texts per batch. At most
+    max_queue_size requests may wait; beyond that embed() fails fast instead of
+    building an unbounded backlog.
+    """
+
+    def __init__(
+        self,
+        embeddings: Any,
+        max_batch_size: int = 32,
+        batch_window: float = 0.005,
+        max_queue_size: int = 1024,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ):
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.max_queue_size = max_queue_size
+        self.executor = executor or get_embedding_executor()
+        # asyncio queues are bound to a loop, health checks may run on their own
+        self._states: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._states_lock = threading.Lock()
+        self._closed = False
+
+    def _get_state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        with self._states_lock:
+            state = self._states.get(loop)
+            if state is None:
+                state = _LoopState()
+                self._states[loop] = state
+        if state.worker is None or state.worker.done():
+            state.worker = loop.create_task(self._run(state))
+        return state
+
+    async def embed(self, text: str) -> List[float]:
+        if self._closed:
+            raise EmbeddingSchedulerClosedError("Embedding scheduler is shut down")
+        state = self._get_state()
+        if state.queue.qsize() >= self.max_queue_size:
+            raise EmbeddingQueueFullError(
+                f"Embedding queue is full ({self.max_queue_size} pending requests)"
+            )
+        future = asyncio.get_running_loop().create_future()
+        state.queue.put_nowait((text, future))
+        return await future
+
+    async def _collect_batch(
+        self, state: _LoopState
+    ) -> List[Tuple[str, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        state.batch = [await state.queue.get()]
+        deadline = loop.time() + self.batch_window
+        while len(state.batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                state.batch.append(await asyncio.wait_for(state.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # requests whose caller timed out or was cancelled are not encoded
+        return [(text, future) for text, future in state.batch if not future.done()]
+
+    async def _run(self, state: _LoopState) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                batch = await self._collect_batch(state)
+                if not batch:
+                    continue
+                texts = [text for text, _ in batch]
+                try:
+                    embeddings = await loop.run_in_executor(
+                        self.executor, self.embeddings.embed_documents, texts
+                    )
+                    if len(embeddings) != len(texts):
+                        # vectors cannot be matched to texts, no request is answered
+                        raise RuntimeError(
+                            f"Model returned {len(embeddings)} embeddings "
+                            f"for {len(texts)} texts"
+                        )
+                except Exception as e:
+                    logger.error(f"Embedding batch of {len(texts)} failed: {e}")
+                    _fail(batch, e)
+                    continue
+                for (_, future), embedding in zip(batch, embeddings):
+                    if not future.done():
+                        future.set_result(list(embedding))
+        except asyncio.CancelledError:
+            _fail_waiting(state)
+            raise
+
+    async def shutdown(self) -> None:
+        """Stop the batch workers, requests still waiting fail"""
+        self._closed = True
+        with self._states_lock:
+            states = list(self._states.items())
+        current = asyncio.get_running_loop()
+        workers = []
+        for loop, state in states:
+            if state.worker is None or state.worker.done():
+                continue
+            if loop is current:
+                state.worker.cancel()
+                workers.append(state.worker)
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(state.worker.cancel)
+        await asyncio.gather(*workers, return_exceptions=True)
+        # a worker cancelled before it first ran did not fail its queue itself
+        for loop, state in states:
+            if loop is current:
+                _fail_waiting(state)
+
+
+def _fail(batch: List[Tuple[str, asyncio.Future]], error: Exception) -> None:
+    for _, future in batch:
+        if not future.done():
+            future.set_exception(error)
+
+
+def _fail_waiting(state: _LoopState) -> None:
+    error = EmbeddingSchedulerClosedError("Embedding scheduler is shut down")
+    _fail(state.batch, error)
+    while not state.queue.empty():
+        _fail([state.queue.get_nowait()], error)
+
+
+_schedulers: Dict[str, EmbeddingBatchScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_embedding_scheduler(
+    model_name: str, embeddings: Any
+) -> EmbeddingBatchScheduler:
+    model_name = getattr(model_name, "value", model_name)
+    with _schedulers_lock:
+        scheduler = _schedulers.get(model_name)
+        # a model evicted from the pool and loaded again gets a fresh scheduler
+        if scheduler is None or scheduler.embeddings is not embeddings:
+            scheduler = EmbeddingBatchScheduler(
+                embeddings,
+                max_batch_size=int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", 32)),
+                batch_window=float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", 5)) / 1000,
+                max_queue_size=int(os.getenv("EMBEDDING_MAX_QUEUE_SIZE", 1024)),
+            )
+            _schedulers[model_name] = scheduler
+        return scheduler
+
+
+async def shutdown_embedding_schedulers() -> None:
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+        _schedulers.clear()
+    for scheduler in schedulers:
+        await scheduler.shutdown()
+
+
+class ScheduledEmbeddingMixin:
+    """
+    embed_documents/embed_text of the local models; self.embeddings is the
+    shared langchain model of self.model_name.
+    """
+
+    model_name: Any
+    embeddings: Any
+
+    async def embed_documents(
+        self, documents: List[str], timeout: Optional[int]
+    ) -> List[List[float]]:
+        timeout = timeout or 15
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(
+                    get_embedding_executor(), self.embeddings.embed_documents, documents
+                ),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Embedding timed out after {timeout} seconds")
+
+    async def embed_text(self, text: str, timeout: Optional[int]) -> List[float]:
+        timeout = timeout or 15
+        # concurrent calls are coalesced into one batched forward pass
+        scheduler = get_embedding_scheduler(self.model_name, self.embeddings)
+        try:
+            return await asyncio.wait_for(scheduler.embed(text), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Embedding timed out after {timeout} seconds")
+
+    async def embed_text_query(self, text: str, timeout: Optional[int]) -> List[float]:
+        return await self.embed_text(text, timeout)
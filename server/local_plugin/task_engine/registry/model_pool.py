@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_community.embeddings import HuggingFaceEmbeddings
+
+logger = logging.getLogger("whisker")
+
+
+def _estimate_model_bytes(embeddings: Any) -> int:
+    """Sum parameter and buffer sizes of the underlying SentenceTransformer"""
+    client = getattr(embeddings, "client", None)
+    if client is None or not hasattr(client, "parameters"):
+        return 0
+    try:
+        total = sum(p.numel() * p.element_size() for p in client.parameters())
+        total += sum(b.numel() * b.element_size() for b in client.buffers())
+        return int(total)
+    except Exception as e:
+        logger.warning(f"Failed to estimate model memory: {e}")
+        return 0
+
+
+class EmbeddingModelPool:
+    """
+    Process-wide pool of loaded embedding models.
+
+    Loading a HuggingFace model reads the transformer weights from disk, which takes
+    seconds. The pool loads each model once, lazily and thread-safely, and hands the
+    same instance to every embedding object. Models are only dropped through evict().
+    """
+
+    def __init__(self) -> None:
+        self._models: Dict[str, Any] = {}
+        self._memory: Dict[str, int] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._pool_lock = threading.Lock()
+
+    def _get_lock(self, model_name: str) -> threading.Lock:
+        with self._pool_lock:
+            if model_name not in self._locks:
+                self._locks[model_name] = threading.Lock()
+            return self._locks[model_name]
+
+    def get(self, model_name: str, factory: Callable[[], Any]) -> Any:
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+        # one lock per model, so loading a large model does not block the others
+        with self._get_lock(model_name):
+            model = self._models.get(model_name)
+            if model is None:
+                logger.info(f"Loading embedding model {model_name}")
+                model = factory()
+                self._memory[model_name] = _estimate_model_bytes(model)
+                self._models[model_name] = model
+                logger.info(
+                    f"Embedding model {model_name} loaded, "
+                    f"~{self._memory[model_name] / 1024 / 1024:.1f} MB"
+                )
+        return model
+
+    def is_loaded(self, model_name: str) -> bool:
+        return model_name in self._models
+
+    def evict(self, model_name: str) -> bool:
+        with self._get_lock(model_name):
+            model = self._models.pop(model_name, None)
+            self._memory.pop(model_name, None)
+        if model is None:
+            return False
+        logger.info(f"Embedding model {model_name} evicted")
+        return True
+
+    def unload_all(self) -> None:
+        for model_name in list(self._models.keys()):
+            self.evict(model_name)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Approximate bytes held by each loaded model"""
+        return dict(self._memory)
+
+    def stats(self) -> Dict[str, Any]:
+        memory = self.memory_usage()
+        return {
+            "loaded_models": list(memory.keys()),
+            "total_bytes": sum(memory.values()),
+            "models": memory,
+        }
+
+
+model_pool = EmbeddingModelPool()
+
+
+def get_huggingface_embeddings(
+    model_name: str, cache_dir: Optional[str] = None
+) -> HuggingFaceEmbeddings:
+    model_name = getattr(model_name, "value", model_name)
+    cache_dir = cache_dir or str(
+        os.getenv("HF_HOME", Path.home() / ".cache/huggingface")
+    )
+
+    def factory() -> HuggingFaceEmbeddings:
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={"device": "cpu"},  # cuda or cpu
+            encode_kwargs={"normalize_embeddings": True},
+            cache_folder=str(cache_dir),
+        )
+
+    return model_pool.get(model_name, factory)
+
+
+async def warm_up_models(model_names: List[str]) -> None:
+    """Load the given models in the default executor, off the event loop"""
+    loop = asyncio.get_running_loop()
+    for model_name in model_names:
+        try:
+            await loop.run_in_executor(None, get_huggingface_embeddings, model_name)
+        except Exception as e:
+            logger.error(f"Failed to warm up embedding model {model_name}: {e}")
@@ -25,14 +25,17 @@ from api.space import router as space_router
 from api.task import router as task_router
 from api.webhook import router as webhook_router
 from api.tenant import router as tenant_router
+from core.embedding_cache import install_query_embedding_cache
 from core.global_vars import cleanup_global_vars, inject_global_vars
 from core.log import cleanup_logging, logger, setup_logging
 from core.plugin_manager import PluginManager
 from core.response import ResponseModel
+from core.result_cache import install_retrieval_result_cache
 from core.retrieval_counter import (
     initialize_retrieval_counter,
     shutdown_retrieval_counter,
 )
+from core.retrieval_stats import initialize_retrieval_stats, shutdown_retrieval_stats
 from core.settings import settings
 
 
@@ -64,8 +67,15 @@ async def startup_event() -> None:
         await db_plugin.ensure_initialized()
         await task_plugin.ensure_initialized(db_plugin)
 
+        # cache query embeddings for every registered embedding model
+        install_query_embedding_cache()
+        # serve repeated retrievals without embedding or querying again
+        install_retrieval_result_cache(db_plugin)
+
         # init retrieval counter
-        initialize_retrieval_counter()
+        await initialize_retrieval_counter()
+        # per minute retrieval analytics, spooled to disk and bulk loaded
+        await initialize_retrieval_stats()
 
         logger.info("App startup event success")
     except Exception as e:
@@ -77,9 +87,21 @@ async def shutdown_event() -> None:
     try:
         # shutdown retrieval counter first
         try:
-            shutdown_retrieval_counter()
+            await shutdown_retrieval_counter()
         except Exception as e:
             logger.warning(f"Error during retrieval counter shutdown: {e}")
+        try:
+            await shutdown_retrieval_stats()
+        except Exception as e:
+            logger.warning(f"Error during retrieval stats shutdown: {e}")
+
+        # stop background tasks of the task engine before the db pool closes
+        try:
+            task_plugin = PluginManager(resolve_plugin_path()).taskPlugin
+            if task_plugin and hasattr(task_plugin, "shutdown"):
+                await task_plugin.shutdown()
+        except Exception as e:
+            logger.warning(f"Error during taskPlugin shutdown: {e}")
 
         # cleanup dbPlugin
         try:
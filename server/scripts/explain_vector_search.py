@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Compare query plans of the old and the index-ordered vector search layout.
+
+Usage:
+    poetry run explain-vector-search --tenant-id <id> --space-id <id> \
+        --model <embedding_model_name> [--top 10] [--recall balanced] [--runs 5]
+
+The query vector is taken from an existing chunk of the model, so no embedding
+model has to be loaded. Reads DB_* settings from the environment / .env.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import asyncpg
+from dotenv import load_dotenv
+from pgvector.asyncpg import register_vector
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.retrieval import ANN_SEARCH_PARAMS, RecallLevel  # noqa: E402
+
+# distance filtered inside a CTE before ordering: no index can serve the sort
+LEGACY_QUERY = """
+WITH filtered_chunks AS (
+    SELECT c.*, c.embedding <=> $1 AS distance
+    FROM {table} c
+    WHERE c.space_id = ANY($2) AND c.tenant_id = $3 AND c.embedding_model_name = $4
+)
+SELECT chunk_id, distance FROM filtered_chunks
+WHERE 1 - distance >= $5
+ORDER BY distance ASC
+LIMIT $6
+"""
+
+# same layout as PostgresDBPlugin._vector_search
+INDEX_ORDERED_QUERY = """
+SELECT * FROM (
+    SELECT chunk_id, 1 - (embedding <=> $1) AS similarity
+    FROM {table}
+    WHERE space_id = ANY($2) AND tenant_id = $3 AND embedding_model_name = $4
+    ORDER BY embedding <=> $1
+    LIMIT $6
+) candidates
+WHERE similarity >= $5
+ORDER BY similarity DESC
+"""
+
+
+async def explain(conn, query, params, recall, runs):
+    probes, ef_search = ANN_SEARCH_PARAMS[recall]
+    plan = None
+    timings = []
+    for _ in range(runs):
+        async with conn.transaction():
+            await conn.execute(
+                f"SET LOCAL ivfflat.probes = {probes}; "
+                f"SET LOCAL hnsw.ef_search = {ef_search}"
+            )
+            start = time.perf_counter()
+            await conn.fetch(query, *params)
+            timings.append((time.perf_counter() - start) * 1000)
+            if plan is None:
+                plan = await conn.fetchval(
+                    f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", *params
+                )
+    return json.loads(plan)[0], timings
+
+
+def print_plan(node, depth=0):
+    line = f"{'  ' * depth}-> {node['Node Type']}"
+    if node.get("Index Name"):
+        line += f" using {node['Index Name']}"
+    line += f" (rows={node.get('Actual Rows')} time={node.get('Actual Total Time')}ms)"
+    print(line)
+    for child in node.get("Plans", []):
+        print_plan(child, depth + 1)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--tenant-id", required=True)
+    parser.add_argument("--space-id", required=True)
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=0.0)
+    parser.add_argument(
+        "--recall",
+        choices=[level.value for level in RecallLevel],
+        default=RecallLevel.BALANCED.value,
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    load_dotenv()
+    conn = await asyncpg.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        port=int(os.getenv("DB_PORT", "5432")),
+        database=os.getenv("DB_NAME", "whisker"),
+        user=os.getenv("DB_USER", "whisker"),
+        password=os.getenv("DB_PASSWORD", "whisker"),
+    )
+    await register_vector(conn)
+    table = os.getenv("CHUNK_TABLE_NAME", "chunk")
+    try:
+        query_embedding = await conn.fetchval(
+            f"SELECT embedding FROM {table} WHERE embedding_model_name = $1 LIMIT 1",
+            args.model,
+        )
+        if query_embedding is None:
+            raise SystemExit(f"No chunk with embedding model {args.model}")
+        params = [
+            query_embedding,
+            [args.space_id],
+            args.tenant_id,
+            args.model,
+            args.threshold,
+            args.top,
+        ]
+        for name, query in (
+            ("legacy", LEGACY_QUERY),
+            ("index ordered", INDEX_ORDERED_QUERY),
+        ):
+            result, timings = await explain(
+                conn,
+                query.format(table=table),
+                params,
+                RecallLevel(args.recall),
+                args.runs,
+            )
+            print(f"\n== {name} ==")
+            print_plan(result["Plan"])
+            print(
+                f"execution {result['Execution Time']:.2f}ms, "
+                f"median over {args.runs} runs {statistics.median(timings):.2f}ms"
+            )
+    finally:
+        await conn.close()
+
+
+def run():
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,18 @@
+-- Adds the retrieval counts buffered by RetrievalCounter in a single statement.
+-- knowledge_ids and deltas are parallel arrays; ids of deleted knowledge are
+-- ignored. Returns the number of knowledge rows updated.
+CREATE OR REPLACE FUNCTION increment_knowledge_retrieval_count(
+    knowledge_ids UUID[],
+    deltas INTEGER[]
+) RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE knowledge AS k
+        SET retrieval_count = COALESCE(k.retrieval_count, 0) + d.delta
+        FROM unnest(knowledge_ids, deltas) AS d(knowledge_id, delta)
+        WHERE k.knowledge_id = d.knowledge_id
+        RETURNING 1
+    )
+    SELECT count(*)::INTEGER FROM updated;
+$$;
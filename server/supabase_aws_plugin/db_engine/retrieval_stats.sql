@@ -0,0 +1,94 @@
+-- Retrieval analytics, see core/retrieval_stats.py. Minute buckets per chunk are
+-- partitioned by day; the daily and tenant rollups are updated in the same
+-- transaction as the buckets, and each spool segment is loaded exactly once.
+CREATE TABLE IF NOT EXISTS retrieval_stats (
+    bucket TIMESTAMPTZ NOT NULL,
+    tenant_id UUID NOT NULL,
+    space_id VARCHAR(255) NOT NULL,
+    knowledge_id UUID NOT NULL,
+    chunk_id UUID NOT NULL,
+    hits INTEGER NOT NULL,
+    PRIMARY KEY (bucket, tenant_id, space_id, knowledge_id, chunk_id)
+) PARTITION BY RANGE (bucket);
+
+CREATE TABLE IF NOT EXISTS retrieval_stats_daily (
+    day DATE NOT NULL,
+    tenant_id UUID NOT NULL,
+    space_id VARCHAR(255) NOT NULL,
+    knowledge_id UUID NOT NULL,
+    hits BIGINT NOT NULL,
+    PRIMARY KEY (day, tenant_id, space_id, knowledge_id)
+);
+
+CREATE TABLE IF NOT EXISTS retrieval_stats_total (
+    tenant_id UUID PRIMARY KEY,
+    hits BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS retrieval_stats_segment (
+    segment_id VARCHAR(64) PRIMARY KEY,
+    loaded_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+
+-- stats: [{"bucket", "tenant_id", "space_id", "knowledge_id", "chunk_id", "hits"}]
+-- Returns false when the segment was loaded before.
+CREATE OR REPLACE FUNCTION load_retrieval_stats(segment_id TEXT, stats JSONB)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    partition_day DATE;
+BEGIN
+    INSERT INTO retrieval_stats_segment (segment_id)
+    VALUES (load_retrieval_stats.segment_id) ON CONFLICT DO NOTHING;
+    IF NOT FOUND THEN
+        RETURN FALSE;
+    END IF;
+
+    CREATE TEMP TABLE stats_rows ON COMMIT DROP AS
+    SELECT * FROM jsonb_to_recordset(stats) AS s(
+        bucket TIMESTAMPTZ, tenant_id UUID, space_id TEXT,
+        knowledge_id UUID, chunk_id UUID, hits INTEGER
+    );
+
+    FOR partition_day IN
+        SELECT DISTINCT (bucket AT TIME ZONE 'UTC')::date FROM stats_rows
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF retrieval_stats '
+            'FOR VALUES FROM (%L) TO (%L)',
+            'retrieval_stats_' || to_char(partition_day, 'YYYYMMDD'),
+            partition_day::text || ' 00:00+00',
+            (partition_day + 1)::text || ' 00:00+00'
+        );
+    END LOOP;
+
+    INSERT INTO retrieval_stats AS r
+        (bucket, tenant_id, space_id, knowledge_id, chunk_id, hits)
+    SELECT bucket, tenant_id, space_id, knowledge_id, chunk_id, hits FROM stats_rows
+    ON CONFLICT (bucket, tenant_id, space_id, knowledge_id, chunk_id)
+    DO UPDATE SET hits = r.hits + EXCLUDED.hits;
+
+    INSERT INTO retrieval_stats_daily AS r
+        (day, tenant_id, space_id, knowledge_id, hits)
+    SELECT (bucket AT TIME ZONE 'UTC')::date, tenant_id, space_id, knowledge_id,
+        sum(hits)
+    FROM stats_rows
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (day, tenant_id, space_id, knowledge_id)
+    DO UPDATE SET hits = r.hits + EXCLUDED.hits;
+
+    INSERT INTO retrieval_stats_total AS r (tenant_id, hits)
+    SELECT tenant_id, sum(hits) FROM stats_rows GROUP BY tenant_id
+    ON CONFLICT (tenant_id) DO UPDATE SET hits = r.hits + EXCLUDED.hits;
+
+    RETURN TRUE;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION retrieval_stats_total_hits()
+RETURNS BIGINT
+LANGUAGE sql
+AS $$
+    SELECT COALESCE(sum(hits), 0)::BIGINT FROM retrieval_stats_total;
+$$;
@@ -31,9 +31,28 @@ from whiskerrag_types.model.artifact_index import ArtifactIndexCreate, ArtifactI
 from whiskerrag_types.model.page import QueryParams
 from whiskerrag_utils import RegisterTypeEnum, get_register
 
+from core.pagination import (
+    CountMode,
+    CursorPageQueryParams,
+    CursorPageResponse,
+    decode_cursor,
+    encode_cursor,
+    get_cursor_order_field,
+)
+from core.rerank import rerank_chunks
+from core.retrieval import HybridRetrievalConfig, StageTimer
+from core.retrieval_counter import retrieval_count_arrays
+from core.retrieval_stats import RetrievalStatRow
+
 T = TypeVar("T", bound=BaseModel)
 
 
+def _quote_filter_value(value: Any) -> str:
+    """Quote a value for a PostgREST or/and filter, escaping backslashes and quotes"""
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
 class SupaBasePlugin(DBPluginInterface):
     supabase_client: Client
 
@@ -73,14 +92,9 @@ class SupaBasePlugin(DBPluginInterface):
     async def cleanup(self) -> None:
         pass
 
-    async def _get_paginated_data(
-        self,
-        tenant_id: str,
-        table_name: str,
-        model_class: T,
-        page_params: PageQueryParams,
-    ) -> PageResponse[T]:
-        query = self.supabase_client.table(table_name).select("*", count="exact")
+    def _apply_eq_conditions(
+        self, query: Any, tenant_id: str, page_params: PageQueryParams
+    ) -> Any:
         if page_params.eq_conditions:
             for field, value in page_params.eq_conditions.items():
                 if field == "tenant_id" and value != tenant_id:
@@ -95,6 +109,17 @@ class SupaBasePlugin(DBPluginInterface):
                     query.filter(field, "eq", json.dumps(value))
                     continue
                 query = query.eq(field, value)
+        return query
+
+    async def _get_paginated_data(
+        self,
+        tenant_id: str,
+        table_name: str,
+        model_class: T,
+        page_params: PageQueryParams,
+    ) -> PageResponse[T]:
+        query = self.supabase_client.table(table_name).select("*", count="exact")
+        query = self._apply_eq_conditions(query, tenant_id, page_params)
 
         if page_params.order_by:
             order_fields = page_params.order_by.split(",")
@@ -122,6 +147,75 @@ class SupaBasePlugin(DBPluginInterface):
             total_pages=total_pages,
         )
 
+    async def _get_cursor_paginated_data(
+        self,
+        tenant_id: str,
+        table_name: str,
+        model_class: T,
+        primary_key: str,
+        page_params: CursorPageQueryParams,
+    ) -> CursorPageResponse[T]:
+        """Keyset pagination, see PostgresDBPlugin._get_cursor_paginated_data"""
+        try:
+            order_field = get_cursor_order_field(page_params, model_class)
+            last_values = (
+                decode_cursor(page_params.cursor) if page_params.cursor else None
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        # PostgREST "planned" reads the planner estimate instead of counting rows
+        count_method = {
+            CountMode.EXACT: "exact",
+            CountMode.ESTIMATED: "planned",
+        }.get(page_params.count_mode)
+        query = self.supabase_client.table(table_name).select("*", count=count_method)
+        query = self._apply_eq_conditions(query, tenant_id, page_params)
+
+        is_desc = (page_params.order_direction or "asc").lower() == "desc"
+        if last_values:
+            if len(last_values) != 2:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+                )
+            last_order_value, last_primary_key = last_values
+            op = "lt" if is_desc else "gt"
+            primary_key_value = _quote_filter_value(last_primary_key)
+            # NULLs sort last ascending and first descending, see the local plugin
+            if last_order_value is None:
+                filters = (
+                    f"and({order_field}.is.null,{primary_key}.{op}.{primary_key_value})"
+                )
+                if is_desc:
+                    filters += f",{order_field}.not.is.null"
+            else:
+                order_value = _quote_filter_value(last_order_value)
+                filters = (
+                    f"{order_field}.{op}.{order_value},"
+                    f"and({order_field}.eq.{order_value},"
+                    f"{primary_key}.{op}.{primary_key_value})"
+                )
+                if not is_desc:
+                    filters += f",{order_field}.is.null"
+            query = query.or_(filters)
+        query = (
+            query.order(order_field, desc=is_desc)
+            .order(primary_key, desc=is_desc)
+            .limit(page_params.page_size + 1)
+        )
+        response = query.execute()
+        data = response.data if response else []
+
+        next_cursor = None
+        if len(data) > page_params.page_size:
+            data = data[: page_params.page_size]
+            next_cursor = encode_cursor([data[-1][order_field], data[-1][primary_key]])
+        return CursorPageResponse[T](
+            items=[model_class(**item) for item in data],
+            page_size=page_params.page_size,
+            next_cursor=next_cursor,
+            total=response.count if count_method and response else None,
+        )
+
     # =============== knowledge ===============
     async def save_knowledge_list(
         self, knowledge_list: List[Knowledge]
@@ -192,21 +286,19 @@ class SupaBasePlugin(DBPluginInterface):
     async def batch_update_knowledge_retrieval_count(
         self, knowledge_id_list: dict[str, int]
     ) -> None:
+        """
+        Add the buffered counts in one call to increment_knowledge_retrieval_count,
+        see retrieval_count.sql. Knowledge deleted since the retrieval is skipped.
+        """
+        knowledge_ids, deltas = retrieval_count_arrays(knowledge_id_list)
+        if not knowledge_ids:
+            return None
         try:
-            for knowledge_id, retrieval_count in knowledge_id_list.items():
-                res = (
-                    self.supabase_client.table(self.settings.KNOWLEDGE_TABLE_NAME)
-                    .update({"retrieval_count": retrieval_count})
-                    .eq("knowledge_id", knowledge_id)
-                    .execute()
-                )
-                if not res.data:
-                    raise HTTPException(
-                        status_code=status.HTTP_404_NOT_FOUND,
-                        detail=f"Knowledge entry {knowledge_id} was not found.",
-                    )
+            self.supabase_client.rpc(
+                "increment_knowledge_retrieval_count",
+                {"knowledge_ids": knowledge_ids, "deltas": deltas},
+            ).execute()
             return None
-
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -295,6 +387,17 @@ class SupaBasePlugin(DBPluginInterface):
             page_params,
         )
 
+    async def get_chunk_list_by_cursor(
+        self, tenant_id: str, page_params: CursorPageQueryParams[Chunk]
+    ) -> CursorPageResponse[Chunk]:
+        return await self._get_cursor_paginated_data(
+            tenant_id,
+            self.settings.CHUNK_TABLE_NAME,
+            Chunk,
+            "chunk_id",
+            page_params,
+        )
+
     async def get_chunk_by_id(self, tenant_id: str, chunk_id: str) -> Chunk:
         res = (
             self.supabase_client.table(self.settings.CHUNK_TABLE_NAME)
@@ -577,7 +680,52 @@ class SupaBasePlugin(DBPluginInterface):
         tenant_id: str,
         params: RetrievalRequest,
     ) -> List[RetrievalChunk]:
-        pass
+        """
+        Vector retrieval through the existing search RPCs. Full-text and hybrid
+        types need SQL functions this plugin does not ship, so they fall back to
+        vector search.
+        """
+        try:
+            config = HybridRetrievalConfig.from_request(params)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        if config.type != "vector":
+            self.logger.info(f"retrieve {config.type} falls back to vector search")
+        timer = StageTimer()
+        base_params = {
+            "question": params.content,
+            "embedding_model_name": config.embedding_model_name,
+            "similarity_threshold": config.similarity_threshold,
+            "top": config.result_limit,
+            "metadata_filter": config.metadata_filter,
+        }
+        with timer.stage("vector"):
+            if config.knowledge_id_list:
+                chunks = await self.search_knowledge_chunk_list(
+                    tenant_id,
+                    RetrievalByKnowledgeRequest(
+                        **base_params, knowledge_id_list=config.knowledge_id_list
+                    ),
+                )
+            else:
+                chunks = await self.search_space_chunk_list(
+                    tenant_id,
+                    RetrievalBySpaceRequest(
+                        **base_params, space_id_list=config.space_id_list
+                    ),
+                )
+        if config.rerank_model:
+            with timer.stage("rerank"):
+                chunks = await rerank_chunks(
+                    params.content,
+                    chunks,
+                    config.rerank_model,
+                    config.top,
+                    config.rerank_timeout,
+                )
+        timer.finish()
+        self.logger.info(f"retrieve vector: {len(chunks)} chunks, {timer}")
+        return chunks
 
     # =================== api-key ===================
     async def get_api_key_by_value(self, key_value: str) -> Union[APIKey, None]:
@@ -677,15 +825,37 @@ class SupaBasePlugin(DBPluginInterface):
 
     # =================== dashboard ===================
     async def get_system_info(self):
+        # read from the retrieval stats rollup, see retrieval_stats.sql
+        try:
+            res = self.supabase_client.rpc("retrieval_stats_total_hits", {}).execute()
+            retrieval_count = int(res.data or 0)
+        except Exception as e:
+            self.logger.warning(f"retrieval_stats_total_hits unavailable: {e}")
+            retrieval_count = 0
         return {
             "space_count": 0,
             "knowledge_count": 0,
             "task_count": 0,
             "tenant_count": 0,
-            "retrieval_count": 0,
+            "retrieval_count": retrieval_count,
             "storage_size": "0 B",
         }
 
+    async def load_retrieval_stats(
+        self, segment_id: str, rows: List[RetrievalStatRow]
+    ) -> bool:
+        """Bulk load one spool segment with the load_retrieval_stats function"""
+        res = self.supabase_client.rpc(
+            "load_retrieval_stats",
+            {
+                "segment_id": segment_id,
+                "stats": [
+                    {**row._asdict(), "bucket": row.bucket.isoformat()} for row in rows
+                ],
+            },
+        ).execute()
+        return bool(res.data)
+
     async def get_tenant_log(self, body: Dict[str, Any], tenant_id: str) -> List[Any]:
         return []
 
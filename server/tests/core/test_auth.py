@@ -0,0 +1,31 @@
+import asyncio
+import os
+import unittest
+from unittest.mock import patch
+
+from fastapi import HTTPException
+
+from core.auth import require_operator
+
+
+class TestRequireOperator(unittest.TestCase):
+    def status_of(self, header):
+        try:
+            asyncio.run(require_operator(header))
+        except HTTPException as e:
+            return e.status_code
+        return 200
+
+    def test_disabled_without_operator_key(self):
+        with patch.dict(os.environ, {"OPERATOR_SECRET_KEY": ""}):
+            self.assertEqual(self.status_of("Bearer "), 403)
+
+    def test_accepts_only_the_operator_key(self):
+        with patch.dict(os.environ, {"OPERATOR_SECRET_KEY": "op-secret"}):
+            self.assertEqual(self.status_of("Bearer op-secret"), 200)
+            self.assertEqual(self.status_of("Bearer sk-tenant"), 403)
+            self.assertEqual(self.status_of(None), 401)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import asyncio
+import unittest
+
+from core.cache import TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache(ttl=60, maxsize=2)
+        calls = []
+
+        @cache
+        async def lookup(key):
+            calls.append(key)
+            return key
+
+        async def run():
+            for key in ["a", "b", "a", "c", "a", "b"]:
+                await lookup(key)
+
+        asyncio.run(run())
+        # "a" was used before "c" arrived, so "b" was the one evicted
+        self.assertEqual(calls, ["a", "b", "c", "b"])
+        self.assertEqual(cache.stats()["evictions"], 2)
+
+    def test_keys_are_hashed(self):
+        cache = TTLCache(ttl=60, maxsize=10)
+
+        @cache
+        async def lookup(auth_header):
+            return True
+
+        asyncio.run(lookup("Bearer sk-secret"))
+        self.assertNotIn("sk-secret", "".join(cache._entries))
+        self.assertEqual(len(next(iter(cache._entries))), 64)
+
+    def test_expired_entries_are_reloaded(self):
+        cache = TTLCache(ttl=0.05, maxsize=10, jitter=0)
+        calls = []
+
+        @cache
+        async def lookup(key):
+            calls.append(key)
+            return key
+
+        async def run():
+            await lookup("a")
+            await lookup("a")
+            await asyncio.sleep(0.06)
+            await lookup("a")
+
+        asyncio.run(run())
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(cache.stats()["expired"], 1)
+
+    def test_concurrent_misses_share_one_call(self):
+        cache = TTLCache(ttl=60, maxsize=10)
+        calls = []
+
+        @cache
+        async def lookup(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return key.upper()
+
+        async def run():
+            return await asyncio.gather(*(lookup("a") for _ in range(20)))
+
+        self.assertEqual(asyncio.run(run()), ["A"] * 20)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()["coalesced"], 19)
+
+    def test_failures_are_not_cached(self):
+        cache = TTLCache(ttl=60, maxsize=10)
+        calls = []
+
+        @cache
+        async def lookup(key):
+            calls.append(key)
+            raise ConnectionError("database unavailable")
+
+        async def run():
+            for _ in range(2):
+                with self.assertRaises(ConnectionError):
+                    await lookup("a")
+
+        asyncio.run(run())
+        self.assertEqual(len(calls), 2)
+
+    def test_negative_results_use_their_own_ttl_and_evict_first(self):
+        cache = TTLCache(
+            ttl=60, maxsize=2, negative=lambda result: not result, negative_ttl=60
+        )
+
+        @cache
+        async def lookup(key):
+            return key.startswith("ak-")
+
+        async def run():
+            await lookup("ak-1")
+            await lookup("bad-1")
+            await lookup("bad-1")
+            await lookup("bad-2")
+            return await lookup("ak-1")
+
+        self.assertTrue(asyncio.run(run()))
+        stats = cache.stats()
+        self.assertEqual(stats["negative_hits"], 1)
+        # the invalid keys pushed out each other, not the valid one
+        self.assertEqual(stats["hits"], 1)
+
+    def test_invalidate_uses_key_function(self):
+        cache = TTLCache(ttl=60, maxsize=10, key=lambda header: header.split()[-1])
+        calls = []
+
+        @cache
+        async def lookup(header):
+            calls.append(header)
+            return header
+
+        async def run():
+            await lookup("Bearer ak-1")
+            await lookup("bearer ak-1")
+            cache.invalidate("Bearer ak-1")
+            await lookup("Bearer ak-1")
+
+        asyncio.run(run())
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio
+import unittest
+from typing import List
+
+from whiskerrag_types.model import Chunk, Knowledge
+
+from core.chunk_import import (
+    ChunkImporter,
+    ChunkImportError,
+    iter_ndjson_records,
+)
+from core.export import encode_embedding
+
+KNOWLEDGE_ID = "00000000-0000-0000-0000-000000000001"
+OTHER_TENANT_KNOWLEDGE_ID = "00000000-0000-0000-0000-000000000002"
+MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class FakeDB:
+    def __init__(self):
+        self.batches: List[List[Chunk]] = []
+
+    async def get_knowledge(self, tenant_id, knowledge_id):
+        if tenant_id != "t1" or knowledge_id != KNOWLEDGE_ID:
+            return None
+        return Knowledge(
+            knowledge_id=KNOWLEDGE_ID,
+            space_id="s1",
+            tenant_id="t1",
+            knowledge_type="text",
+            knowledge_name="k",
+            source_type="user_input_text",
+            source_config={"text": "hello"},
+            embedding_model_name=MODEL,
+            split_config={"type": "text", "chunk_size": 100, "chunk_overlap": 0},
+        )
+
+    async def save_chunk_list(self, chunks):
+        self.batches.append(chunks)
+        return chunks
+
+
+def record(**overrides) -> dict:
+    values = {
+        "chunk_id": "exported-id",
+        "context": "hello",
+        "knowledge_id": KNOWLEDGE_ID,
+        "embedding_model_name": MODEL,
+        "embedding": encode_embedding([0.5] * 384),
+    }
+    values.update(overrides)
+    return values
+
+
+async def stream(records: List[dict]):
+    for item in records:
+        yield item
+
+
+def run_import(db: FakeDB, records: List[dict], **kwargs) -> ChunkImporter:
+    importer = ChunkImporter(db, "t1", batch_size=2, **kwargs)
+    asyncio.run(importer.run(stream(records)))
+    return importer
+
+
+class TestChunkImporter(unittest.TestCase):
+    def test_batches_and_fresh_ids(self):
+        db = FakeDB()
+        importer = run_import(db, [record() for _ in range(5)])
+        self.assertEqual([len(batch) for batch in db.batches], [2, 2, 1])
+        self.assertEqual(importer.summary.imported, 5)
+        chunks = [chunk for batch in db.batches for chunk in batch]
+        self.assertEqual(len({chunk.chunk_id for chunk in chunks}), 5)
+        self.assertNotIn("exported-id", {chunk.chunk_id for chunk in chunks})
+        # the space comes from the knowledge when neither query nor row has one
+        self.assertEqual({chunk.space_id for chunk in chunks}, {"s1"})
+
+    def test_error_row_reports_rows_already_imported(self):
+        db = FakeDB()
+        rows = [record()] * 3 + [record(knowledge_id=OTHER_TENANT_KNOWLEDGE_ID)]
+        with self.assertRaises(ChunkImportError) as ctx:
+            run_import(db, rows)
+        self.assertEqual(ctx.exception.row, 4)
+        self.assertIn("not found", str(ctx.exception))
+        self.assertEqual(len(db.batches), 1)
+
+    def test_rejects_rows_not_matching_their_knowledge(self):
+        cases = {
+            "space": ([record()], {"space_id": "s2"}),
+            "embedded with": ([record(embedding_model_name="openai")], {}),
+            "expects 384": ([record(embedding=[0.5] * 3)], {}),
+            "uuid": ([record(knowledge_id="k1")], {}),
+        }
+        for message, (rows, kwargs) in cases.items():
+            with self.subTest(message), self.assertRaises(ChunkImportError) as ctx:
+                run_import(FakeDB(), rows, **kwargs)
+            self.assertIn(message, str(ctx.exception))
+            self.assertEqual(ctx.exception.row, 1)
+
+
+class TestNdjsonRecords(unittest.TestCase):
+    def test_rows_are_numbered_by_line(self):
+        body = b'{"a": 1}\n\n{"a": 2}\nnot json\n'
+
+        async def run():
+            async def chunks():
+                # split mid-line, as a network stream would
+                yield body[:5]
+                yield body[5:]
+
+            return [item async for item in iter_ndjson_records(chunks())]
+
+        with self.assertRaises(ChunkImportError) as ctx:
+            asyncio.run(run())
+        self.assertEqual(ctx.exception.row, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
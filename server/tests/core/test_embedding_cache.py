@@ -0,0 +1,133 @@
+import asyncio
+import time
+import unittest
+from typing import List, Optional
+
+from whiskerrag_types.interface.embed_interface import BaseEmbedding, Image
+from whiskerrag_utils import RegisterTypeEnum, get_register, register
+from whiskerrag_utils.registry import get_registry_list
+
+from core.embedding_cache import (
+    QueryEmbeddingCache,
+    _wrap_embedding_cls,
+    embed_queries,
+    install_query_embedding_cache,
+)
+
+
+class CountingEmbedding(BaseEmbedding):
+    calls = 0
+
+    @classmethod
+    async def health_check(cls) -> bool:
+        return True
+
+    async def embed_documents(
+        self, documents: List[str], timeout: Optional[int]
+    ) -> List[List[float]]:
+        return [await self.embed_text(document, timeout) for document in documents]
+
+    async def embed_text(self, text: str, timeout: Optional[int]) -> List[float]:
+        CountingEmbedding.calls += 1
+        return [float(len(text)), 1.0, 2.0]
+
+    async def embed_text_query(self, text: str, timeout: Optional[int]) -> List[float]:
+        return await self.embed_text(text, timeout)
+
+    async def embed_image(self, image: Image, timeout: Optional[int]) -> List[float]:
+        raise NotImplementedError()
+
+
+class TestQueryEmbeddingCache(unittest.TestCase):
+    def test_hit_after_set_with_normalized_text(self):
+        cache = QueryEmbeddingCache(ttl=60, maxsize=10)
+        cache.set("model", "embed_text", "hello   world ", [1.0, 2.0])
+        self.assertEqual(cache.get("model", "embed_text", " hello world"), [1.0, 2.0])
+        self.assertIsNone(cache.get("other-model", "embed_text", "hello world"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_ttl_expiry(self):
+        cache = QueryEmbeddingCache(ttl=0.05, maxsize=10)
+        cache.set("model", "embed_text", "q", [1.0])
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("model", "embed_text", "q"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_lru_eviction_by_count(self):
+        cache = QueryEmbeddingCache(ttl=60, maxsize=2)
+        cache.set("model", "embed_text", "a", [1.0])
+        cache.set("model", "embed_text", "b", [2.0])
+        # touch "a" so "b" becomes the least recently used entry
+        cache.get("model", "embed_text", "a")
+        cache.set("model", "embed_text", "c", [3.0])
+        self.assertIsNotNone(cache.get("model", "embed_text", "a"))
+        self.assertIsNone(cache.get("model", "embed_text", "b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_byte_bound(self):
+        # each entry is 4 float64 values (32 bytes) plus a 1 byte key
+        cache = QueryEmbeddingCache(ttl=60, maxsize=100, max_bytes=70)
+        for text in ["a", "b", "c"]:
+            cache.set("model", "embed_text", text, [0.0] * 4)
+        self.assertLessEqual(cache.stats()["bytes"], 70)
+        self.assertEqual(cache.stats()["size"], 2)
+
+    def test_hits_return_the_floats_that_were_stored(self):
+        cache = QueryEmbeddingCache(ttl=60, maxsize=10)
+        embedding = [0.1, 1 / 3, -2.718281828459045]
+        cache.set("model", "embed_text", "q", embedding)
+        self.assertEqual(cache.get("model", "embed_text", "q"), embedding)
+
+    def test_wrapped_embedding_reuses_cached_vector(self):
+        cache = QueryEmbeddingCache(ttl=60, maxsize=10)
+        CachedCls = _wrap_embedding_cls("model", CountingEmbedding, cache)
+        CountingEmbedding.calls = 0
+        first = asyncio.run(CachedCls().embed_text("question", 10))
+        second = asyncio.run(CachedCls().embed_text("question ", 10))
+        self.assertEqual(first, second)
+        self.assertEqual(CountingEmbedding.calls, 1)
+        self.assertEqual(CachedCls.__name__, "CountingEmbedding")
+
+    def test_embed_queries_batches_misses_only(self):
+        cache = QueryEmbeddingCache(ttl=60, maxsize=10)
+        cache.set("model", "embed_text", "cached", [9.0, 9.0, 9.0])
+        CachedCls = _wrap_embedding_cls("model", CountingEmbedding, cache)
+        CountingEmbedding.calls = 0
+        embeddings = asyncio.run(
+            embed_queries(CachedCls(), "model", ["ab", "cached", "ab", "abc"])
+        )
+        self.assertEqual([e[0] for e in embeddings], [2.0, 9.0, 2.0, 3.0])
+        self.assertEqual(CountingEmbedding.calls, 2)
+        self.assertEqual(cache.get("model", "embed_text", "abc")[0], 3.0)
+
+
+class TestInstallQueryEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        registries = get_registry_list()
+        original = registries[RegisterTypeEnum.EMBEDDING]
+        self.addCleanup(registries.__setitem__, RegisterTypeEnum.EMBEDDING, original)
+
+    def test_models_registered_after_install_are_cached(self):
+        @register(RegisterTypeEnum.EMBEDDING, "test-early-model")
+        class EarlyEmbedding(CountingEmbedding):
+            pass
+
+        install_query_embedding_cache()
+
+        @register(RegisterTypeEnum.EMBEDDING, "test-late-model")
+        class LateEmbedding(CountingEmbedding):
+            pass
+
+        for model_name in ["test-early-model", "test-late-model"]:
+            EmbeddingCls = get_register(RegisterTypeEnum.EMBEDDING, model_name)
+            self.assertTrue(getattr(EmbeddingCls, "_query_embedding_cached", False))
+        CountingEmbedding.calls = 0
+        LateCls = get_register(RegisterTypeEnum.EMBEDDING, "test-late-model")
+        asyncio.run(LateCls().embed_text("question", 10))
+        asyncio.run(LateCls().embed_text("question", 10))
+        self.assertEqual(CountingEmbedding.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
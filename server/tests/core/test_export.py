@@ -0,0 +1,47 @@
+import asyncio
+import json
+import unittest
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+
+from core.export import decode_embedding, encode_embedding, iter_ndjson
+
+
+async def _batches():
+    yield [
+        {
+            "chunk_id": uuid.UUID("00000000-0000-0000-0000-000000000001"),
+            "embedding": np.array([0.5, -1.0, 2.0], dtype=np.float32),
+            "metadata": {"a": 1},
+            "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+        }
+    ]
+    yield []
+
+
+async def _collect(iterator):
+    return [item async for item in iterator]
+
+
+class TestExport(unittest.TestCase):
+    def test_embedding_round_trip(self):
+        vector = [0.25, -3.5, 1e-3]
+        encoded = encode_embedding(vector)
+        self.assertEqual(len(encoded), 16)  # 12 bytes base64 encoded
+        np.testing.assert_allclose(decode_embedding(encoded), vector, rtol=1e-6)
+
+    def test_ndjson_lines(self):
+        chunks = asyncio.run(_collect(iter_ndjson(_batches())))
+        self.assertEqual(len(chunks), 1)
+        row = json.loads(chunks[0].decode("utf-8"))
+        self.assertEqual(row["chunk_id"], "00000000-0000-0000-0000-000000000001")
+        self.assertEqual(row["embedding_dim"], 3)
+        self.assertEqual(decode_embedding(row["embedding"]), [0.5, -1.0, 2.0])
+        self.assertEqual(row["metadata"], {"a": 1})
+        self.assertEqual(row["created_at"], "2024-01-01T00:00:00+00:00")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import uuid
+from datetime import datetime, timezone
+
+from whiskerrag_types.model import Chunk
+
+from core.pagination import (
+    CursorPageQueryParams,
+    decode_cursor,
+    encode_cursor,
+    get_cursor_order_field,
+)
+
+
+class TestCursorPagination(unittest.TestCase):
+    def test_cursor_round_trip_keeps_types(self):
+        values = [datetime.now(timezone.utc), uuid.uuid4()]
+        self.assertEqual(decode_cursor(encode_cursor(values)), values)
+        self.assertEqual(decode_cursor(encode_cursor([3, "abc"])), [3, "abc"])
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            decode_cursor("not a cursor")
+
+    def test_order_field_must_belong_to_model(self):
+        params = CursorPageQueryParams[Chunk](order_by="updated_at, chunk_id")
+        self.assertEqual(get_cursor_order_field(params, Chunk), "updated_at")
+        params = CursorPageQueryParams[Chunk](order_by="1; DROP TABLE chunk")
+        with self.assertRaises(ValueError):
+            get_cursor_order_field(params, Chunk)
+
+    def test_order_field_must_be_an_orderable_column(self):
+        columns = ["chunk_id", "created_at", "updated_at", "metadata", "f1"]
+        for order_by in ["tags", "metadata", "embedding", "enabled"]:
+            params = CursorPageQueryParams[Chunk](order_by=order_by)
+            with self.subTest(order_by), self.assertRaises(ValueError):
+                get_cursor_order_field(params, Chunk, columns=columns)
+        params = CursorPageQueryParams[Chunk](order_by="f1")
+        self.assertEqual(get_cursor_order_field(params, Chunk, columns=columns), "f1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import asyncio
+import unittest
+from typing import List, Optional
+from unittest.mock import patch
+
+from whiskerrag_types.model import RetrievalChunk
+
+from core.rerank import BaseReranker, rerank_chunks
+
+
+class LengthReranker(BaseReranker):
+    delay = 0.0
+
+    async def score(
+        self, query: str, passages: List[str], timeout: Optional[float]
+    ) -> List[float]:
+        await asyncio.sleep(self.delay)
+        return [float(len(passage)) for passage in passages]
+
+
+def _chunks(contexts):
+    return [
+        RetrievalChunk(
+            space_id="space_1",
+            tenant_id="tenant_A",
+            context=context,
+            knowledge_id="one",
+            similarity=0.5,
+            embedding_model_name="text-embedding-3-small",
+        )
+        for context in contexts
+    ]
+
+
+class TestRerankChunks(unittest.TestCase):
+    def test_reorders_and_cuts_to_top(self):
+        with patch("core.rerank.get_reranker", return_value=LengthReranker()):
+            chunks = asyncio.run(
+                rerank_chunks("q", _chunks(["a", "ccc", "bb"]), "m", top=2)
+            )
+        self.assertEqual([chunk.context for chunk in chunks], ["ccc", "bb"])
+        self.assertGreater(chunks[0].similarity, chunks[1].similarity)
+        self.assertLess(chunks[0].similarity, 1.0)
+
+    def test_timeout_keeps_retrieval_order(self):
+        reranker = LengthReranker()
+        reranker.delay = 1.0
+        with patch("core.rerank.get_reranker", return_value=reranker):
+            chunks = asyncio.run(
+                rerank_chunks("q", _chunks(["a", "ccc", "bb"]), "m", 2, timeout=0.05)
+            )
+        self.assertEqual([chunk.context for chunk in chunks], ["a", "ccc"])
+
+    def test_unknown_model_keeps_retrieval_order(self):
+        # the real registry, which raises for names nothing was registered under
+        chunks = asyncio.run(
+            rerank_chunks("q", _chunks(["a", "bb"]), "not-a-registered-reranker", 1)
+        )
+        self.assertEqual([chunk.context for chunk in chunks], ["a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
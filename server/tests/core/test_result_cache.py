@@ -0,0 +1,131 @@
+import asyncio
+import unittest
+from typing import Dict, List, Optional
+
+from whiskerrag_types.model import RetrievalBySpaceRequest, RetrievalChunk
+
+from core.result_cache import (
+    RetrievalResultCache,
+    SharedResultStore,
+    _cached_search,
+    _deleted_knowledge,
+    _invalidating,
+    _saved_chunks,
+)
+
+
+def make_chunk(space_id: str, knowledge_id: str) -> RetrievalChunk:
+    return RetrievalChunk(
+        context="hello",
+        tenant_id="t1",
+        space_id=space_id,
+        knowledge_id=knowledge_id,
+        embedding_model_name="openai",
+        similarity=0.9,
+    )
+
+
+class FakePlugin:
+    def __init__(self, cache: RetrievalResultCache):
+        self.calls = 0
+        self.chunks = [make_chunk("s1", "k1")]
+        self.search_space_chunk_list = _cached_search(
+            cache, "search_space_chunk_list", self._search
+        )
+        self.save_chunk_list = _invalidating(self._save, _saved_chunks, cache)
+        self.delete_knowledge = _invalidating(
+            self._delete_knowledge, _deleted_knowledge, cache
+        )
+
+    async def _search(self, tenant_id, params) -> List[RetrievalChunk]:
+        self.calls += 1
+        return [c for c in self.chunks if c.space_id in params.space_id_list]
+
+    async def _save(self, chunks) -> None:
+        self.chunks.extend(chunks)
+
+    async def _delete_knowledge(self, tenant_id, knowledge_ids) -> None:
+        self.chunks = [c for c in self.chunks if c.knowledge_id not in knowledge_ids]
+
+
+class MemoryStore(SharedResultStore):
+    def __init__(self):
+        self.values: Dict[str, str] = {}
+        self.generations: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        return self.values.get(key)
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        self.values[key] = value
+
+    async def get_generations(self, names: List[str]) -> List[int]:
+        return [self.generations.get(name, 0) for name in names]
+
+    async def bump_generations(self, names: List[str]) -> None:
+        for name in names:
+            self.generations[name] = self.generations.get(name, 0) + 1
+
+
+def space_query(question: str, space_ids: List[str]) -> RetrievalBySpaceRequest:
+    return RetrievalBySpaceRequest(
+        question=question, space_id_list=space_ids, embedding_model_name="openai"
+    )
+
+
+class TestRetrievalResultCache(unittest.TestCase):
+    def test_hit_for_normalized_question_and_space_order(self):
+        cache = RetrievalResultCache(ttl=60, maxsize=10)
+        plugin = FakePlugin(cache)
+
+        async def run():
+            await plugin.search_space_chunk_list("t1", space_query("hi", ["s1", "s2"]))
+            return await plugin.search_space_chunk_list(
+                "t1", space_query(" hi ", ["s2", "s1"])
+            )
+
+        self.assertEqual(len(asyncio.run(run())), 1)
+        self.assertEqual(plugin.calls, 1)
+        self.assertEqual(cache.stats()["hit_ratio"], 0.5)
+
+    def test_writes_invalidate_dependent_entries_only(self):
+        cache = RetrievalResultCache(ttl=60, maxsize=10)
+        plugin = FakePlugin(cache)
+        s1, s2 = space_query("hi", ["s1"]), space_query("hi", ["s2"])
+
+        async def run():
+            await plugin.search_space_chunk_list("t1", s1)
+            await plugin.search_space_chunk_list("t1", s2)
+            await plugin.save_chunk_list([make_chunk("s2", "k2")])
+            # s1 is untouched, s2 gained a chunk
+            await plugin.search_space_chunk_list("t1", s1)
+            self.assertEqual(len(await plugin.search_space_chunk_list("t1", s2)), 1)
+            await plugin.delete_knowledge("t1", ["k1"])
+            return await plugin.search_space_chunk_list("t1", s1)
+
+        self.assertEqual(asyncio.run(run()), [])
+        self.assertEqual(plugin.calls, 4)
+
+    def test_shared_tier_serves_other_replicas(self):
+        store = MemoryStore()
+        first = RetrievalResultCache(shared=store)
+        second = RetrievalResultCache(shared=store)
+        replica, other = FakePlugin(first), FakePlugin(second)
+        query = space_query("hi", ["s1"])
+
+        async def run():
+            await replica.search_space_chunk_list("t1", query)
+            hit = await other.search_space_chunk_list("t1", query)
+            await replica.delete_knowledge("t1", ["k1"])
+            # the delete on one replica drops the entry for every replica
+            key = second.make_key("t1", "search_space_chunk_list", query)
+            self.assertIsNone(await second.get(key))
+            return hit
+
+        self.assertEqual(asyncio.run(run())[0].knowledge_id, "k1")
+        self.assertEqual(other.calls, 0)
+        self.assertEqual(second.stats()["shared_hits"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
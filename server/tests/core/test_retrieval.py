@@ -0,0 +1,35 @@
+import unittest
+
+from core.retrieval import HybridRetrievalConfig, reciprocal_rank_fusion
+
+
+class TestReciprocalRankFusion(unittest.TestCase):
+    def test_first_in_every_list_scores_one(self):
+        fused = reciprocal_rank_fusion([(["a", "b"], 1.0), (["a", "c"], 1.0)])
+        self.assertEqual(fused[0], ("a", 1.0))
+        self.assertEqual({item_id for item_id, _ in fused}, {"a", "b", "c"})
+
+    def test_weights_change_order(self):
+        fused = reciprocal_rank_fusion([(["a"], 1.0), (["b"], 3.0)])
+        self.assertEqual([item_id for item_id, _ in fused], ["b", "a"])
+
+    def test_empty_lists(self):
+        self.assertEqual(reciprocal_rank_fusion([]), [])
+
+
+class TestHybridRetrievalConfig(unittest.TestCase):
+    def test_scope_is_required(self):
+        with self.assertRaises(ValueError):
+            HybridRetrievalConfig(embedding_model_name="m")
+
+    def test_candidate_limit_defaults_to_four_times_top(self):
+        config = HybridRetrievalConfig(
+            embedding_model_name="m", space_id_list=["s"], top=5
+        )
+        self.assertEqual(config.candidate_limit, 20)
+
+    def test_top_is_bounded(self):
+        with self.assertRaises(ValueError):
+            HybridRetrievalConfig(
+                embedding_model_name="m", space_id_list=["s"], top=1001
+            )
@@ -0,0 +1,101 @@
+import asyncio
+import tempfile
+import unittest
+import uuid
+from typing import Dict, List
+
+from whiskerrag_types.model import RetrievalChunk
+
+from core.retrieval_stats import (
+    RetrievalStatRow,
+    RetrievalStatsRecorder,
+    RetrievalStatsSpool,
+)
+
+TENANT_ID = str(uuid.uuid4())
+KNOWLEDGE_ID = str(uuid.uuid4())
+
+
+def make_chunk() -> RetrievalChunk:
+    return RetrievalChunk(
+        chunk_id=str(uuid.uuid4()),
+        context="hello",
+        tenant_id=TENANT_ID,
+        space_id="s1",
+        knowledge_id=KNOWLEDGE_ID,
+        embedding_model_name="openai",
+        similarity=0.9,
+    )
+
+
+class StatsPlugin:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.segments: Dict[str, List[RetrievalStatRow]] = {}
+
+    async def load_retrieval_stats(self, segment_id, rows) -> bool:
+        if self.fail:
+            raise ConnectionError("database is down")
+        if segment_id in self.segments:
+            return False
+        self.segments[segment_id] = rows
+        return True
+
+
+class TestRetrievalStats(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def test_spool_skips_torn_last_line(self):
+        spool = RetrievalStatsSpool(self.dir.name)
+        key = (TENANT_ID, "s1", KNOWLEDGE_ID, "c1", 60)
+        spool.append({key: 2})
+        spool.append({key: 1})
+        with open(spool._open_path, "a") as f:
+            f.write('["torn"')
+        spool.seal()
+        [path] = spool.sealed()
+        self.assertEqual(spool.read(path), {key: 3})
+
+    def test_seal_leaves_segments_of_live_processes_alone(self):
+        live, other = RetrievalStatsSpool(self.dir.name), RetrievalStatsSpool(
+            self.dir.name
+        )
+        key = (TENANT_ID, "s1", KNOWLEDGE_ID, "c1", 60)
+        live.append({key: 1})
+        other.seal()
+        self.assertEqual(other.sealed(), [])
+        live.append({key: 1})
+        # the writer dies without sealing, its lock goes with it
+        live._open_file.close()
+        other.seal()
+        [path] = other.sealed()
+        self.assertEqual(other.read(path), {key: 2})
+
+    def test_hits_are_bucketed_spooled_and_loaded_once(self):
+        plugin = StatsPlugin(fail=True)
+        recorder = RetrievalStatsRecorder(RetrievalStatsSpool(self.dir.name), plugin)
+        chunk = make_chunk()
+
+        async def run():
+            recorder.record(TENANT_ID, [chunk, make_chunk()])
+            recorder.record(TENANT_ID, [chunk])
+            await recorder.spool_counts()
+            # a failed load keeps the segment for the next one
+            await recorder.load()
+            plugin.fail = False
+            await recorder.load()
+
+        asyncio.run(run())
+        self.assertEqual(recorder.load_failures, 1)
+        self.assertEqual(recorder.spool.sealed(), [])
+        [rows] = plugin.segments.values()
+        hits = {row.chunk_id: row.hits for row in rows}
+        self.assertEqual(hits[chunk.chunk_id], 2)
+        self.assertEqual(sum(hits.values()), 3)
+        self.assertEqual(rows[0].bucket.second, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
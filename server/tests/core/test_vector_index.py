@@ -0,0 +1,79 @@
+import asyncio
+import json
+import unittest
+from contextlib import asynccontextmanager
+
+from core.vector_index import (
+    VectorQuantization,
+    hnsw_build_params,
+    quantized_expression,
+)
+from local_plugin.db_engine.index_manager import (
+    VectorIndexManager,
+    managed_index_name,
+)
+
+
+class TestHnswBuildParams(unittest.TestCase):
+    def test_small_tables_keep_pgvector_defaults(self):
+        self.assertEqual(hnsw_build_params(0), {"m": 16, "ef_construction": 64})
+
+    def test_params_grow_with_rows(self):
+        self.assertEqual(
+            hnsw_build_params(2_000_000), {"m": 24, "ef_construction": 200}
+        )
+        self.assertEqual(
+            hnsw_build_params(50_000_000), {"m": 32, "ef_construction": 256}
+        )
+
+
+class TestQuantizedExpression(unittest.TestCase):
+    def test_expressions(self):
+        self.assertEqual(
+            quantized_expression(VectorQuantization.NONE, 3, "embedding"),
+            "embedding::vector(3)",
+        )
+        self.assertEqual(
+            quantized_expression(VectorQuantization.HALFVEC, 3, "$1"),
+            "$1::halfvec(3)",
+        )
+        self.assertEqual(
+            quantized_expression(VectorQuantization.BIT, 3, "embedding"),
+            "binary_quantize(embedding::vector(3))::bit(3)",
+        )
+
+
+class LockedPool:
+    """Catalog with one halfvec index, the maintenance lock held elsewhere"""
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    async def fetchval(self, query, *args):
+        return False
+
+    async def fetch(self, query, *args):
+        comment = {"embedding_model_name": "m", "dimension": 3, "quantization": "bit"}
+        return [
+            {
+                "index_name": managed_index_name("m"),
+                "method": "hnsw",
+                "comment": json.dumps(comment),
+                "reloptions": ["m=16", "ef_construction=64"],
+                "valid": True,
+                "size_bytes": 0,
+                "size": "0 bytes",
+                "scans": 0,
+            }
+        ]
+
+
+class TestVectorIndexManager(unittest.TestCase):
+    def test_refreshes_indexes_without_the_maintenance_lock(self):
+        manager = VectorIndexManager(LockedPool(), "chunk")
+        self.assertIsNone(manager.get_index("m"))
+        self.assertEqual(asyncio.run(manager.maintain()), [])
+        # another process built the index, queries here now target it
+        self.assertEqual(manager.get_index("m").quantization, VectorQuantization.BIT)
+        self.assertEqual(manager.rerank_factor("m"), 10)
@@ -0,0 +1,308 @@
+import asyncio
+import logging
+import re
+import unittest
+from contextlib import asynccontextmanager
+from typing import Dict, List
+from unittest.mock import patch
+
+from whiskerrag_types.model import (
+    Chunk,
+    RetrievalByKnowledgeRequest,
+    RetrievalBySpaceRequest,
+)
+
+from core.retrieval import MAX_RETRIEVAL_TOP, HybridRetrievalConfig, RecallLevel
+from core.vector_index import RERANK_FACTORS, VectorQuantization
+from local_plugin.db_engine.client import PostgresDBPlugin
+
+
+class RecordingConn:
+    def __init__(self):
+        self.executed: List[str] = []
+        self.fetched: List[tuple] = []
+        self.copied: List[tuple] = []
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    @asynccontextmanager
+    async def transaction(self, **kwargs):
+        yield
+
+    async def execute(self, query, *args):
+        self.executed.append(query)
+
+    async def fetch(self, query, *args):
+        self.fetched.append((query, args))
+        return []
+
+    async def copy_records_to_table(self, table_name, records, columns):
+        self.copied.append((table_name, columns, records))
+
+
+class FakeIndexManager:
+    def __init__(self, quantization: VectorQuantization):
+        self.quantization = quantization
+
+    def rerank_factor(self, embedding_model_name: str) -> int:
+        return RERANK_FACTORS[self.quantization]
+
+    def vector_expression(self, embedding_model_name: str) -> str:
+        return "embedding"
+
+    def index_distance(self, embedding_model_name: str) -> str:
+        return "embedding <=> $1"
+
+    def model_condition(self, embedding_model_name: str) -> None:
+        return None
+
+
+class FakeSettings:
+    CHUNK_TABLE_NAME = "chunk"
+    KNOWLEDGE_TABLE_NAME = "knowledge"
+    TASK_TABLE_NAME = "task"
+    TENANT_TABLE_NAME = "tenant"
+
+
+class UninitializedPlugin(PostgresDBPlugin):
+    def __init__(self):
+        pass
+
+
+# only query building is exercised, the rest of the interface may stay abstract
+UninitializedPlugin.__abstractmethods__ = frozenset()
+
+
+def make_plugin(conn: RecordingConn, quantization: VectorQuantization):
+    plugin = UninitializedPlugin()
+    plugin.settings = FakeSettings()
+    plugin.pool = conn
+    plugin.index_manager = FakeIndexManager(quantization)
+    plugin.vector_search_recall = RecallLevel.BALANCED
+    return plugin
+
+
+class TestVectorSearchLimits(unittest.TestCase):
+    def search(self, quantization: VectorQuantization, top: int):
+        conn = RecordingConn()
+        config = HybridRetrievalConfig(
+            embedding_model_name="m", space_id_list=["s1"], top=top
+        )
+        asyncio.run(
+            make_plugin(conn, quantization)._vector_search(
+                "t1", config, [0.1, 0.2], top, columns=["chunk_id"]
+            )
+        )
+        ef_search = int(re.search(r"hnsw.ef_search = (\d+)", conn.executed[0])[1])
+        _, args = conn.fetched[0]
+        # candidates, similarity threshold, limit
+        return ef_search, args[-3]
+
+    def test_ef_search_and_candidates_stay_within_pgvector_limit(self):
+        cases = {
+            (VectorQuantization.NONE, 5): (100, 5),
+            (VectorQuantization.NONE, 300): (300, 300),
+            (VectorQuantization.NONE, 1000): (1000, 1000),
+            (VectorQuantization.BIT, 30): (300, 300),
+            (VectorQuantization.BIT, 500): (1000, 1000),
+            (VectorQuantization.HALFVEC, 800): (1000, 1000),
+        }
+        for (quantization, top), expected in cases.items():
+            with self.subTest(quantization=quantization, top=top):
+                self.assertEqual(self.search(quantization, top), expected)
+
+
+class TestLegacyRetrieval(unittest.TestCase):
+    def test_default_top_is_clamped_to_the_retrieval_bound(self):
+        class FakeEmbedding:
+            async def embed_text(self, text, timeout=None):
+                return [0.1, 0.2]
+
+        conn = RecordingConn()
+        plugin = make_plugin(conn, VectorQuantization.NONE)
+        plugin.logger = logging.getLogger("whisker")
+        plugin._table_columns = {"chunk": ["chunk_id", "context", "embedding"]}
+        # left at the legacy default, which is above the bound
+        params = RetrievalBySpaceRequest(
+            question="q", embedding_model_name="m", space_id_list=["s1"]
+        )
+        self.assertGreater(params.top, MAX_RETRIEVAL_TOP)
+        with patch(
+            "local_plugin.db_engine.client.get_register", return_value=FakeEmbedding
+        ):
+            self.assertEqual(
+                asyncio.run(plugin.search_space_chunk_list("t1", params)), []
+            )
+        _, args = conn.fetched[0]
+        self.assertEqual(args[-1], MAX_RETRIEVAL_TOP)
+
+
+class StatsConn(RecordingConn):
+    def __init__(self, n_distinct):
+        super().__init__()
+        self.n_distinct = n_distinct
+
+    async def fetch(self, query, *args):
+        self.fetched.append((query, args))
+        return [
+            {"relname": "knowledge", "reltuples": 400.0},
+            {"relname": "task", "reltuples": -1.0},
+        ]
+
+    async def fetchval(self, query, *args):
+        self.fetched.append((query, args))
+        if "pg_stats" in query:
+            return self.n_distinct
+        if "count(DISTINCT space_id)" in query:
+            return 7
+        if "pg_size_pretty" in query:
+            return "8 MB"
+        return 12
+
+
+class TestSystemInfo(unittest.TestCase):
+    def system_info(self, n_distinct):
+        conn = StatsConn(n_distinct)
+        info = asyncio.run(make_plugin(conn, VectorQuantization.NONE).get_system_info())
+        scanned = any("count(" in query for query, _ in conn.fetched)
+        return info, scanned
+
+    def test_space_count_comes_from_planner_statistics(self):
+        cases = {25.0: 25, -0.05: 20, None: 7}
+        for n_distinct, expected in cases.items():
+            with self.subTest(n_distinct=n_distinct):
+                info, scanned = self.system_info(n_distinct)
+                self.assertEqual(info["space_count"], expected)
+                # only a table without statistics yet is counted directly
+                self.assertEqual(scanned, n_distinct is None)
+        info, _ = self.system_info(25.0)
+        self.assertEqual(
+            (info["knowledge_count"], info["task_count"], info["tenant_count"]),
+            (400, 0, 0),
+        )
+        self.assertEqual(info["retrieval_count"], 12)
+
+
+class TestKeysetCondition(unittest.TestCase):
+    def test_null_order_values_keep_their_place_in_the_keyset(self):
+        plugin = UninitializedPlugin()
+        cases = {
+            (False, "v"): "((f1, chunk_id) > ($2, $3) OR f1 IS NULL)",
+            (False, None): "(f1 IS NULL AND chunk_id > $2)",
+            (True, "v"): "(f1, chunk_id) < ($2, $3)",
+            (True, None): "((f1 IS NULL AND chunk_id < $2) OR f1 IS NOT NULL)",
+        }
+        for (is_desc, last_value), expected in cases.items():
+            params = ["t1"]
+            condition = plugin._keyset_condition(
+                "f1", "chunk_id", is_desc, [last_value, "k"], params
+            )
+            self.assertEqual(condition, expected)
+            self.assertEqual(params[-1], "k")
+
+
+class TestSaveChunkList(unittest.TestCase):
+    def test_none_values_are_left_to_column_defaults_in_mixed_batches(self):
+        def chunk(context: str, **fields) -> Chunk:
+            return Chunk(
+                space_id="s1",
+                tenant_id="t1",
+                knowledge_id="k",
+                context=context,
+                embedding=[0.1, 0.2],
+                embedding_model_name="m",
+                **fields,
+            )
+
+        chunks = [
+            chunk("a", metadata={"page": 1}),
+            chunk("b"),
+            chunk("c"),
+            chunk("d", metadata={"page": 4}, f1="x"),
+            chunk("e"),
+        ]
+        conn = RecordingConn()
+        plugin = make_plugin(conn, VectorQuantization.NONE)
+        plugin.chunk_copy_batch_size = 3
+        # no "extra" in the table, "metadata" and "f1" carry database defaults
+        plugin._table_columns = {
+            "chunk": ["chunk_id", "context", "embedding", "metadata", "f1", "extra"]
+        }
+
+        self.assertIs(asyncio.run(plugin.save_chunk_list(chunks)), chunks)
+        copied = [
+            (columns, [record[1] for record in records])
+            for _, columns, records in conn.copied
+        ]
+        self.assertEqual(
+            copied,
+            [
+                (["chunk_id", "context", "embedding", "metadata"], ["a"]),
+                (["chunk_id", "context", "embedding"], ["b", "c"]),
+                (["chunk_id", "context", "embedding", "metadata", "f1"], ["d"]),
+                (["chunk_id", "context", "embedding"], ["e"]),
+            ],
+        )
+        _, _, records = conn.copied[0]
+        self.assertEqual(records[0][2], [0.1, 0.2])
+        self.assertEqual(records[0][3], '{"page": 1}')
+
+
+class TestSearchChunkListBatch(unittest.TestCase):
+    def test_mixed_models_embed_once_per_model_and_keep_order(self):
+        embed_calls: Dict[str, List[List[str]]] = {}
+
+        def embedding_for(model_name: str):
+            class FakeEmbedding:
+                async def embed_documents(self, texts, timeout=None):
+                    embed_calls.setdefault(model_name, []).append(texts)
+                    return [
+                        [float(len(model_name)), float(len(text))] for text in texts
+                    ]
+
+            return FakeEmbedding
+
+        searched = []
+
+        async def search_similar_chunks(tenant_id, params, query_embedding):
+            searched.append(params.question)
+            # the first query finishes last, results must still be in request order
+            await asyncio.sleep(0.02 if params.question == "a" else 0)
+            return [(params.question, query_embedding)]
+
+        plugin = UninitializedPlugin()
+        plugin.batch_search_concurrency = 2
+        plugin._search_similar_chunks = search_similar_chunks
+        params_list = [
+            RetrievalBySpaceRequest(
+                question="a", embedding_model_name="m1", space_id_list=["s1"]
+            ),
+            RetrievalByKnowledgeRequest(
+                question="bbb", embedding_model_name="model2", knowledge_id_list=["k"]
+            ),
+            RetrievalBySpaceRequest(
+                question="cc", embedding_model_name="m1", space_id_list=["s1"]
+            ),
+        ]
+        with patch(
+            "local_plugin.db_engine.client.get_register",
+            side_effect=lambda register_type, name: embedding_for(name),
+        ):
+            results = asyncio.run(plugin.search_chunk_list_batch("t1", params_list))
+
+        self.assertEqual(embed_calls, {"m1": [["a", "cc"]], "model2": [["bbb"]]})
+        self.assertEqual(
+            results,
+            [
+                [("a", [2.0, 1.0])],
+                [("bbb", [6.0, 3.0])],
+                [("cc", [2.0, 2.0])],
+            ],
+        )
+        self.assertEqual(sorted(searched), ["a", "bbb", "cc"])
+
+
+if __name__ == "__main__":
+    unittest.main()
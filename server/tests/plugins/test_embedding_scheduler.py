@@ -0,0 +1,92 @@
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from local_plugin.task_engine.registry.embedding_scheduler import (
+    EmbeddingBatchScheduler,
+    EmbeddingQueueFullError,
+    EmbeddingSchedulerClosedError,
+)
+
+
+class FakeEmbeddings:
+    def __init__(self, drop: int = 0):
+        self.batches: List[List[str]] = []
+        self.drop = drop
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.batches.append(texts)
+        vectors = [[float(len(text))] for text in texts]
+        return vectors[: len(vectors) - self.drop]
+
+
+def make_scheduler(embeddings, **kwargs) -> EmbeddingBatchScheduler:
+    executor = ThreadPoolExecutor(max_workers=1)
+    scheduler = EmbeddingBatchScheduler(
+        embeddings, batch_window=0.05, executor=executor, **kwargs
+    )
+    return scheduler
+
+
+class TestEmbeddingBatchScheduler(unittest.TestCase):
+    def test_concurrent_requests_share_batches(self):
+        embeddings = FakeEmbeddings()
+        scheduler = make_scheduler(embeddings, max_batch_size=3)
+
+        async def run():
+            texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+            results = await asyncio.gather(*(scheduler.embed(t) for t in texts))
+            await scheduler.shutdown()
+            return results
+
+        self.assertEqual(asyncio.run(run()), [[1.0], [2.0], [3.0], [4.0], [5.0]])
+        self.assertEqual(embeddings.batches, [["a", "bb", "ccc"], ["dddd", "eeeee"]])
+
+    def test_missing_vectors_fail_the_batch(self):
+        scheduler = make_scheduler(FakeEmbeddings(drop=1))
+
+        async def run():
+            results = await asyncio.gather(
+                scheduler.embed("a"), scheduler.embed("bb"), return_exceptions=True
+            )
+            await scheduler.shutdown()
+            return results
+
+        for result in asyncio.run(run()):
+            self.assertIsInstance(result, RuntimeError)
+            self.assertIn("1 embeddings for 2 texts", str(result))
+
+    def test_full_queue_fails_fast(self):
+        scheduler = make_scheduler(FakeEmbeddings(), max_queue_size=1)
+
+        async def run():
+            results = await asyncio.gather(
+                scheduler.embed("a"), scheduler.embed("bb"), return_exceptions=True
+            )
+            await scheduler.shutdown()
+            return results
+
+        first, second = asyncio.run(run())
+        self.assertEqual(first, [1.0])
+        self.assertIsInstance(second, EmbeddingQueueFullError)
+
+    def test_shutdown_cancels_worker_and_fails_waiting_requests(self):
+        scheduler = make_scheduler(FakeEmbeddings())
+
+        async def run():
+            waiting = asyncio.ensure_future(scheduler.embed("a"))
+            await asyncio.sleep(0)
+            worker = scheduler._get_state().worker
+            await scheduler.shutdown()
+            with self.assertRaises(EmbeddingSchedulerClosedError):
+                await waiting
+            with self.assertRaises(EmbeddingSchedulerClosedError):
+                await scheduler.embed("b")
+            return worker
+
+        self.assertTrue(asyncio.run(run()).cancelled())
+
+
+if __name__ == "__main__":
+    unittest.main()
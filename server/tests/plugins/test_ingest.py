@@ -0,0 +1,70 @@
+import asyncio
+import unittest
+from typing import List
+from unittest.mock import patch
+
+from whiskerrag_types.model import Chunk, Knowledge
+from whiskerrag_types.model.multi_modal import Image, Text
+
+from local_plugin.task_engine.ingest import ChunkIngestPipeline
+
+
+class FakeEmbedding:
+    async def embed_documents(self, documents: List[str], timeout) -> List[List[float]]:
+        return [[float(len(document)), 1.0] for document in documents]
+
+    async def embed_image(self, image: Image, timeout) -> List[float]:
+        if image.metadata.get("broken"):
+            raise ValueError("unsupported image")
+        return [0.5, 0.5]
+
+
+class FakeDB:
+    def __init__(self):
+        self.batches: List[List[Chunk]] = []
+
+    async def save_chunk_list(self, chunks: List[Chunk]) -> List[Chunk]:
+        self.batches.append(chunks)
+        return chunks
+
+    async def delete_knowledge_chunk(self, tenant_id, knowledge_ids):
+        raise AssertionError("nothing failed, nothing should be deleted")
+
+
+def make_knowledge() -> Knowledge:
+    return Knowledge(
+        space_id="s1",
+        tenant_id="t1",
+        knowledge_type="text",
+        knowledge_name="k",
+        source_type="user_input_text",
+        source_config={"text": "hello"},
+        embedding_model_name="openai",
+        split_config={"type": "text", "chunk_size": 100, "chunk_overlap": 0},
+        metadata={"_tags": "a, b"},
+    )
+
+
+@patch("local_plugin.task_engine.ingest.get_register", lambda *args: FakeEmbedding)
+class TestChunkIngestPipeline(unittest.TestCase):
+    def test_texts_in_batches_and_broken_images_skipped(self):
+        db = FakeDB()
+        texts = [Text(content="x" * i, metadata={"_idx": i}) for i in range(1, 4)]
+        images = [
+            Image(b64_json="aGk=", metadata={"broken": True}),
+            Image(b64_json="aGk=", metadata={}),
+        ]
+        saved = asyncio.run(
+            ChunkIngestPipeline(db, batch_size=2).run(make_knowledge(), (texts, images))
+        )
+        self.assertEqual(saved, 4)
+        self.assertEqual([len(batch) for batch in db.batches], [2, 1, 1])
+        first = db.batches[0][0]
+        self.assertEqual(first.embedding, [1.0, 1.0])
+        self.assertEqual(first.tags, ["a", "b"])
+        self.assertEqual(first.metadata["_idx"], 1)
+        self.assertEqual(db.batches[2][0].context, "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import time
+import unittest
+
+from whiskerrag_types.model import Knowledge
+
+from local_plugin.task_engine.parse_pool import ParseProcessPool
+
+
+def fake_parse(knowledge_json: str) -> dict:
+    knowledge = Knowledge.model_validate_json(knowledge_json)
+    if knowledge.knowledge_name == "hang":
+        time.sleep(60)
+    elif knowledge.knowledge_name == "crash":
+        os._exit(1)
+    elif knowledge.knowledge_name == "broken":
+        raise ValueError("unsupported file")
+    time.sleep(0.2)
+    return {
+        "texts": [{"content": knowledge.knowledge_name, "metadata": {}}],
+        "images": [],
+    }
+
+
+class FakeParsePool(ParseProcessPool):
+    target = staticmethod(fake_parse)
+
+
+def make_knowledge(name: str) -> Knowledge:
+    return Knowledge(
+        space_id="s1",
+        tenant_id="t1",
+        knowledge_type="text",
+        knowledge_name=name,
+        source_type="user_input_text",
+        source_config={"text": "hello"},
+        embedding_model_name="openai",
+        split_config={"type": "text", "chunk_size": 100, "chunk_overlap": 0},
+    )
+
+
+class TestParseProcessPool(unittest.TestCase):
+    def test_failing_worker_does_not_affect_other_parses(self):
+        pool = FakeParsePool(max_workers=3, timeout=2, register_packages=())
+
+        async def run():
+            # start every worker first so the timeout only covers the job
+            await asyncio.gather(
+                *(pool.parse(make_knowledge("warm")) for _ in range(3))
+            )
+            return await asyncio.gather(
+                pool.parse(make_knowledge("hang")),
+                pool.parse(make_knowledge("crash")),
+                pool.parse(make_knowledge("ok")),
+                pool.parse(make_knowledge("broken")),
+                return_exceptions=True,
+            )
+
+        try:
+            hang, crash, ok, broken = asyncio.run(run())
+            # the last parse reuses a healthy worker or a fresh replacement
+            self.assertEqual(
+                asyncio.run(pool.parse(make_knowledge("after")))[0][0].content,
+                "after",
+            )
+        finally:
+            pool.shutdown()
+        self.assertIsInstance(hang, TimeoutError)
+        self.assertIsInstance(crash, RuntimeError)
+        self.assertEqual(ok[0][0].content, "ok")
+        self.assertIsInstance(broken, ValueError)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import unittest
+from types import SimpleNamespace
+
+from whiskerrag_types.model import Knowledge
+
+from core.pagination import CursorPageQueryParams, encode_cursor
+from supabase_aws_plugin.db_engine.supabase_client import SupaBasePlugin
+
+
+class UninitializedPlugin(SupaBasePlugin):
+    def __init__(self):
+        self.logger = logging.getLogger("whisker")
+
+
+# only the methods under test are exercised, the rest may stay abstract
+UninitializedPlugin.__abstractmethods__ = frozenset()
+
+
+class MissingRpcClient:
+    def rpc(self, name, params):
+        raise Exception(f"Could not find the function public.{name}")
+
+
+class RecordingQuery:
+    """Chainable stand-in for the PostgREST query builder"""
+
+    def __init__(self):
+        self.filters = []
+
+    def table(self, name):
+        return self
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def limit(self, *args):
+        return self
+
+    def or_(self, filters):
+        self.filters.append(filters)
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=[], count=None)
+
+
+class TestCursorPagination(unittest.TestCase):
+    def next_page_filter(self, order_value, order_direction="asc"):
+        plugin = UninitializedPlugin()
+        plugin.supabase_client = RecordingQuery()
+        params = CursorPageQueryParams[Knowledge](
+            order_by="knowledge_name",
+            order_direction=order_direction,
+            cursor=encode_cursor([order_value, 'id"1']),
+        )
+        asyncio.run(
+            plugin._get_cursor_paginated_data(
+                "t1", "knowledge", Knowledge, "knowledge_id", params
+            )
+        )
+        return plugin.supabase_client.filters[0]
+
+    def test_cursor_values_are_escaped_inside_quotes(self):
+        self.assertEqual(
+            self.next_page_filter('say "hi" \\ bye'),
+            'knowledge_name.gt."say \\"hi\\" \\\\ bye",'
+            'and(knowledge_name.eq."say \\"hi\\" \\\\ bye",'
+            'knowledge_id.gt."id\\"1"),'
+            "knowledge_name.is.null",
+        )
+        self.assertEqual(
+            self.next_page_filter(None, "desc"),
+            'and(knowledge_name.is.null,knowledge_id.lt."id\\"1"),'
+            "knowledge_name.not.is.null",
+        )
+
+
+class TestSystemInfo(unittest.TestCase):
+    def test_missing_retrieval_stats_rpc_counts_zero(self):
+        plugin = UninitializedPlugin()
+        plugin.supabase_client = MissingRpcClient()
+        info = asyncio.run(plugin.get_system_info())
+        self.assertEqual(info["retrieval_count"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+import asyncio
+import time
+import unittest
+from typing import Dict, List, Optional, Tuple
+from unittest.mock import patch
+
+from whiskerrag_types.model import Knowledge, Task, TaskStatus
+
+from local_plugin.task_engine.client import LocalEnginePlugin
+
+
+class FakeSettings:
+    def __init__(self, **env):
+        self.env = env
+
+    def get_env(self, key, default=None):
+        return self.env.get(key, default)
+
+
+class LeaseDB:
+    """Task table with the lease semantics of PostgresDBPlugin.claim_tasks"""
+
+    is_initialized = True
+
+    def __init__(self, tasks: List[Task]):
+        self.tasks = {task.task_id: task for task in tasks}
+        # task_id -> (owner, expires at)
+        self.leases: Dict[str, Tuple[str, float]] = {}
+        self.deleted_chunks: List[str] = []
+
+    def _free(self, task_id: str) -> bool:
+        lease = self.leases.get(task_id)
+        return lease is None or lease[1] < time.monotonic()
+
+    async def claim_tasks(
+        self,
+        owner: str,
+        lease_seconds: float,
+        task_ids: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+    ) -> List[Task]:
+        unfinished = (TaskStatus.PENDING, TaskStatus.PENDING_RETRY, TaskStatus.RUNNING)
+        candidates = (
+            task_ids
+            if task_ids is not None
+            else [t.task_id for t in self.tasks.values() if t.status in unfinished]
+        )
+        claimed = [task_id for task_id in candidates if self._free(task_id)][:limit]
+        for task_id in claimed:
+            self.leases[task_id] = (owner, time.monotonic() + lease_seconds)
+        return [self.tasks[task_id].model_copy() for task_id in claimed]
+
+    async def renew_task_leases(
+        self, owner: str, task_ids: List[str], lease_seconds: float
+    ) -> List[str]:
+        renewed = [t for t in task_ids if self.leases.get(t, ("",))[0] == owner]
+        for task_id in renewed:
+            self.leases[task_id] = (owner, time.monotonic() + lease_seconds)
+        return renewed
+
+    async def release_task_leases(self, owner: str, task_ids: List[str]) -> None:
+        for task_id in task_ids:
+            if self.leases.get(task_id, ("",))[0] == owner:
+                del self.leases[task_id]
+
+    async def get_knowledge(self, tenant_id: str, knowledge_id: str) -> Knowledge:
+        return Knowledge(
+            knowledge_id=knowledge_id,
+            space_id="s1",
+            tenant_id=tenant_id,
+            knowledge_type="text",
+            knowledge_name="k",
+            source_type="user_input_text",
+            source_config={"text": "hello"},
+            embedding_model_name="openai",
+            split_config={"type": "text", "chunk_size": 100, "chunk_overlap": 0},
+        )
+
+    async def delete_knowledge_chunk(self, tenant_id: str, knowledge_ids: List[str]):
+        self.deleted_chunks.extend(knowledge_ids)
+
+    async def update_task_list(self, task_list: List[Task]) -> List[Task]:
+        for task in task_list:
+            self.tasks[task.task_id] = task.model_copy()
+        return task_list
+
+
+class BlockingEngine(LocalEnginePlugin):
+    def __init__(self, settings: FakeSettings):
+        super().__init__(settings)
+        self.release = asyncio.Event()
+        self.processed: List[str] = []
+
+    async def process_task(self, task: Task, knowledge: Knowledge) -> Task:
+        self.processed.append(task.task_id)
+        await self.release.wait()
+        task.status = TaskStatus.SUCCESS
+        await self.db_plugin.update_task_list([task])
+        return task
+
+
+def make_task(status: TaskStatus, tenant_id: str) -> Task:
+    return Task(
+        status=status,
+        knowledge_id="00000000-0000-0000-0000-000000000001",
+        space_id="s1",
+        tenant_id=tenant_id,
+    )
+
+
+@patch("local_plugin.task_engine.client.init_register", lambda *args: None)
+class TestLocalEngineLeases(unittest.TestCase):
+    def test_running_task_is_resumed_only_after_its_lease_expires(self):
+        task = make_task(TaskStatus.RUNNING, "t1")
+        db = LeaseDB([task])
+
+        async def run():
+            settings = FakeSettings(TASK_LEASE_SECONDS=0.3)
+            first, second = BlockingEngine(settings), BlockingEngine(settings)
+            await first.ensure_initialized(db)
+            await asyncio.sleep(0)
+            self.assertEqual(db.deleted_chunks, [task.knowledge_id])
+            # a peer starting while the task runs leaves it and its chunks alone
+            await second.ensure_initialized(db)
+            self.assertEqual(second.processed, [])
+            self.assertEqual(len(db.deleted_chunks), 1)
+            # the first process dies without releasing its lease
+            first._lease_loop_task.cancel()
+            for running in first._running.values():
+                running.cancel()
+            await asyncio.sleep(0.6)
+            await second.shutdown()
+            return first, second
+
+        first, second = asyncio.run(run())
+        self.assertEqual(first.processed, [task.task_id])
+        self.assertEqual(second.processed, [task.task_id])
+        self.assertEqual(db.deleted_chunks, [task.knowledge_id] * 2)
+
+    def test_submitted_tasks_are_claimed_and_idle_tenants_evicted(self):
+        tasks = [make_task(TaskStatus.PENDING, f"t{i}") for i in range(3)]
+        db = LeaseDB(tasks)
+        db.leases[tasks[2].task_id] = ("peer", time.monotonic() + 60)
+
+        async def run():
+            engine = BlockingEngine(FakeSettings())
+            # skip ensure_initialized, so no startup resume claims the tasks
+            await engine.init()
+            engine.db_plugin = db
+            knowledge = [await db.get_knowledge("t1", tasks[0].knowledge_id)]
+            await engine.batch_execute_task(tasks, knowledge)
+            await asyncio.sleep(0)
+            self.assertEqual(len(engine._tenant_semaphores), 2)
+            engine.release.set()
+            await asyncio.gather(*engine._running.values())
+            return engine
+
+        engine = asyncio.run(run())
+        # the task leased by a live peer was not run a second time
+        self.assertEqual(engine.processed, [tasks[0].task_id, tasks[1].task_id])
+        self.assertEqual(engine._tenant_semaphores, {})
+        self.assertEqual(engine._tenant_users, {})
+
+    def test_claims_only_free_slots_and_more_as_tasks_finish(self):
+        tasks = [make_task(TaskStatus.PENDING, f"t{i}") for i in range(5)]
+        db = LeaseDB(tasks)
+
+        async def run():
+            engine = BlockingEngine(FakeSettings(TASK_MAX_CONCURRENCY=2))
+            await engine.ensure_initialized(db)
+            await asyncio.sleep(0)
+            # the other three stay unleased for peers to claim
+            self.assertEqual(len(db.leases), 2)
+            self.assertEqual(len(engine.processed), 2)
+            # leases renew every 20 seconds, finished tasks must pull in the rest
+            engine.release.set()
+            for _ in range(50):
+                if len(engine.processed) == 5 and not engine._running:
+                    break
+                await asyncio.sleep(0.01)
+            await engine.shutdown()
+            return engine
+
+        engine = asyncio.run(run())
+        self.assertEqual(
+            sorted(engine.processed), sorted(task.task_id for task in tasks)
+        )
+        self.assertTrue(
+            all(task.status == TaskStatus.SUCCESS for task in db.tasks.values())
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
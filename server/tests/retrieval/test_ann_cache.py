@@ -0,0 +1,101 @@
+import asyncio
+import unittest
+
+import numpy as np
+
+from local_plugin.db_engine.ann_cache import (
+    HNSW_M,
+    AnnIndexCache,
+    SpaceAnnIndex,
+)
+
+
+def _vectors(count, dim=8, seed=0):
+    return np.random.default_rng(seed).standard_normal((count, dim)).astype("float32")
+
+
+class TestSpaceAnnIndex(unittest.TestCase):
+    def setUp(self):
+        self.vectors = _vectors(50)
+        self.index = SpaceAnnIndex(8)
+        self.index.add(
+            [f"c{i}" for i in range(50)],
+            [f"k{i % 5}" for i in range(50)],
+            self.vectors,
+        )
+
+    def test_nearest_is_the_query_itself(self):
+        results = self.index.search(self.vectors[7], k=3)
+        self.assertEqual(results[0][0], "c7")
+        self.assertAlmostEqual(results[0][1], 1.0, places=5)
+        self.assertEqual(len(results), 3)
+
+    def test_remove_knowledge_and_upsert(self):
+        self.index.remove_knowledge(["k2"])
+        self.assertEqual(len(self.index), 40)
+        self.assertNotEqual(self.index.search(self.vectors[7], k=1)[0][0], "c7")
+        # saving c7 again makes it searchable with its new vector
+        self.index.add(["c7"], ["k2"], self.vectors[9:10])
+        self.assertEqual(len(self.index), 41)
+        ids = [chunk_id for chunk_id, _ in self.index.search(self.vectors[9], k=2)]
+        self.assertEqual(set(ids), {"c7", "c9"})
+
+    def test_quantized_matrix(self):
+        index = SpaceAnnIndex(8, quantize=True)
+        index.add([f"c{i}" for i in range(50)], ["k"] * 50, self.vectors)
+        self.assertEqual(index._vectors.dtype, np.int8)
+        results = index.search(self.vectors[7], k=3)
+        self.assertEqual(results[0][0], "c7")
+        self.assertAlmostEqual(results[0][1], 1.0, places=2)
+
+
+class TestAnnIndexCache(unittest.TestCase):
+    def test_loads_after_min_hits_and_falls_back_until_then(self):
+        vectors = _vectors(20)
+
+        async def loader(key):
+            yield [f"c{i}" for i in range(20)], ["k"] * 20, vectors
+
+        async def run():
+            cache = AnnIndexCache(loader, min_hits=2)
+            args = ("t", ["s"], "m", vectors[3], 5)
+            self.assertIsNone(await cache.search(*args))
+            self.assertIsNone(await cache.search(*args))
+            await asyncio.gather(*cache._loading.values())
+            results = await cache.search(*args)
+            self.assertEqual(results[0][0], "c3")
+            await cache.remove_knowledge("t", ["k"])
+            self.assertEqual(await cache.search(*args), [])
+
+        asyncio.run(run())
+
+    def test_hnsw_spaces_count_the_graph_vector_copy(self):
+        dim = 1536
+
+        def hnsw_space():
+            index = SpaceAnnIndex(dim)
+            index.add([f"c{i}" for i in range(10)], ["k"] * 10, _vectors(10, dim))
+            matrix_bytes = index.memory_bytes
+            # stands in for an hnswlib graph, only its presence is accounted
+            index._hnsw = object()
+            return index, matrix_bytes
+
+        first, matrix_bytes = hnsw_space()
+        capacity = first._vectors.shape[0]
+        links = capacity * (2 * HNSW_M * 4 + 16)
+        self.assertEqual(first.memory_bytes, matrix_bytes + links + capacity * dim * 4)
+
+        async def loader(key):
+            yield [], [], np.empty((0, dim), dtype=np.float32)
+
+        # both spaces would fit if only the graph links were counted
+        cache = AnnIndexCache(loader, max_bytes=2 * (matrix_bytes + links))
+        cache._entries[("t", "s1", "m")] = first
+        cache._entries[("t", "s2", "m")] = hnsw_space()[0]
+        cache._evict()
+        self.assertEqual(list(cache._entries), [("t", "s2", "m")])
+        self.assertEqual(cache.evictions, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
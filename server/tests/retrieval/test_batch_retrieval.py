@@ -0,0 +1,104 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from typing import Dict, List
+from unittest.mock import patch
+
+from whiskerrag_types.model import (
+    RetrievalByKnowledgeRequest,
+    RetrievalBySpaceRequest,
+    RetrievalChunk,
+)
+
+from api.retrieval.router import BatchRetrievalRequest, retrieve_batch
+
+
+def hit(question: str, knowledge_id: str) -> RetrievalChunk:
+    return RetrievalChunk(
+        space_id="s1",
+        tenant_id="t1",
+        context=question,
+        knowledge_id=knowledge_id,
+        similarity=0.9,
+        embedding_model_name="openai",
+    )
+
+
+class PerQueryPlugin:
+    """A db plugin without search_chunk_list_batch, searches finish out of order"""
+
+    async def search_knowledge_chunk_list(self, tenant_id, params):
+        await asyncio.sleep(0.02 if params.question == "first" else 0)
+        return [hit(params.question, "by-knowledge")]
+
+    async def search_space_chunk_list(self, tenant_id, params):
+        return [hit(params.question, "by-space")]
+
+
+class BatchPlugin(PerQueryPlugin):
+    def __init__(self):
+        self.batches: List[list] = []
+
+    async def search_chunk_list_batch(self, tenant_id, params_list):
+        self.batches.append(params_list)
+        return [[hit(params.question, "batched")] for params in params_list]
+
+
+class CountingCounter:
+    def __init__(self):
+        self.records: List[Dict[str, int]] = []
+
+    def batch_record(self, records: Dict[str, int]) -> None:
+        self.records.append(records)
+
+
+def queries() -> BatchRetrievalRequest:
+    return BatchRetrievalRequest(
+        queries=[
+            RetrievalByKnowledgeRequest(
+                question="first", embedding_model_name="openai", knowledge_id_list=["k"]
+            ),
+            RetrievalBySpaceRequest(
+                question="second", embedding_model_name="m2", space_id_list=["s1"]
+            ),
+            RetrievalByKnowledgeRequest(
+                question="third", embedding_model_name="openai", knowledge_id_list=["k"]
+            ),
+        ]
+    )
+
+
+def run_batch(plugin, counter: CountingCounter):
+    with patch("api.retrieval.router.PluginManager") as manager:
+        manager.return_value.dbPlugin = plugin
+        tenant = SimpleNamespace(tenant_id="t1")
+        return asyncio.run(retrieve_batch(queries(), tenant, counter)).data
+
+
+class TestRetrieveBatch(unittest.TestCase):
+    def test_gather_fallback_keeps_query_order(self):
+        counter = CountingCounter()
+        res = run_batch(PerQueryPlugin(), counter)
+        self.assertEqual(
+            [(chunks[0].context, chunks[0].knowledge_id) for chunks in res],
+            [
+                ("first", "by-knowledge"),
+                ("second", "by-space"),
+                ("third", "by-knowledge"),
+            ],
+        )
+        # one counter update, a knowledge counts once per query hit
+        self.assertEqual(counter.records, [{"by-knowledge": 2, "by-space": 1}])
+
+    def test_plugin_batch_search_is_used_when_available(self):
+        plugin, counter = BatchPlugin(), CountingCounter()
+        res = run_batch(plugin, counter)
+        self.assertEqual(len(plugin.batches), 1)
+        self.assertEqual(
+            [chunks[0].context for chunks in res], ["first", "second", "third"]
+        )
+        self.assertEqual(counter.records, [{"batched": 3}])
+
+
+if __name__ == "__main__":
+    unittest.main()
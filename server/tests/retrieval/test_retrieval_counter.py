@@ -1,5 +1,6 @@
 import asyncio
 import os
+import tempfile
 import threading
 import time
 import unittest
@@ -8,7 +9,12 @@ from whiskerrag_types.model import RetrievalChunk
 from whiskerrag_utils import init_register
 
 from server.core.plugin_manager import PluginManager
-from server.core.retrieval_counter import RetrievalCounter, retrieval_count
+from server.core.retrieval_counter import (
+    AsyncRetrievalCounter,
+    RetrievalCounter,
+    retrieval_count,
+    retrieval_count_arrays,
+)
 
 
 class TestRetrievalCounter(unittest.TestCase):
@@ -195,5 +201,166 @@ class TestRetrievalCounter(unittest.TestCase):
         )
 
 
+class FlakyPlugin:
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.retrieval_count: dict[str, int] = {}
+
+    async def batch_update_knowledge_retrieval_count(self, knowledge_id_list):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("connection reset")
+        for knowledge_id, count in knowledge_id_list.items():
+            self.retrieval_count[knowledge_id] = (
+                self.retrieval_count.get(knowledge_id, 0) + count
+            )
+
+
+class TestRetrievalCounterFlush(unittest.TestCase):
+    def make_counter(self, failures: int) -> RetrievalCounter:
+        counter = RetrievalCounter(
+            flush_interval=60, shards=2, db_plugin=FlakyPlugin(failures)
+        )
+        counter.retry_backoff = 0
+        self.addCleanup(counter.shutdown)
+        return counter
+
+    def test_flush_retries_transient_errors(self):
+        counter = self.make_counter(failures=2)
+        counter.batch_record({"one": 2, "two": 1})
+        counter.force_flush()
+        self.assertEqual(counter.db_plugin.retrieval_count, {"one": 2, "two": 1})
+        self.assertEqual(counter.stats()["flush_retries"], 2)
+        self.assertEqual(counter.stats()["flush_failures"], 0)
+
+    def test_failed_flush_keeps_counts_for_next_flush(self):
+        counter = self.make_counter(failures=3)
+        counter.record("one")
+        counter.force_flush()
+        self.assertEqual(counter.stats()["flush_failures"], 1)
+        counter.record("one")
+        counter.force_flush()
+        self.assertEqual(counter.db_plugin.retrieval_count, {"one": 2})
+
+    def test_record_does_not_wait_for_a_slow_flush(self):
+        counter = self.make_counter(failures=0)
+        plugin = counter.db_plugin
+        write = plugin.batch_update_knowledge_retrieval_count
+
+        async def slow_write(knowledge_id_list):
+            time.sleep(0.5)
+            await write(knowledge_id_list)
+
+        plugin.batch_update_knowledge_retrieval_count = slow_write
+        counter.record("one")
+        flush = threading.Thread(target=counter.force_flush)
+        flush.start()
+        time.sleep(0.05)
+        start = time.monotonic()
+        threads = [
+            threading.Thread(
+                target=lambda: [counter.record("two") for _ in range(1000)]
+            )
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertLess(time.monotonic() - start, 0.4)
+        flush.join()
+        counter.force_flush()
+        self.assertEqual(plugin.retrieval_count, {"one": 1, "two": 8000})
+
+    def test_shutdown_on_event_loop_flushes_on_flush_thread(self):
+        counter = self.make_counter(failures=0)
+        counter.batch_record({"one": 2, "two": 1})
+
+        async def run():
+            # the server shuts the counter down from its running loop
+            counter.shutdown()
+
+        asyncio.run(run())
+        self.assertFalse(counter.flush_thread.is_alive())
+        self.assertEqual(counter.db_plugin.retrieval_count, {"one": 2, "two": 1})
+        self.assertEqual(counter.stats()["flush_failures"], 0)
+
+    def test_full_shard_drops_new_keys_and_wakes_flush(self):
+        counter = RetrievalCounter(
+            flush_interval=60, shards=1, db_plugin=FlakyPlugin(0)
+        )
+        self.addCleanup(counter.shutdown)
+        counter.max_buffer_size = 2
+        counter.batch_record({"one": 1, "two": 1})
+        counter.record("one")
+        counter.record("three", 5)
+        self.assertEqual(counter.stats()["dropped"], 5)
+        # the flush thread flushes right away instead of after flush_interval
+        deadline = time.monotonic() + 2
+        while not counter.db_plugin.retrieval_count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(counter.db_plugin.retrieval_count, {"one": 2, "two": 1})
+
+    def test_full_shard_spills_new_keys_to_disk(self):
+        with tempfile.TemporaryDirectory() as directory:
+            counter = RetrievalCounter(
+                flush_interval=60,
+                shards=1,
+                db_plugin=FlakyPlugin(0),
+                overflow="spill",
+                spill_path=os.path.join(directory, "counter.spill"),
+            )
+            self.addCleanup(counter.shutdown)
+            counter.max_buffer_size = 1
+            # the woken flush thread must not swap buffers between the records
+            with counter._flush_lock:
+                counter.batch_record({"one": 1, "two": 2, "three": 3})
+            counter.force_flush()
+            self.assertEqual(
+                counter.db_plugin.retrieval_count, {"one": 1, "two": 2, "three": 3}
+            )
+            self.assertEqual(counter.stats()["spilled"], 5)
+
+    def test_count_arrays_are_sorted_uuids(self):
+        first = "0b1e2f0a-1111-4c4c-8a8a-000000000001"
+        second = "0b1e2f0a-1111-4c4c-8a8a-000000000002"
+        ids, deltas = retrieval_count_arrays({second: 3, "not-a-uuid": 1, first: 2})
+        self.assertEqual(ids, [first, second])
+        self.assertEqual(deltas, [2, 3])
+
+
+class TestAsyncRetrievalCounter(unittest.TestCase):
+    def test_records_from_loop_and_threads_flush_on_shutdown(self):
+        plugin = FlakyPlugin(failures=1)
+
+        async def run():
+            counter = AsyncRetrievalCounter(flush_interval=60, db_plugin=plugin)
+            counter.retry_backoff = 0
+            counter.start()
+            counter.batch_record({"one": 1, "two": 2})
+            await asyncio.to_thread(counter.record, "one")
+            await counter.shutdown()
+            return counter
+
+        counter = asyncio.run(run())
+        self.assertEqual(plugin.retrieval_count, {"one": 2, "two": 2})
+        self.assertEqual(counter.stats()["flush_retries"], 1)
+
+    def test_full_buffer_wakes_flush_task(self):
+        plugin = FlakyPlugin(failures=0)
+
+        async def run():
+            counter = AsyncRetrievalCounter(flush_interval=60, db_plugin=plugin)
+            counter.max_buffer_size = 2
+            counter.start()
+            counter.batch_record({"one": 1, "two": 1})
+            await asyncio.sleep(0.05)
+            flushed = dict(plugin.retrieval_count)
+            await counter.shutdown()
+            return flushed
+
+        self.assertEqual(asyncio.run(run()), {"one": 1, "two": 1})
+
+
 if __name__ == "__main__":
     unittest.main()
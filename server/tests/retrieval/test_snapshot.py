@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from local_plugin.db_engine.snapshot import (
+    SnapshotStore,
+    add_entry,
+    delete_entry,
+    delete_knowledge_entry,
+    is_filter_supported,
+)
+
+KEY = ("t", "s", "m")
+
+
+class TestSnapshotStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SnapshotStore(self.tmp.name)
+        vectors = np.random.default_rng(0).standard_normal((30, 8)).astype("float32")
+        self.vectors = vectors
+        self.rows = [
+            {
+                "chunk_id": f"c{i}",
+                "knowledge_id": f"k{i % 3}",
+                "embedding": vectors[i],
+                "context": f"chunk {i}",
+                "metadata": {"lang": "en" if i % 2 else "zh", "page": i},
+            }
+            for i in range(30)
+        ]
+        position = self.store.log_position(KEY)
+        self.snapshot = self.store.write(KEY, self.rows, position)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_arrays_are_memory_mapped(self):
+        self.assertIsInstance(self.snapshot.vectors, np.memmap)
+        self.assertIsInstance(self.snapshot.chunk_ids, np.memmap)
+        self.assertEqual(self.snapshot.context(7), "chunk 7")
+
+    def test_exact_top_k(self):
+        results = self.snapshot.search(self.vectors[4], k=5)
+        self.assertEqual(results[0][0], "c4")
+        expected = self.vectors @ self.vectors[4] / np.linalg.norm(self.vectors, axis=1)
+        self.assertEqual(
+            [chunk_id for chunk_id, _ in results],
+            [f"c{i}" for i in np.argsort(-expected)[:5]],
+        )
+
+    def test_filters(self):
+        results = self.snapshot.search(
+            self.vectors[4],
+            k=30,
+            threshold=-1.0,
+            knowledge_ids=["k1"],
+            metadata_filter={"lang": "en"},
+        )
+        ids = {int(chunk_id[1:]) for chunk_id, _ in results}
+        self.assertEqual(ids, {i for i in range(30) if i % 3 == 1 and i % 2})
+        # jsonb compares numbers by value
+        results = self.snapshot.search(
+            self.vectors[4], k=30, metadata_filter={"page": 4.0}
+        )
+        self.assertEqual([chunk_id for chunk_id, _ in results], ["c4"])
+
+    def test_nested_filters_are_left_to_postgres(self):
+        self.assertTrue(is_filter_supported({"lang": "en", "page": 1}))
+        self.assertFalse(is_filter_supported({"tags": ["a"]}))
+
+    def test_log_is_applied_and_compacted(self):
+        new_row = {**self.rows[9], "chunk_id": "new", "knowledge_id": "k1"}
+        self.store.append(KEY, [add_entry(new_row)])
+        self.store.append_tenant("t", [delete_entry(["c9"])])
+        self.store.append_tenant("t", [delete_knowledge_entry(["k0"])])
+        # another worker opening the same version sees the appended changes
+        reader = self.store.open(KEY)
+        reader.refresh()
+        self.assertEqual(len(reader), 21)
+        self.assertEqual(reader.search(self.vectors[9], k=1)[0][0], "new")
+
+        compacted = self.store.compact(KEY)
+        self.assertNotEqual(compacted.path, self.snapshot.path)
+        self.assertEqual(len(compacted.chunk_ids), 21)
+        self.assertEqual(os.path.getsize(compacted.log_path), 0)
+        self.assertEqual(self.store.current_path(KEY), compacted.path)
+
+    def test_float16_vectors(self):
+        store = SnapshotStore(os.path.join(self.tmp.name, "half"), dtype="float16")
+        snapshot = store.write(KEY, self.rows, store.log_position(KEY))
+        self.assertEqual(snapshot.vectors.dtype, np.float16)
+        self.assertEqual(snapshot.search(self.vectors[4], k=1)[0][0], "c4")
+
+    def test_int8_codes_are_reranked_at_full_precision(self):
+        store = SnapshotStore(os.path.join(self.tmp.name, "int8"), dtype="int8")
+        snapshot = store.write(KEY, self.rows, store.log_position(KEY))
+        self.assertEqual(snapshot.codes.dtype, np.int8)
+        results = snapshot.search(self.vectors[4], k=5)
+        expected = self.snapshot.search(self.vectors[4], k=5)
+        self.assertEqual([r[0] for r in results], [e[0] for e in expected])
+        self.assertAlmostEqual(results[1][1], expected[1][1], places=5)
+
+
+if __name__ == "__main__":
+    unittest.main()